@@ -4,14 +4,34 @@ These tools allow to check whether a position or object is visible in any
 campaign.  This complements K2onSilicon, which only determines whether an
 object is on silicon for a single campaign.
 """
+import os
 import sys
 import argparse
+import functools
 import numpy as np
 
 from . import fields
 from . import logger
 from . import Highlight
-from .K2onSilicon import parse_file, onSiliconCheck
+from .footprint import getCampaignFootprints, unpackCampaigns
+from .skyindex import getSkyIndex
+from .K2onSilicon import TargetListReader, format_rows
+from .output import open_writer, BINARY_FORMATS
+from .parallel import imap_chunks
+from .resolver import (SesameResolver, FileResolver, ConcurrentResolver,
+                       NameCache, DEFAULT_CACHE_FN, DEFAULT_MAX_WORKERS)
+
+# Number of names resolved per batch by K2findCampaigns-csv
+NAMES_CHUNKSIZE = 1000
+
+# Columns of the binary (.npy or .npz) output of K2findCampaigns-csv.
+# `row` counts the targets in the input table, starting from zero,
+# and bit c of `campaigns` is set if the target is observable in campaign c.
+FIND_CAMPAIGNS_DTYPE = np.dtype([('row', 'i8'),
+                                 ('ra', 'f8'),
+                                 ('dec', 'f8'),
+                                 ('mag', 'f8'),
+                                 ('campaigns', 'u8')])
 
 
 def printChannelColRow(campaign, ra, dec):
@@ -34,19 +54,112 @@ def findCampaigns(ra, dec):
     campaigns : list of int
         A list of the campaigns that cover the given position.
     """
+    return findCampaignsList([ra], [dec])[0]
+
+
+def findCampaignsList(ra, dec=None):
+    """Returns the campaigns that cover each of a list of positions.
+
+    The campaigns are looked up in the sky-tile index of
+    `skyindex.getSkyIndex`, and compared against the footprints of
+    `footprint.CampaignFootprints` only near their edges.
+
+    Parameters
+    ----------
+    ra, dec : array-like
+        Positions in decimal degrees (J2000).  `ra` may also be a
+        `catalog.SkyCatalog`, with `dec` left as `None`.
+
+    Returns
+    -------
+    campaigns : list of lists of int
+        The campaigns covering each position.
+    """
+    bitmask = findCampaignsBitmask(ra, dec)
+    # Few targets are covered by a different set of campaigns
+    masks, inverse = np.unique(bitmask, return_inverse=True)
+    lists = [unpackCampaigns(mask) for mask in masks]
+    return [list(lists[i]) for i in inverse]
+
+
+def findCampaignsBitmask(ra, dec=None):
+    """Similar to `findCampaignsList`, but returns the campaigns covering
+    each position as an integer, in which bit c is set for campaign c.
+
+    See `footprint.unpackCampaigns` to turn a mask into a list.
+
+    Returns
+    -------
+    bitmask : 1d uint64 array
+    """
+    return _getSkyIndex().getBitmask(ra, dec)
+
+
+def _find_campaigns_chunk(chunk, binary=False):
+    """Finds the campaigns of a `TargetChunk` for K2findCampaigns-csv.
+
+    This runs in the worker processes, so the result is also formatted
+    here: as csv text, or as rows of `FIND_CAMPAIGNS_DTYPE` numbered
+    from zero if `binary` is `True`.
+    """
+    if binary:
+        rows = np.empty(len(chunk.ra), dtype=FIND_CAMPAIGNS_DTYPE)
+        rows['row'] = np.arange(len(rows))
+        rows['ra'] = chunk.ra
+        rows['dec'] = chunk.dec
+        rows['mag'] = chunk.mag
+        rows['campaigns'] = findCampaignsBitmask(chunk.ra, chunk.dec)
+        return rows
+    campaigns = findCampaignsList(chunk.ra, chunk.dec)
+    return format_rows([chunk.ra, chunk.dec, chunk.mag, campaigns] +
+                       list(chunk.extra.T),
+                       ['%10.10f', '%10.10f', '%10.2f', '%s'] +
+                       ['%s'] * chunk.extra.shape[1])
+
+
+def _add_resolver_arguments(parser, many=False):
+    """Adds the options of the name resolver to an `ArgumentParser`."""
+    parser.add_argument('--cache', type=str, default=DEFAULT_CACHE_FN,
+                        help="File in which resolved names are remembered "
+                             "(default: {0})".format(DEFAULT_CACHE_FN))
+    parser.add_argument('--no-cache', dest='cache', action='store_const',
+                        const=None,
+                        help="Do not remember resolved names.")
+    parser.add_argument('--names-table', type=str, default=None,
+                        help="Resolve names using a local comma-separated "
+                             "table of 'name,ra,dec' instead of the CDS "
+                             "name resolver.")
+    if many:
+        parser.add_argument('--max-requests', type=int,
+                            default=DEFAULT_MAX_WORKERS,
+                            help="Number of names resolved at the same time "
+                                 "(default: {0})".format(DEFAULT_MAX_WORKERS))
+
+
+def _make_resolver(args):
+    """Returns the `ConcurrentResolver` configured by the command line."""
+    if args.names_table is None:
+        resolver = SesameResolver()
+    else:
+        resolver = FileResolver(args.names_table)
+    cache = None if args.cache is None else NameCache(args.cache)
+    return ConcurrentResolver(resolver, cache,
+                              getattr(args, 'max_requests', 1))
+
+
+def _getSkyIndex():
     # Temporary disable the logger to avoid the preliminary field warnings
+    # while the footprints are built, but not while the index is built
     logger.disabled = True
-    campaigns_visible = []
-    for c in fields.getFieldNumbers():
-        fovobj = fields.getKeplerFov(c)
-        if onSiliconCheck(ra, dec, fovobj):
-            campaigns_visible.append(c)
-    # Re-enable the logger
-    logger.disabled = True
-    return campaigns_visible
+    try:
+        getCampaignFootprints()
+    finally:
+        # Re-enable the logger
+        logger.disabled = False
+    return getSkyIndex()
 
 
-def findCampaignsByName(target):
+def findCampaignsByName(target, resolver=None):
     """Returns a list of the campaigns that cover a given target.
 
     Parameters
@@ -54,6 +167,10 @@ def findCampaignsByName(target):
     target : str
         Name of the celestial object.
 
+    resolver : object
+        Object with a `resolve(name)` method returning (ra, dec),
+        see the `resolver` module.  Defaults to `resolver.SesameResolver`.
+
     Returns
     -------
     campaigns : list of int
@@ -67,23 +184,17 @@ def findCampaignsByName(target):
     Raises an ImportError if AstroPy is not installed.
     Raises a ValueError if `name` cannot be resolved to coordinates.
     """
-    # Is AstroPy (optional dependency) installed?
+    if resolver is None:
+        resolver = SesameResolver()
+    # Translate the target name into celestial coordinates
     try:
-        from astropy.coordinates import SkyCoord
-        from astropy.coordinates.name_resolve import NameResolveError
-        from astropy.utils.data import conf
-        conf.remote_timeout = 90
+        ra, dec = resolver.resolve(target)
+    # Is AstroPy (optional dependency) installed?
     except ImportError:
         print('Error: AstroPy needs to be installed for this feature.')
         sys.exit(1)
-    # Translate the target name into celestial coordinates
-    try:
-        crd = SkyCoord.from_name(target)
-    except NameResolveError:
-        raise ValueError('Could not find coordinates '
-                         'for target "{0}".'.format(target))
     # Find the campaigns with visibility
-    return findCampaigns(crd.ra.deg, crd.dec.deg), crd.ra.deg, crd.dec.deg
+    return findCampaigns(ra, dec), ra, dec
 
 
 def save_context_plots(ra, dec, targetname=""):
@@ -143,10 +254,12 @@ def K2findCampaigns_byname_main(args=None):
     parser.add_argument('-p', '--plot', action='store_true',
                         help="Produce a plot showing the target position "
                              "with respect to all K2 campaigns.")
+    _add_resolver_arguments(parser)
     args = parser.parse_args(args)
     targetname = args.name[0]
+    resolver = _make_resolver(args)
     try:
-        campaigns, ra, dec = findCampaignsByName(targetname)
+        campaigns, ra, dec = findCampaignsByName(targetname, resolver)
     except ValueError:
         print("Error: could not retrieve coordinates for {0}.".format(targetname))
         print("The target may be unknown or there may be a problem "
@@ -178,29 +291,67 @@ def K2findCampaigns_csv_main(args=None):
                         help="Path to a comma-separated table containing "
                              "columns 'ra,dec,kepmag' (decimal degrees) "
                              "or 'name'.")
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help="Output file name. Use a .npy or .npz extension "
+                             "to write a binary table, in which the "
+                             "'campaigns' column has bit c set for campaign c. "
+                             "Defaults to <input_filename>-K2findCampaigns.csv")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of processes to use; 0 means one per "
+                             "CPU (default: 1)")
+    _add_resolver_arguments(parser, many=True)
     args = parser.parse_args(args)
     input_fn = args.input_filename[0]
-    output_fn = input_fn + '-K2findCampaigns.csv'
+    output_fn = args.output
+    if output_fn is None:
+        output_fn = input_fn + '-K2findCampaigns.csv'
     # First, try assuming the file has the classic "ra,dec,kepmag" format
     try:
-        ra, dec, kepmag = parse_file(input_fn, exit_on_error=False)
-        campaigns = np.array([findCampaigns(ra[idx], dec[idx])
-                              for idx in range(len(ra))])
-        output = np.array([ra, dec, kepmag, campaigns])
-        print("Writing {0}".format(output_fn))
-        np.savetxt(output_fn, output.T, delimiter=', ',
-                   fmt=['%10.10f', '%10.10f', '%10.2f', '%s'])
+        reader = TargetListReader(input_fn)
     # If this fails, assume the file has a single "name" column
     except ValueError:
+        reader = None
+
+    binary = os.path.splitext(output_fn)[1].lower() in BINARY_FORMATS
+    if reader is not None:
+        if binary:
+            out = open_writer(output_fn, FIND_CAMPAIGNS_DTYPE)
+        else:
+            out = open(output_fn, "w")
+        # Load the sky index before any worker processes are forked
+        _getSkyIndex()
+        process = functools.partial(_find_campaigns_chunk, binary=binary)
+        # The table is processed in chunks to keep memory use bounded
+        print("Writing {0}".format(output_fn))
+        with reader, out:
+            for rows in imap_chunks(process, reader, jobs=args.jobs):
+                if binary:
+                    rows['row'] += out.nrows
+                out.write(rows)
+    elif binary:
+        print("Error: binary output is only available for tables "
+              "with 'ra,dec' columns.")
+        sys.exit(1)
+    else:
         names = [name.strip() for name in open(input_fn, "r").readlines()
                  if len(name.strip()) > 0]
+        resolver = _make_resolver(args)
         print("Writing {0}".format(output_fn))
         output = open(output_fn, "w")
-        for target in names:
+        # Names are resolved in batches, so that the results and the
+        # cache are saved as we go
+        for i in range(0, len(names), NAMES_CHUNKSIZE):
+            batch = names[i:i + NAMES_CHUNKSIZE]
             try:
-                campaigns, ra, dec = findCampaignsByName(target)
-            except ValueError:
-                campaigns = []
-            output.write("{0}, {1}\n".format(target, campaigns))
+                positions = resolver.resolve_many(batch)
+            except ImportError:
+                print('Error: AstroPy needs to be installed for this feature.')
+                sys.exit(1)
+            found = [pos for pos in positions if pos is not None]
+            campaigns = iter(findCampaignsList([pos[0] for pos in found],
+                                               [pos[1] for pos in found]))
+            for target, pos in zip(batch, positions):
+                output.write("{0}, {1}\n".format(
+                    target, [] if pos is None else next(campaigns)))
             output.flush()
         output.close()
@@ -3,7 +3,11 @@ The code will accept a file containing a minimum of two columns RA Dec.
 where RA and Dec are in decimal degrees
 """
 from __future__ import division, print_function
+import re
 import sys
+import gzip
+import functools
+from collections import namedtuple
 
 from . import logger
 
@@ -14,11 +18,8 @@ except Exception:
     logger.error('You need numpy installed')
     sys.exit(1)
 
-# Try importing matplotlib
-try:
-    import matplotlib.pyplot as pl
-    got_mpl = True
-    params = {
+# matplotlib is slow to import, so it is only imported by `plot_targets`
+PLOT_PARAMS = {
                 'axes.linewidth': 1.5,
                 'axes.labelsize': 24,
                 'font.family': 'sans-serif',
@@ -27,13 +28,13 @@ try:
                 'xtick.labelsize': 16,
                 'ytick.labelsize': 16,
                 'text.usetex': False,
-             }
-    pl.rcParams.update(params)
-except Exception:
-    logger.warning('You need matplotlib installed to get a plot')
-    got_mpl = False
+              }
 
 from . import fields
+from .catalog import SkyCatalog, asCatalog
+from .rotate2 import vecsFromRaDec
+from .output import open_writer
+from .parallel import imap_chunks
 from . import projection as proj
 from . import DEFAULT_PADDING
 
@@ -60,29 +61,218 @@ def angSepVincenty(ra1, dec1, ra2, dec2):
     return np.degrees(diffpos)
 
 
+# Number of rows read from a target list at a time
+DEFAULT_CHUNKSIZE = 100000
+
+# A chunk of a target list, see `TargetListReader`
+TargetChunk = namedtuple('TargetChunk', ['ra', 'dec', 'mag', 'extra'])
+
+# Columns of the binary (.npy or .npz) output of K2onSilicon,
+# `row` counts the targets in the input table, starting from zero
+SILICON_FLAG_DTYPE = np.dtype([('row', 'i8'),
+                               ('ra', 'f8'),
+                               ('dec', 'f8'),
+                               ('mag', 'f8'),
+                               ('flag', 'i1')])
+
+# Matches empty fields that are followed by another field or the end of the line
+_BLANK_FIELD = re.compile(r',[ \t]*(?=,|\n)')
+_BLANK_FIRST_FIELD = re.compile(r'^[ \t]*(?=,)', re.M)
+
+
+class TargetListReader(object):
+    """Reads a comma-separated table of targets in chunks of fixed size.
+
+    The table needs columns containing the RA and Dec in decimal degrees,
+    and optionally a magnitude.  If the first line is a header, i.e. none
+    of its fields are numbers, the columns are identified by their names:
+    the first column whose name starts with "ra" or "dec" gives the RA or
+    Dec, and the first column whose name contains "mag" gives the magnitude.
+    Otherwise, or if the names are not recognised, the first three columns
+    are RA, Dec and magnitude.  All other columns are passed through as
+    strings.
+
+    Blank fields are read as NaN.  Blank lines and lines starting with
+    "#" are skipped.  Files ending in ".gz" are decompressed on the fly.
+    Quoted fields containing commas are not supported.
+
+    Parameters
+    ----------
+    infile : str
+        Path to the table.
+
+    chunksize : int
+        Maximum number of targets in each chunk.
+
+    Attributes
+    ----------
+    header : list of str or None
+        The column names, if the table has a header.
+
+    extra_names : list of str
+        Names (or column numbers, if there is no header) of the columns
+        that are passed through.
+
+    Examples
+    --------
+    >>> with TargetListReader("targets.csv") as reader:  # doctest: +SKIP
+    ...     for chunk in reader:
+    ...         print(chunk.ra, chunk.dec, chunk.mag, chunk.extra)
+
+    Raises an IOError if the file cannot be read, and a ValueError if it
+    does not contain RA and Dec columns.
+    """
+    def __init__(self, infile, chunksize=DEFAULT_CHUNKSIZE):
+        self.infile = infile
+        self.chunksize = chunksize
+        if infile.endswith('.gz'):
+            # Text mode, i.e. 'rt', only exists in Python 3
+            mode = 'rt' if sys.version_info[0] >= 3 else 'r'
+            self._fh = gzip.open(infile, mode)
+        else:
+            self._fh = open(infile, 'r')
+        try:
+            self._readHeader()
+        except Exception:
+            self.close()
+            raise
+
+    def _readHeader(self):
+        self._pending = self._readLines(1)
+        self.header = None
+        if len(self._pending) == 0:
+            names = []
+        else:
+            names = [f.strip() for f in self._pending[0].split(',')]
+        self.numcols = len(names)
+
+        def is_number(value):
+            try:
+                float(value)
+                return True
+            except ValueError:
+                return False
+
+        if len(names) > 0 and not any(is_number(n) for n in names):
+            self.header = names
+            self._pending = []
+            lower = [n.lower() for n in names]
+            ra_col = [i for i, n in enumerate(lower) if n.startswith('ra')]
+            dec_col = [i for i, n in enumerate(lower) if n.startswith('dec')]
+            mag_col = [i for i, n in enumerate(lower) if 'mag' in n]
+        else:
+            ra_col, dec_col, mag_col = [], [], []
+
+        if len(ra_col) > 0 and len(dec_col) > 0:
+            self.ra_col, self.dec_col = ra_col[0], dec_col[0]
+            self.mag_col = mag_col[0] if len(mag_col) > 0 else None
+        else:
+            self.ra_col, self.dec_col = 0, 1
+            self.mag_col = 2 if self.numcols > 2 else None
+        if self.numcols < 2:
+            raise ValueError("{0} does not have RA and Dec "
+                             "columns".format(self.infile))
+
+        used = [self.ra_col, self.dec_col, self.mag_col]
+        self.extra_cols = [i for i in range(self.numcols) if i not in used]
+        if self.header is None:
+            self.extra_names = [str(i) for i in self.extra_cols]
+        else:
+            self.extra_names = [self.header[i] for i in self.extra_cols]
+
+    def _readLines(self, numlines):
+        """Returns the next numlines lines which are not blank or comments."""
+        lines = []
+        for line in self._fh:
+            stripped = line.strip()
+            if len(stripped) == 0 or stripped.startswith('#'):
+                continue
+            lines.append(line)
+            if len(lines) >= numlines:
+                break
+        return lines
+
+    def __iter__(self):
+        while True:
+            lines = self._pending + self._readLines(self.chunksize -
+                                                    len(self._pending))
+            self._pending = []
+            if len(lines) == 0:
+                break
+            yield self._parseLines(lines)
+
+    def _parseLines(self, lines):
+        text = ''.join(lines)
+        if not text.endswith('\n'):
+            text += '\n'
+        # np.loadtxt does not accept empty numbers
+        text = _BLANK_FIELD.sub(',nan', text)
+        text = _BLANK_FIRST_FIELD.sub('nan', text)
+        # np.loadtxt reads a list of lines as it would a file, whether
+        # they are bytes (Python 2) or unicode (Python 3)
+        rows = text.splitlines()
+
+        numeric = [self.ra_col, self.dec_col]
+        if self.mag_col is not None:
+            numeric.append(self.mag_col)
+        try:
+            values = np.loadtxt(rows, delimiter=',',
+                                usecols=numeric, ndmin=2, comments=None)
+            if len(self.extra_cols) > 0:
+                extra = np.char.strip(
+                            np.loadtxt(rows, delimiter=',',
+                                       usecols=self.extra_cols, dtype=str,
+                                       ndmin=2, comments=None))
+            else:
+                extra = np.empty((len(values), 0), dtype=str)
+        except (ValueError, IndexError) as e:
+            raise ValueError("Could not parse {0}: {1}".format(self.infile, e))
+
+        if self.mag_col is None:
+            mag = np.full(len(values), np.nan)
+        else:
+            mag = values[:, 2]
+        return TargetChunk(values[:, 0], values[:, 1], mag, extra)
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
 def parse_file(infile, exit_on_error=True):
     """Parse a comma-separated file with columns "ra,dec,magnitude".
+
+    See `TargetListReader` for the accepted formats.  Use that class
+    directly to read very large files in chunks.
     """
     try:
-        a, b, mag = np.atleast_2d(
-                            np.genfromtxt(
-                                        infile,
-                                        usecols=[0, 1, 2],
-                                        delimiter=','
-                                        )
-                    ).T
+        with TargetListReader(infile) as reader:
+            chunks = list(reader)
+        if len(chunks) == 0:
+            a = b = mag = np.empty(0)
+        else:
+            a, b, mag = [np.concatenate(col) for col in list(zip(*chunks))[:3]]
     except IOError as e:
         if exit_on_error:
-            logger.error("There seems to be a problem with the input file, "
-                         "the format should be: RA_degrees (J2000), Dec_degrees (J2000), "
-                         "Magnitude. There should be no header, columns should be "
-                         "separated by a comma")
-            sys.exit(1)
+            _input_error()
         else:
             raise e
     return a, b, mag
 
 
+def _input_error():
+    logger.error("There seems to be a problem with the input file, "
+                 "the format should be: RA_degrees (J2000), Dec_degrees (J2000), "
+                 "Magnitude. There may be a header line, columns should be "
+                 "separated by a comma")
+    sys.exit(1)
+
+
 def onSiliconCheck(ra_deg, dec_deg, FovObj, padding_pix=DEFAULT_PADDING):
     """Check a single position."""
     dist = angSepVincenty(FovObj.ra0_deg, FovObj.dec0_deg, ra_deg, dec_deg)
@@ -94,12 +284,15 @@ def onSiliconCheck(ra_deg, dec_deg, FovObj, padding_pix=DEFAULT_PADDING):
 
 
 def onSiliconCheckList(ra_deg, dec_deg, FovObj, padding_pix=DEFAULT_PADDING):
-    """Check a list of positions."""
-    dist = angSepVincenty(FovObj.ra0_deg, FovObj.dec0_deg, ra_deg, dec_deg)
-    mask = (dist < 90.)
-    out = np.zeros(len(dist), dtype=bool)
-    out[mask] = FovObj.isOnSiliconList(ra_deg[mask], dec_deg[mask], padding_pix=padding_pix)
-    return out
+    """Check a list of positions.
+
+    `ra_deg` may also be a `catalog.SkyCatalog`, with `dec_deg` set to
+    `None`, to reuse its unit vectors when checking several campaigns.
+    """
+    # isOnSiliconList() rejects targets far from the boresight itself,
+    # with a cone much narrower than the 90 degrees used by onSiliconCheck
+    return FovObj.isOnSiliconList(asCatalog(ra_deg, dec_deg),
+                                  padding_pix=padding_pix)
 
 
 def nearSiliconCheck(ra_deg, dec_deg, FovObj, max_sep=8.2):
@@ -110,6 +303,14 @@ def nearSiliconCheck(ra_deg, dec_deg, FovObj, max_sep=8.2):
         return False
 
 
+def nearSiliconCheckList(ra_deg, dec_deg, FovObj, max_sep=8.2):
+    """Check a list of positions, or a `catalog.SkyCatalog`."""
+    # dist <= max_sep, compared as cosines to save the arccos
+    boresight = vecsFromRaDec(FovObj.ra0_deg, FovObj.dec0_deg)[0]
+    cosSep = np.dot(asCatalog(ra_deg, dec_deg).vecs, boresight)
+    return cosSep >= np.cos(np.radians(max_sep))
+
+
 def getRaDecRollFromFieldnum(fieldnum):
     """Returns ra, dec, and roll for a campaign.
 
@@ -119,55 +320,157 @@ def getRaDecRollFromFieldnum(fieldnum):
     return (info["ra"], info["dec"], info["roll"])
 
 
-def K2onSilicon(infile, fieldnum, do_nearSiliconCheck=False):
+def K2onSilicon(infile, fieldnum, do_nearSiliconCheck=False, do_plot=True,
+                chunksize=DEFAULT_CHUNKSIZE,
+                output_fn='targets_siliconFlag.csv', jobs=1):
     """Checks whether targets are on silicon during a given campaign.
 
     This function will write a csv table called targets_siliconFlag.csv,
     which details the silicon status for each target listed in `infile`
-    (0 = not on silicon, 2 = on silion).
+    (0 = not on silicon, 2 = on silion).  Any columns of `infile` other
+    than the position and magnitude are copied after the status.
+
+    If `output_fn` ends in .npy or .npz, a binary table with the columns
+    of `SILICON_FLAG_DTYPE` is written instead.  The extra columns of
+    `infile` are not copied to a binary table; the `row` column gives
+    the position of each target in `infile` (counting data rows only).
+
+    The input is processed in chunks, so memory use does not grow with
+    the length of the target list, unless a plot is requested.
 
     Parameters
     ----------
     infile : str
-        Path to a csv table with columns ra_deg,dec_deg,magnitude (no header).
+        Path to a csv table with columns ra_deg,dec_deg,magnitude,
+        see `TargetListReader`.
 
     fieldnum : int
         K2 Campaign number.
 
     do_nearSiliconCheck : bool
         If `True`, targets near (but not on) silicon are flagged with a "1".
+
+    do_plot : bool
+        If `True` (and matplotlib is installed), also plot the targets
+        and the campaign footprint to targets_fov.png.
+
+    chunksize : int
+        Number of targets processed at a time.
+
+    output_fn : str
+        Path of the output table.
+
+    jobs : int
+        Number of processes used to check the chunks; `None` or 0 means
+        one per CPU.  The output is in the same order regardless.
     """
-    ra_sources_deg, dec_sources_deg, mag = parse_file(infile)
-    n_sources = np.shape(ra_sources_deg)[0]
-    if n_sources > 500:
-        logger.warning("Warning: there are {0} sources in your target list, "
-                       "this could take some time".format(n_sources))
+    try:
+        reader = TargetListReader(infile, chunksize=chunksize)
+    except IOError:
+        _input_error()
+
+    # Build the geometry before any worker processes are forked
+    k = fields.getKeplerFov(fieldnum)
+    do_plot = do_plot and _have_matplotlib()
+    plot_positions, plot_onSilicon = [], []
+
+    writer = open_writer(output_fn, SILICON_FLAG_DTYPE,
+                         arrays={'campaign': fieldnum})
+    if writer is None:
+        out = open(output_fn, 'w')
+    else:
+        out = writer
+
+    process = functools.partial(_check_chunk, fieldnum=fieldnum,
+                                do_nearSiliconCheck=do_nearSiliconCheck,
+                                binary=writer is not None)
+    with reader, out:
+        chunks = reader
+        if do_plot:
+            chunks = _keep_positions(reader, plot_positions)
+        for rows, onSilicon in imap_chunks(process, chunks, jobs=jobs):
+            if writer is not None:
+                rows['row'] += writer.nrows
+            out.write(rows)
+            if do_plot:
+                plot_onSilicon.append(onSilicon)
+
+    if do_plot:
+        ra, dec = [np.concatenate(col) for col in zip(*plot_positions)]
+        onSilicon = np.concatenate(plot_onSilicon)
+        plot_targets(k, ra, dec, onSilicon)
+        print('I made two files: {0} and targets_fov.png'.format(output_fn))
+    else:
+        print('I made one file: {0}'.format(output_fn))
+
 
+def _check_chunk(chunk, fieldnum, do_nearSiliconCheck=False, binary=False):
+    """Computes the silicon flags of a `TargetChunk` for `K2onSilicon`.
+
+    This runs in the worker processes, so the flags are also formatted
+    here: as csv text, or as rows of `SILICON_FLAG_DTYPE` numbered
+    from zero if `binary` is `True`.
+
+    Returns
+    -------
+    rows, onSilicon : str or structured array, 1d bool array
+    """
     k = fields.getKeplerFov(fieldnum)
-    raDec = k.getCoordsOfChannelCorners()
-
-    onSilicon = list(
-                    map(
-                        onSiliconCheck,
-                        ra_sources_deg,
-                        dec_sources_deg,
-                        np.repeat(k, len(ra_sources_deg))
-                        )
-                    )
-    onSilicon = np.array(onSilicon, dtype=bool)
+    # Both checks share the unit vectors of the targets
+    cat = SkyCatalog.fromTargetChunk(chunk)
+    onSilicon = onSiliconCheckList(cat, None, k)
 
+    # prints zero if target is not on silicon
+    siliconFlag = np.zeros(len(chunk.ra), dtype=int)
+
+    # print a 1 if target is near but not on silicon
     if do_nearSiliconCheck:
-        nearSilicon = list(
-                        map(
-                            nearSiliconCheck,
-                            ra_sources_deg,
-                            dec_sources_deg,
-                            np.repeat(k, len(ra_sources_deg))
-                            )
-                        )
-        nearSilicon = np.array(nearSilicon, dtype=bool)
-
-    if got_mpl:
+        nearSilicon = nearSiliconCheckList(cat, None, k)
+        siliconFlag[nearSilicon] = 1
+
+    # prints a 2 if target is on silicon
+    siliconFlag[onSilicon] = 2
+
+    if binary:
+        rows = np.empty(len(chunk.ra), dtype=SILICON_FLAG_DTYPE)
+        rows['row'] = np.arange(len(rows))
+        rows['ra'] = chunk.ra
+        rows['dec'] = chunk.dec
+        rows['mag'] = chunk.mag
+        rows['flag'] = siliconFlag
+    else:
+        rows = format_rows([chunk.ra, chunk.dec, chunk.mag, siliconFlag] +
+                           list(chunk.extra.T),
+                           ['%10.10f', '%10.10f', '%10.2f', '%i'] +
+                           ['%s'] * chunk.extra.shape[1])
+    return rows, onSilicon
+
+
+def _keep_positions(reader, positions):
+    """Yields the chunks of `reader`, appending their (ra, dec) to `positions`."""
+    for chunk in reader:
+        positions.append((chunk.ra, chunk.dec))
+        yield chunk
+
+
+def _have_matplotlib():
+    """Returns `True` if matplotlib can be imported."""
+    try:
+        import matplotlib.pyplot
+    except Exception:
+        logger.warning('You need matplotlib installed to get a plot')
+        return False
+    return True
+
+
+def plot_targets(k, ra_sources_deg, dec_sources_deg, onSilicon,
+                 output_fn='targets_fov.png'):
+    """Plots the footprint of a `fov.KeplerFov` and a list of targets.
+
+    The style in `PLOT_PARAMS` is only applied to this plot.
+    """
+    import matplotlib.pyplot as pl
+    with pl.rc_context(PLOT_PARAMS):
         almost_black = '#262626'
         light_grey = np.array([float(248)/float(255)]*3)
         ph = proj.PlateCaree()
@@ -192,27 +495,39 @@ def K2onSilicon(infile, fieldnum, do_nearSiliconCheck=False):
         texts = legend.texts
         for t in texts:
             t.set_color(almost_black)
-        fig.savefig('targets_fov.png', dpi=300)
+        fig.savefig(output_fn, dpi=300)
         pl.close('all')
 
-    # prints zero if target is not on silicon
-    siliconFlag = np.zeros_like(ra_sources_deg)
 
-    # print a 1 if target is near but not on silicon
-    if do_nearSiliconCheck:
-        siliconFlag = np.where(nearSilicon, 1, siliconFlag)
+def write_rows(fh, columns, fmt, delimiter=', '):
+    """Writes columns of values to an open file, one row per line.
 
-    # prints a 2 if target is on silicon
-    siliconFlag = np.where(onSilicon, 2, siliconFlag)
+    Similar to `np.savetxt`, but the columns may have different types.
+
+    Parameters
+    ----------
+    fh : file
+        File opened for writing text.
 
-    outarr = np.array([ra_sources_deg, dec_sources_deg, mag, siliconFlag])
-    np.savetxt('targets_siliconFlag.csv', outarr.T, delimiter=', ',
-               fmt=['%10.10f', '%10.10f', '%10.2f', '%i'])
+    columns : list of array-like
+        The columns, all of the same length.
 
-    if got_mpl:
-        print('I made two files: targets_siliconFlag.csv and targets_fov.png')
-    else:
-        print('I made one file: targets_siliconFlag.csv')
+    fmt : list of str
+        Format of each column, e.g. '%10.2f'.
+    """
+    fh.write(format_rows(columns, fmt, delimiter=delimiter))
+
+
+def format_rows(columns, fmt, delimiter=', '):
+    """Returns columns of values as text, one row per line.
+
+    See `write_rows`.
+    """
+    rowfmt = delimiter.join(fmt) + '\n'
+    # Python scalars are much quicker to format than numpy scalars
+    columns = [col.tolist() if isinstance(col, np.ndarray) else col
+               for col in columns]
+    return ''.join(rowfmt % row for row in zip(*columns))
 
 
 def K2onSilicon_main(args=None):
@@ -225,8 +540,20 @@ def K2onSilicon_main(args=None):
                         help="Name of input csv file with targets, column are "
                              "Ra_degrees, Dec_degrees, Kepmag")
     parser.add_argument('campaign', type=int, help='K2 Campaign number')
+    parser.add_argument('--no-plot', dest='plot', action='store_false',
+                        help="Do not plot the targets to targets_fov.png, "
+                             "which is slow for very long target lists")
+    parser.add_argument('-o', '--output', type=str,
+                        default='targets_siliconFlag.csv',
+                        help="Name of the output table. Use a .npy or .npz "
+                             "extension to write a binary table "
+                             "(default: targets_siliconFlag.csv)")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of processes to use; 0 means one per "
+                             "CPU (default: 1)")
     args = parser.parse_args(args)
-    K2onSilicon(args.csv_file, args.campaign)
+    K2onSilicon(args.csv_file, args.campaign, do_plot=args.plot,
+                output_fn=args.output, jobs=args.jobs)
 
 
 if __name__ == '__main__':
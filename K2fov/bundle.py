@@ -0,0 +1,143 @@
+"""A prebuilt binary bundle of the field of view geometry.
+
+Building the geometry of the focal plane, and of every campaign, from
+scratch takes a noticeable fraction of a second.  This module reads
+precomputed copies of it from `.npy` files in `K2fov/data`, which are
+memory-mapped, so worker processes can load them almost for free.
+
+The bundle contains:
+
+* ``origin``: the channel corner vectors, see `definefov.loadOriginVectors`;
+* ``campaigns``, ``rotations``, ``corners``, ``numchannels``: the
+  output of `footprint.computeCampaignCorners` for every campaign.
+
+The manifest ``k2-geometry.json`` records the SHA-256 hash of the
+campaign parameter file the bundle was built from.  If that file has
+changed since, the per-campaign arrays are ignored and the geometry is
+computed as before.  Call `writeBundle` to rebuild the bundle after
+editing the campaign parameters::
+
+    python -c "from K2fov import bundle; bundle.writeBundle()"
+"""
+from __future__ import print_function
+
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from . import PACKAGEDIR, DEFAULT_PADDING
+
+__all__ = ['getOriginVectors', 'getCampaignCorners', 'writeBundle']
+
+BUNDLE_DIR = os.path.join(PACKAGEDIR, "data")
+MANIFEST_FN = "k2-geometry.json"
+ARRAY_NAMES = ['origin', 'campaigns', 'rotations', 'corners', 'numchannels']
+
+_origin = None
+_campaign_bundle = {}
+
+
+def sha256(filename):
+    """Returns the SHA-256 hash of the contents of a file, in hex."""
+    with open(filename, 'rb') as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def _arrayFilename(name, directory=BUNDLE_DIR):
+    return os.path.join(directory, "k2-geometry-{0}.npy".format(name))
+
+
+def _loadArray(name):
+    return np.load(_arrayFilename(name), mmap_mode='r')
+
+
+def getOriginVectors():
+    """Returns the channel corner vectors, as a read-only array.
+
+    See `definefov.loadOriginVectors`.  Falls back to the values
+    in `definefov` if the bundle is not installed.
+    """
+    global _origin
+    if _origin is None:
+        try:
+            _origin = _loadArray('origin')
+        except IOError:
+            from . import definefov
+            _origin = definefov._originVectorsLiteral()
+            _origin.flags.writeable = False
+    return _origin
+
+
+def _loadCampaignBundle():
+    """Returns the per-campaign arrays of the bundle, or `None` if the
+    bundle is missing or out of date.  The result is cached for as long
+    as the campaign parameter file does not change."""
+    from . import fields
+    fields._checkCampaignFile()
+    stamp = fields._campaign_file_stamp
+    try:
+        return _campaign_bundle[stamp]
+    except KeyError:
+        pass
+
+    result = None
+    try:
+        with open(os.path.join(BUNDLE_DIR, MANIFEST_FN)) as fh:
+            manifest = json.load(fh)
+        digest = sha256(fields.CAMPAIGN_PARAMETERS_FILE)
+        if manifest["campaign_parameters_sha256"] == digest:
+            result = dict(manifest=manifest)
+            for name in ARRAY_NAMES[1:]:
+                result[name] = _loadArray(name)
+    except (IOError, ValueError, KeyError):
+        result = None
+
+    _campaign_bundle.clear()
+    _campaign_bundle[stamp] = result
+    return result
+
+
+def getCampaignCorners(campaigns, padding_pix=DEFAULT_PADDING):
+    """Returns the output of `footprint.computeCampaignCorners` from the
+    bundle, or `None` if the bundle does not hold it."""
+    bundle = _loadCampaignBundle()
+    if bundle is None or bundle["manifest"]["padding_pix"] != padding_pix:
+        return None
+    index = dict((c, i) for i, c in enumerate(bundle["campaigns"].tolist()))
+    try:
+        rows = [index[c] for c in campaigns]
+    except KeyError:
+        return None
+    if len(rows) == 0:
+        return None
+    numChannels = np.asarray(bundle["numchannels"])[rows]
+    corners = np.asarray(bundle["corners"])[rows][:, :numChannels.max()]
+    return np.asarray(bundle["rotations"])[rows], corners, numChannels
+
+
+def writeBundle(directory=BUNDLE_DIR, padding_pix=DEFAULT_PADDING):
+    """Computes the geometry and writes the bundle to `directory`."""
+    from . import fields, definefov
+    from .footprint import computeCampaignCorners
+    campaigns = np.array(fields.getFieldNumbers(), dtype=int)
+    rotations, corners, numChannels = computeCampaignCorners(campaigns,
+                                                             padding_pix)
+    arrays = {'origin': definefov._originVectorsLiteral(),
+              'campaigns': campaigns,
+              'rotations': rotations,
+              'corners': corners,
+              'numchannels': numChannels}
+    for name in ARRAY_NAMES:
+        np.save(_arrayFilename(name, directory), arrays[name])
+
+    manifest = {"campaign_parameters_sha256":
+                    sha256(fields.CAMPAIGN_PARAMETERS_FILE),
+                "padding_pix": padding_pix,
+                "arrays": dict((name, os.path.basename(_arrayFilename(name)))
+                               for name in ARRAY_NAMES)}
+    with open(os.path.join(directory, MANIFEST_FN), 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
@@ -5,18 +5,63 @@ from __future__ import print_function
 import os
 import json
 import numpy as np
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
 
 from . import PACKAGEDIR, logger, getKeplerFov
 
 __all__ = ['inMicrolensRegion', 'pixelInMicrolensRegion']
 
-# Load the JSON file that defines the C9 superstamp
+# The JSON file that defines the C9 superstamp
 SUPERSTAMP_FN = os.path.join(PACKAGEDIR, "data", "k2-c9-microlens-region.json")
-SUPERSTAMP = json.load(open(SUPERSTAMP_FN))
 
 # Late targets
 LATE_TARGETS_FN = os.path.join(PACKAGEDIR, "data", "k2-c9b-late-targets.json")
-LATE_TARGETS = json.load(open(LATE_TARGETS_FN))
+
+# The JSON files are only parsed on first use, see `_loadJson`
+_json_cache = {}
+
+
+def _loadJson(filename):
+    """Returns the parsed contents of a JSON file, reading it only once."""
+    try:
+        return _json_cache[filename]
+    except KeyError:
+        with open(filename) as fh:
+            _json_cache[filename] = json.load(fh)
+        return _json_cache[filename]
+
+
+def getSuperstamp():
+    """Returns the dictionary that defines the C9 superstamp."""
+    return _loadJson(SUPERSTAMP_FN)
+
+
+def getLateTargets():
+    """Returns the dictionary that defines the C9b late target masks."""
+    return _loadJson(LATE_TARGETS_FN)
+
+
+class _LazyJson(Mapping):
+    """Read-only dictionary that parses a JSON file when first accessed."""
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __getitem__(self, key):
+        return _loadJson(self.filename)[key]
+
+    def __iter__(self):
+        return iter(_loadJson(self.filename))
+
+    def __len__(self):
+        return len(_loadJson(self.filename))
+
+
+# Kept for backwards compatibility; prefer `getSuperstamp` and `getLateTargets`
+SUPERSTAMP = _LazyJson(SUPERSTAMP_FN)
+LATE_TARGETS = _LazyJson(LATE_TARGETS_FN)
 
 
 def inMicrolensRegion_main(args=None):
@@ -73,9 +118,10 @@ def pixelInMicrolensRegion(ch, col, row):
     contiguous area of 2.8e6 pixels.
     """
     # First try the superstamp
+    superstamp = getSuperstamp()
     try:
-        vertices_col = SUPERSTAMP["channels"][str(int(ch))]["vertices_col"]
-        vertices_row = SUPERSTAMP["channels"][str(int(ch))]["vertices_row"]
+        vertices_col = superstamp["channels"][str(int(ch))]["vertices_col"]
+        vertices_row = superstamp["channels"][str(int(ch))]["vertices_row"]
         # The point is in one of 5 channels which constitute the superstamp
         # so check if it falls inside the polygon for this channel
         if isPointInsidePolygon(col, row, vertices_col, vertices_row):
@@ -84,7 +130,7 @@ def pixelInMicrolensRegion(ch, col, row):
         pass
 
     # Then try the late target masks
-    for mask in LATE_TARGETS["masks"]:
+    for mask in getLateTargets()["masks"]:
         if mask["channel"] == ch:
             vertices_col = mask["vertices_col"]
             vertices_row = mask["vertices_row"]
@@ -188,37 +234,32 @@ class C9FootprintPlot(object):
         """Plots the coverage of both the channels and the C9 superstamp."""
         fov = getKeplerFov(9)
         # Plot the superstamp
+        superstamp = getSuperstamp()
         superstamp_patches = []
-        for ch in SUPERSTAMP["channels"]:
-            v_col = SUPERSTAMP["channels"][ch]["vertices_col"]
-            v_row = SUPERSTAMP["channels"][ch]["vertices_row"]
-            radec = np.array([
-                                fov.getRaDecForChannelColRow(int(ch),
-                                                             v_col[idx],
-                                                             v_row[idx])
-                                for idx in range(len(v_col))
-                              ])
-            patch = self.ax.fill(radec[:, 0], radec[:, 1],
+        for ch in superstamp["channels"]:
+            v_col = superstamp["channels"][ch]["vertices_col"]
+            v_row = superstamp["channels"][ch]["vertices_row"]
+            ra, dec = fov.getRaDecForChannelColRowList(
+                                        np.repeat(int(ch), len(v_col)),
+                                        v_col, v_row)
+            patch = self.ax.fill(ra, dec,
                                  lw=0, facecolor="#27ae60", zorder=100)
             superstamp_patches.append(patch)
 
         # Plot the late target masks
         late_target_patches = []
-        for mask in LATE_TARGETS["masks"]:
+        for mask in getLateTargets()["masks"]:
             ch = mask["channel"]
             v_col = mask["vertices_col"]
             v_row = mask["vertices_row"]
-            radec = np.array([
-                                fov.getRaDecForChannelColRow(int(ch),
-                                                             v_col[idx],
-                                                             v_row[idx])
-                                for idx in range(len(v_col))
-                              ])
-            patch = self.ax.fill(radec[:, 0], radec[:, 1],
+            ra, dec = fov.getRaDecForChannelColRowList(
+                                        np.repeat(int(ch), len(v_col)),
+                                        v_col, v_row)
+            patch = self.ax.fill(ra, dec,
                                  lw=0, facecolor="#27ae60", zorder=201)
             late_target_patches.append(patch)
             if annotate_late_targets and 'context' not in mask["name"]:
-                self.ax.text(np.mean(radec[:, 0]), np.mean(radec[:, 1]), '  ' + mask["name"],
+                self.ax.text(np.mean(ra), np.mean(dec), '  ' + mask["name"],
                              ha="left", va="center",
                              zorder=950, fontsize=10,
                              color="#c0392b", clip_on=True)
@@ -0,0 +1,127 @@
+"""An array-backed catalogue of sky positions, `SkyCatalog`.
+
+Most batch functions in K2fov start by turning (ra, dec) into unit
+vectors, which costs a handful of sines and cosines per target.  A
+`SkyCatalog` does that once and keeps the result, so a catalogue can be
+tested against many campaigns without repeating the work.
+
+Functions which take ``ra_deg, dec_deg`` arrays also accept a
+`SkyCatalog` in place of ``ra_deg``, with ``dec_deg`` left as `None`:
+
+>>> cat = SkyCatalog(ra, dec)  # doctest: +SKIP
+>>> for c in fields.getFieldNumbers():  # doctest: +SKIP
+...     onSilicon = onSiliconCheckList(cat, None, fields.getKeplerFov(c))
+"""
+import numpy as np
+
+from .rotate2 import vecsFromRaDec
+
+__all__ = ['SkyCatalog', 'asCatalog']
+
+
+class SkyCatalog(object):
+    """A list of sky positions, with their unit vectors.
+
+    The unit vectors are computed when first needed and kept.
+    Slicing a catalogue, e.g. ``cat[1000:2000]``, returns a new
+    `SkyCatalog` whose arrays are views of the original ones, including
+    any unit vectors already computed.
+
+    Parameters
+    ----------
+    ra_deg, dec_deg : array-like
+        Positions in decimal degrees (J2000).
+
+    mag : array-like, optional
+        Magnitude of each target.
+
+    ids : array-like, optional
+        Identifier of each target, e.g. names or EPIC numbers.
+
+    vecs : 2d array, shape (N, 3), optional
+        Precomputed unit vectors, see `rotate2.vecsFromRaDec`.
+
+    Attributes
+    ----------
+    ra, dec : 1d float arrays
+
+    mag, ids : 1d arrays or `None`
+    """
+    def __init__(self, ra_deg, dec_deg, mag=None, ids=None, vecs=None):
+        ra = np.atleast_1d(np.asarray(ra_deg, dtype=float))
+        dec = np.atleast_1d(np.asarray(dec_deg, dtype=float))
+        # Allow a single ra or dec to apply to every target
+        if len(ra) == 1 and len(dec) != 1:
+            ra = np.full(len(dec), ra[0])
+        elif len(dec) == 1 and len(ra) != 1:
+            dec = np.full(len(ra), dec[0])
+        if len(ra) != len(dec):
+            raise ValueError("Input ra and dec arrays must be same length")
+        self.ra = ra
+        self.dec = dec
+        self.mag = None if mag is None else self._column(mag, float)
+        self.ids = None if ids is None else self._column(ids, None)
+        if vecs is not None:
+            vecs = np.asarray(vecs, dtype=float)
+            if vecs.shape != (len(ra), 3):
+                raise ValueError("vecs must have shape (N, 3)")
+        self._vecs = vecs
+
+    def _column(self, values, dtype):
+        values = np.atleast_1d(np.asarray(values, dtype=dtype))
+        if len(values) != len(self.ra):
+            raise ValueError("Every column must have one value per target")
+        return values
+
+    @property
+    def vecs(self):
+        """Unit vectors of the positions, shape (N, 3)."""
+        if self._vecs is None:
+            self._vecs = vecsFromRaDec(self.ra, self.dec)
+        return self._vecs
+
+    def __len__(self):
+        return len(self.ra)
+
+    def __getitem__(self, key):
+        if np.isscalar(key):
+            key = slice(key, key + 1 if key != -1 else None)
+
+        def take(arr):
+            return None if arr is None else arr[key]
+        return SkyCatalog(self.ra[key], self.dec[key], mag=take(self.mag),
+                          ids=take(self.ids), vecs=take(self._vecs))
+
+    def chunks(self, chunkSize):
+        """Yields consecutive slices of at most `chunkSize` targets."""
+        for start in range(0, len(self), chunkSize):
+            yield self[start:start + chunkSize]
+
+    def separation(self, ra0_deg, dec0_deg):
+        """Returns the angular distance of every target from a point,
+        in degrees."""
+        v0 = vecsFromRaDec(ra0_deg, dec0_deg)[0]
+        vecs = self.vecs
+        cosSep = np.dot(vecs, v0)
+        sinSep = np.linalg.norm(np.cross(vecs, v0), axis=-1)
+        return np.degrees(np.arctan2(sinSep, cosSep))
+
+    @classmethod
+    def fromTargetChunk(cls, chunk):
+        """Creates a catalogue from a `K2onSilicon.TargetChunk`.
+
+        The first of the chunk's extra columns, if any, is used as the
+        identifier of each target.
+        """
+        ids = chunk.extra[:, 0] if chunk.extra.shape[1] > 0 else None
+        return cls(chunk.ra, chunk.dec, mag=chunk.mag, ids=ids)
+
+
+def asCatalog(ra_deg, dec_deg=None):
+    """Returns `ra_deg` if it is a `SkyCatalog`, otherwise a new
+    `SkyCatalog` of the positions (ra_deg, dec_deg)."""
+    if isinstance(ra_deg, SkyCatalog):
+        return ra_deg
+    if dec_deg is None:
+        raise TypeError("dec_deg is required unless ra_deg is a SkyCatalog")
+    return SkyCatalog(ra_deg, dec_deg)
@@ -6,6 +6,8 @@ from __future__ import print_function
 
 import numpy as np
 
+from . import bundle
+
 
 def generateVectors():
     """Convert the known ra/decs of the channel corners
@@ -68,6 +70,17 @@ def loadOriginVectors():
     science pixels, the values returned at 5 pixels inside the
     corners of the science collection parts of the CCD (as opposed
     to smear, overscan etc., columns)
+
+    The vectors are read from the prebuilt geometry bundle (see
+    bundle.py). Each call returns a new, writeable, copy.
+    """
+    return np.array(bundle.getOriginVectors())
+
+
+def _originVectorsLiteral():
+    """The values of loadOriginVectors(), as created by generateVectors().
+
+    Only used to build the geometry bundle, or if it is missing.
     """
 
     #Columns are mod, out, channel, x, y, z
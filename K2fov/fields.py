@@ -1,7 +1,12 @@
 """Functions to expose the details of the different K2 Campaign Fields.
 """
 import os
+import copy
 import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
 
 from . import PACKAGEDIR, logger
 from . import fov
@@ -9,17 +14,56 @@ from . import fov
 __all__ = ['getFieldNumbers', 'getFieldInfo', 'getKeplerFov']
 
 
+# All pointing parameters and dates are stored in a JSON file
+CAMPAIGN_PARAMETERS_FILE = os.path.join(PACKAGEDIR, "data",
+                                        "k2-campaign-parameters.json")
+
 _campaign_dict_cache = None
+_campaign_file_stamp = None
+
+# KeplerFov objects are expensive to build, so getKeplerFov() keeps
+# the most recently used ones, keyed by field number.
+FOV_CACHE_SIZE = 64
+_fov_cache = OrderedDict()
+_cache_lock = threading.RLock()
+
+
+def _getCampaignFileStamp():
+    """Returns the (mtime, size) of the campaign parameter file."""
+    st = os.stat(CAMPAIGN_PARAMETERS_FILE)
+    return (st.st_mtime, st.st_size)
+
+
+def _checkCampaignFile():
+    """Empties the caches if the campaign parameter file has changed
+    since it was last read."""
+    global _campaign_dict_cache, _campaign_file_stamp
+    stamp = _getCampaignFileStamp()
+    with _cache_lock:
+        if stamp != _campaign_file_stamp:
+            _campaign_dict_cache = None
+            _fov_cache.clear()
+            _campaign_file_stamp = stamp
+
+
+def clearCache():
+    """Forgets all cached campaign parameters and `fov.KeplerFov` objects."""
+    global _campaign_dict_cache, _campaign_file_stamp
+    with _cache_lock:
+        _campaign_dict_cache = None
+        _campaign_file_stamp = None
+        _fov_cache.clear()
 
 
 def _getCampaignDict():
     """Returns a dictionary specifying the details of all campaigns."""
     global _campaign_dict_cache
-    if _campaign_dict_cache is None:
-        # All pointing parameters and dates are stored in a JSON file
-        fn = os.path.join(PACKAGEDIR, "data", "k2-campaign-parameters.json")
-        _campaign_dict_cache = json.load(open(fn))
-    return _campaign_dict_cache
+    _checkCampaignFile()
+    with _cache_lock:
+        if _campaign_dict_cache is None:
+            with open(CAMPAIGN_PARAMETERS_FILE) as fp:
+                _campaign_dict_cache = json.load(fp)
+        return _campaign_dict_cache
 
 
 def getFieldNumbers():
@@ -67,6 +111,12 @@ def getFieldInfo(fieldnum):
 def getKeplerFov(fieldnum):
     """Returns a `fov.KeplerFov` object for a given campaign.
 
+    The objects are cached, so repeated calls for the same campaign are
+    cheap.  Each call returns a shallow copy of the cached object whose
+    numpy arrays are read-only; changing the pointing or the list of
+    broken channels of the copy does not affect the cache.  The cache
+    is emptied if the campaign parameter file changes on disk.
+
     Parameters
     ----------
     fieldnum : int
@@ -77,6 +127,26 @@ def getKeplerFov(fieldnum):
     fovobj : `fov.KeplerFov` object
         Details the footprint of the requested K2 campaign.
     """
+    _checkCampaignFile()
+    with _cache_lock:
+        try:
+            # Move the entry to the end, i.e. mark it as recently used
+            proto = _fov_cache.pop(fieldnum)
+            _fov_cache[fieldnum] = proto
+        except KeyError:
+            proto = _buildKeplerFov(fieldnum)
+            _fov_cache[fieldnum] = proto
+            while len(_fov_cache) > FOV_CACHE_SIZE:
+                _fov_cache.popitem(last=False)
+
+    fovobj = copy.copy(proto)
+    fovobj.brokenChannels = list(proto.brokenChannels)
+    fovobj.mods = list(proto.mods)
+    return fovobj
+
+
+def _buildKeplerFov(fieldnum):
+    """Returns a new, read-only, `fov.KeplerFov` object for a campaign."""
     info = getFieldInfo(fieldnum)
     ra, dec, scRoll = info["ra"], info["dec"], info["roll"]
     # convert from SC roll to FOV coordinates
@@ -95,4 +165,17 @@ def getKeplerFov(fieldnum):
     if fieldnum == 1000:
         brokenChannels = []
 
-    return fov.KeplerFov(ra, dec, fovRoll, brokenChannels=brokenChannels)
+    fovobj = fov.KeplerFov(ra, dec, fovRoll, brokenChannels=brokenChannels)
+    # Build the lazily computed parts now, so all copies can share them
+    fovobj.getChannelGrid()
+    _freezeArrays(fovobj)
+    _freezeArrays(fovobj.defaultMap)
+    _freezeArrays(fovobj.channelGrid)
+    return fovobj
+
+
+def _freezeArrays(obj):
+    """Marks every numpy array attribute of `obj` as read-only."""
+    for value in vars(obj).values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
@@ -0,0 +1,237 @@
+"""Stacked footprints of many K2 campaigns, for fast campaign membership.
+
+A `CampaignFootprints` object stores the outline of every working
+channel of every campaign as great circle edges on the sky, in one
+contiguous array.  This allows the campaigns covering N targets to be
+found with a few matrix products, rather than by constructing and
+querying a `fov.KeplerFov` for every target and every campaign.
+"""
+import numpy as np
+
+from . import DEFAULT_PADDING
+from . import fields
+from . import bundle
+from .catalog import asCatalog
+
+__all__ = ['CampaignFootprints', 'getCampaignFootprints',
+           'computeCampaignCorners', 'packCampaigns', 'unpackCampaigns']
+
+
+class CampaignFootprints(object):
+    """The on-silicon footprints of a set of campaigns.
+
+    A channel outline drawn on the tangent plane of a Gnomic projection
+    has straight edges, which are great circles on the sky.  Each edge
+    is therefore stored as the unit normal to its great circle, oriented
+    so that the inside of the channel lies on the positive side.  A
+    target with unit vector v is inside a channel when v is on the
+    positive side of all four of its edges, which gives the same
+    answer as `fov.KeplerFov.isOnSiliconList`.
+
+    Parameters
+    ----------
+    campaigns : list of int, optional
+        Field numbers to include.  Defaults to `fields.getFieldNumbers()`.
+
+    padding_pix : float, optional
+        Grow each channel by this many pixels on every side.
+
+    geometry : tuple, optional
+        The output of `computeCampaignCorners` for these campaigns and
+        padding, e.g. read from the `bundle`.  Computed if not given.
+
+    Attributes
+    ----------
+    campaigns : 1d int array
+        Field numbers, in the order of the columns returned by `contains`.
+
+    boresights : 2d array, shape (C, 3)
+        Unit vector of the boresight of each campaign.
+
+    rotations : 3d array, shape (C, 3, 3)
+        The rotation matrix of each campaign's Gnomic projection.
+
+    cosRadius : 1d array, shape (C,)
+        Cosine of the radius of a cone around each boresight which
+        contains every channel of the campaign.
+
+    normals : 4d array, shape (C, 4, K, 3)
+        Normals to the four edges of the K channels of each campaign.
+        Campaigns with fewer than K working channels are padded with
+        zero normals, which nothing is inside.
+    """
+    def __init__(self, campaigns=None, padding_pix=DEFAULT_PADDING,
+                 geometry=None):
+        if campaigns is None:
+            campaigns = fields.getFieldNumbers()
+        self.campaigns = np.array(campaigns, dtype=int)
+        self.padding_pix = padding_pix
+
+        if geometry is None:
+            geometry = computeCampaignCorners(campaigns, padding_pix)
+        self.rotations, corners, numChannels = geometry
+        self.boresights = self.rotations[:, 0]
+
+        self.normals = np.zeros( (len(campaigns), 4, corners.shape[1], 3) )
+        self.cosRadius = np.empty(len(campaigns))
+        for i in range(len(campaigns)):
+            vert = corners[i, :numChannels[i]]
+            n = np.cross(vert, np.roll(vert, -1, axis=1))
+            # Make the centre of each channel lie on the positive side
+            centre = np.sum(vert, axis=1)[:, np.newaxis, :]
+            sign = np.sign(np.sum(n * centre, axis=-1))
+            n *= sign[..., np.newaxis]
+            self.normals[i, :, :len(vert)] = n.transpose(1, 0, 2)
+
+            # A spherical quadrilateral lies within the smallest cone
+            # that contains its vertices.
+            self.cosRadius[i] = np.min(np.dot(vert, self.boresights[i])) \
+                - 1e-9
+
+        # One (3, 4K) matrix per campaign, so a block of targets can be
+        # compared against every edge of a campaign with one product.
+        self._edgeMatrix = np.ascontiguousarray(
+            self.normals.transpose(0, 3, 1, 2).reshape(len(campaigns), 3, -1))
+
+    def contains(self, ra_deg, dec_deg=None, chunkSize=2000):
+        """Which campaigns have each position on silicon?
+
+        Parameters
+        ----------
+        ra_deg, dec_deg : array-like
+            Positions in decimal degrees (J2000).  `ra_deg` may also be
+            a `catalog.SkyCatalog`, with `dec_deg` left as `None`, in
+            which case its cached unit vectors are used.
+
+        chunkSize : int, optional
+            Number of positions compared against the channel edges of a
+            campaign at once, to bound memory use.
+
+        Returns
+        -------
+        onSilicon : 2d bool array, shape (N, C)
+            onSilicon[i, j] is True if position i is on silicon in
+            campaign self.campaigns[j].
+        """
+        vec = asCatalog(ra_deg, dec_deg).vecs
+        numChannels = self.normals.shape[2]
+
+        # Only positions within the cone around a campaign's boresight
+        # are compared against the channel edges of that campaign
+        out = np.dot(vec, self.boresights.T) >= self.cosRadius
+        for j in range(len(self.campaigns)):
+            target = np.nonzero(out[:, j])[0]
+            for start in range(0, len(target), chunkSize):
+                idx = target[start:start + chunkSize]
+                dots = np.dot(vec[idx], self._edgeMatrix[j]) > 0
+                inside = dots[:, :numChannels]
+                for edge in range(1, 4):
+                    inside &= dots[:, edge*numChannels:(edge+1)*numChannels]
+                out[idx, j] = np.any(inside, axis=1)
+        return out
+
+    def getBitmask(self, ra_deg, dec_deg=None, **kwargs):
+        """Returns the result of `contains` packed into integers.
+
+        Bit c of the mask of each position is set if the position is on
+        silicon in campaign c, e.g. a mask of 6 means campaigns 1 and 2.
+
+        Returns
+        -------
+        bitmask : 1d uint64 array
+
+        Raises a ValueError if any of the campaign numbers exceed 63.
+        """
+        onSilicon = self.contains(ra_deg, dec_deg, **kwargs)
+        return packCampaigns(onSilicon, self.campaigns)
+
+    def getCampaignLists(self, ra_deg, dec_deg=None, **kwargs):
+        """Returns a list of the campaigns covering each position."""
+        onSilicon = self.contains(ra_deg, dec_deg, **kwargs)
+        return [self.campaigns[row].tolist() for row in onSilicon]
+
+
+def computeCampaignCorners(campaigns, padding_pix=DEFAULT_PADDING):
+    """Computes the corners of the working channels of each campaign.
+
+    Returns
+    -------
+    rotations : 3d array, shape (C, 3, 3)
+        The rotation matrix of each campaign's Gnomic projection.
+
+    corners : 4d array, shape (C, K, 4, 3)
+        Unit vectors of the four corners of the working channels,
+        padded with zeros for campaigns with fewer than K channels.
+
+    numChannels : 1d int array, shape (C,)
+        Number of working channels of each campaign.
+    """
+    vertices = []
+    rotations = np.empty( (len(campaigns), 3, 3) )
+    for i, c in enumerate(campaigns):
+        fovobj = fields.getKeplerFov(c)
+        channels, polygons = fovobj.getChannelPolygons(padding_pix)
+        working = (channels <= 84) & \
+            ~np.in1d(channels, fovobj.brokenChannels)
+
+        # Gnomic.skyToPix maps the rotated vector (a0, a1, a2) to
+        # (x, y) = (-a1/a0, a2/a0), so (1, -x, y) is parallel to the
+        # rotated vector of a vertex.
+        R = fovobj.defaultMap.Rmatrix
+        poly = polygons[working]
+        aVec = np.stack([np.ones(poly.shape[:2]),
+                         -poly[..., 0], poly[..., 1]], axis=-1)
+        vert = np.dot(aVec, R)
+        vertices.append(vert / np.linalg.norm(vert, axis=-1)[..., np.newaxis])
+        rotations[i] = R
+
+    numChannels = np.array([len(v) for v in vertices], dtype=int)
+    corners = np.zeros( (len(campaigns), max(numChannels), 4, 3) )
+    for i, vert in enumerate(vertices):
+        corners[i, :len(vert)] = vert
+    return rotations, corners, numChannels
+
+
+def packCampaigns(onSilicon, campaigns):
+    """Packs an (N, C) boolean membership matrix into an N element
+    uint64 array, in which bit c is set for campaign c."""
+    campaigns = np.asarray(campaigns)
+    if np.any((campaigns < 0) | (campaigns > 63)):
+        raise ValueError("Campaign numbers must be between 0 and 63 "
+                         "to be stored in a 64 bit mask")
+    bits = np.left_shift(np.uint64(1), campaigns.astype(np.uint64))
+    return np.bitwise_or.reduce(np.where(onSilicon, bits, np.uint64(0)),
+                                axis=1)
+
+
+def unpackCampaigns(bitmask):
+    """Returns the list of campaigns set in a bitmask from `packCampaigns`."""
+    bitmask = int(bitmask)
+    return [c for c in range(64) if bitmask & (1 << c)]
+
+
+_footprints_cache = {}
+
+
+def getCampaignFootprints(padding_pix=DEFAULT_PADDING):
+    """Returns a `CampaignFootprints` object for all campaigns.
+
+    The object is built on first use, and rebuilt if the campaign
+    parameter file changes.
+    """
+    # Reading the campaign dictionary empties the caches in `fields`
+    # if the file has changed
+    campaigns = tuple(fields.getFieldNumbers())
+    key = (campaigns, padding_pix, fields._campaign_file_stamp)
+    try:
+        return _footprints_cache[key]
+    except KeyError:
+        pass
+    # The prebuilt bundle saves computing the corners of every campaign
+    geometry = bundle.getCampaignCorners(campaigns, padding_pix)
+    footprints = CampaignFootprints(campaigns, padding_pix=padding_pix,
+                                    geometry=geometry)
+    for stale in [k for k in _footprints_cache if k[2] != key[2]]:
+        del _footprints_cache[stale]
+    _footprints_cache[key] = footprints
+    return footprints
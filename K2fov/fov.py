@@ -2,18 +2,16 @@
 """
 import numpy as np
 
-try:
-    import matplotlib.pyplot as mp
-    import matplotlib
-except ImportError:
-    pass
+# matplotlib is slow to import, so it is only imported by the functions
+# that plot, when they are first called
 
 from . import projection as proj
 from . import rotate2 as r
 from . import greatcircle as gcircle
 from . import definefov
+from .catalog import asCatalog
 
-from . import DEFAULT_PADDING
+from . import DEFAULT_PADDING, logger
 
 
 """
@@ -145,6 +143,11 @@ class KeplerFov():
         t = self.computePointing(ra_deg, dec_deg, roll_deg)
         self.currentRaDec = t
         self.defaultMap = proj.Gnomic(ra_deg, dec_deg)
+        self.channelTable = self.computeChannelTable()
+        # The channel lookup grid is built on first use, see getChannelGrid()
+        self.channelGrid = None
+        # Likewise for the on-silicon grids, see getSiliconGrid()
+        self.siliconGrids = {}
 
         self.ra0_deg = ra_deg
         self.dec0_deg = dec_deg
@@ -162,9 +165,10 @@ class KeplerFov():
 
         R = np.dot(Rslew, Rrotate)
 
+        # Rotate every corner vector at once. Each row is a vector, so
+        # post-multiply by the transpose of R.
         slew = self.origin*1
-        for i, row in enumerate(self.origin):
-            slew[i, 3:6] = np.dot(R, row[3:6])
+        slew[:, 3:6] = np.dot(self.origin[:, 3:6], R.transpose())
 
         if cartesian is False:
             slew = self.getRaDecs(slew)
@@ -176,10 +180,99 @@ class KeplerFov():
         raDecOut = np.empty( (len(mods), 5))
         raDecOut[:,0:3] = mods[:,0:3]
 
-        for i, row in enumerate(mods):
-            raDecOut[i, 3:5] = r.raDecFromVec(row[3:6])
+        r.raDecsFromVecs(mods[:, 3:6], out=raDecOut[:, 3:5])
         return raDecOut
 
+    def computeChannelTable(self):
+        """Compute the projected geometry of every channel.
+
+        The corners of all channels are projected onto the tangent
+        plane of self.defaultMap in a single call, and the basis
+        vectors used by the sky <--> pixel code are stored in a
+        structured array indexed by channel number (row 0 is unused
+        and filled with NaNs).
+
+        Returns:
+        A numpy structured array with fields
+        corners     (4,2) The projected corners of the channel
+        vZero       (2,) Projected position of the channel origin
+        vCol        (2,) Vector in the increasing column direction
+        vRow        (2,) Vector in the increasing row direction
+        colNorm2    |vCol|^2
+        rowNorm2    |vRow|^2
+        """
+        radec = self.currentRaDec
+        x, y = self.defaultMap.skyToPix(radec[:, 3], radec[:, 4])
+
+        # Each channel is described by four consecutive rows
+        channels = radec[::4, 2].astype(int)
+        corners = np.empty( (len(channels), 4, 2) )
+        corners[:, :, 0] = x.reshape(-1, 4)
+        corners[:, :, 1] = y.reshape(-1, 4)
+
+        dtype = [('corners', float, (4, 2)),
+                 ('vZero', float, (2,)),
+                 ('vCol', float, (2,)),
+                 ('vRow', float, (2,)),
+                 ('colNorm2', float),
+                 ('rowNorm2', float)]
+        table = np.empty(channels.max() + 1, dtype=dtype)
+        for name in table.dtype.names:
+            table[name] = np.nan
+
+        vZero = corners[:, 0, :]
+        vCol = corners[:, 1, :] - vZero
+        vRow = corners[:, 3, :] - vZero
+        table['corners'][channels] = corners
+        table['vZero'][channels] = vZero
+        table['vCol'][channels] = vCol
+        table['vRow'][channels] = vRow
+        table['colNorm2'][channels] = np.sum(vCol**2, axis=1)
+        table['rowNorm2'][channels] = np.sum(vRow**2, axis=1)
+        return table
+
+    def getChannelGeometry(self, ch):
+        """Look up the rows of self.channelTable for one or more channels.
+
+        Raises a ValueError if any of the channels are unknown
+        """
+        ch = np.asarray(ch).astype(int)
+        table = self.channelTable
+
+        flat = np.atleast_1d(ch)
+        valid = (flat >= 1) & (flat < len(table))
+        valid[valid] = np.isfinite(table['colNorm2'][flat[valid]])
+        if not np.all(valid):
+            raise ValueError("%i is not a valid channel number" \
+                % (flat[~valid][0]))
+        return table[ch]
+
+    def getChannelGrid(self):
+        """Return the `ChannelGrid` index of the channel corners
+        for the current pointing, building it if necessary.
+        """
+        if self.channelGrid is None:
+            corners = self.channelTable['corners']
+            channels = np.where(np.isfinite(self.channelTable['colNorm2']))[0]
+            self.channelGrid = ChannelGrid(corners[channels].reshape(-1, 2),
+                                           np.repeat(channels, 4))
+        return self.channelGrid
+
+    def getSiliconGrid(self, padding_pix=DEFAULT_PADDING):
+        """Return the `SiliconGrid` of the working channels, grown by
+        padding_pix pixels, for the current pointing, building it if
+        necessary.
+        """
+        key = (padding_pix, tuple(sorted(self.brokenChannels)))
+        if key not in self.siliconGrids:
+            channels, polygons = self.getChannelPolygons(padding_pix)
+            # Broken channels and the Fine Guidance Sensors (channels 85-88)
+            # are never "on silicon"
+            working = (channels <= 84) & \
+                ~np.in1d(channels, self.brokenChannels)
+            self.siliconGrids[key] = SiliconGrid(polygons[working])
+        return self.siliconGrids[key]
+
     def getCoordsOfChannelCorners(self):
         """Get ra/decs of corners of channels.
 
@@ -212,74 +305,229 @@ class KeplerFov():
     # Sky -> pixel code
     ###
 
-    def isOnSiliconList(self, ra_deg, dec_deg, padding_pix=DEFAULT_PADDING):
-        """similar to isOnSilicon() but takes lists as input"""
-        ch, col, row = self.getChannelColRowList(ra_deg, dec_deg)
-        out = np.zeros(len(ch), dtype=bool)
-        for channel in set(ch):
-            mask = (ch == channel)
-            if channel in self.brokenChannels:
-                continue
-            if channel > 84:
-                continue
-            out[mask] = self.colRowIsOnSciencePixelList(col[mask], row[mask], padding_pix)
+    def isOnSiliconList(self, ra_deg, dec_deg=None,
+                        padding_pix=DEFAULT_PADDING):
+        """similar to isOnSilicon() but takes lists, or a SkyCatalog,
+        as input
+
+        A target is on silicon if it lies inside the science pixels of
+        a working channel, grown by padding_pix pixels on every side.
+
+        Targets outside the cone that encloses every channel are
+        rejected with a single dot product, before being projected.
+        The rest are looked up in a SiliconGrid, and only those close
+        to the edge of a channel are compared against the outline of
+        every channel.
+        """
+        cat = asCatalog(ra_deg, dec_deg)
+        grid = self.getSiliconGrid(padding_pix)
+        out = np.zeros(len(cat), dtype=bool)
+
+        # The furthest point of a channel from the tangent point is one
+        # of its corners. A small margin allows for rounding.
+        maxAngle = np.arctan(grid.maxRadius) + 1e-6
+        boresight = r.vecsFromRaDec(self.ra0_deg, self.dec0_deg)[0]
+        inCone = np.nonzero(np.dot(cat.vecs, boresight) >= np.cos(maxAngle))[0]
+        if len(inCone) == 0:
+            return out
+
+        x, y = self.defaultMap.skyToPix(cat[inCone])
+        state = grid.classify(x, y)
+        out[inCone] = (state == SiliconGrid.INSIDE)
+
+        edge = (state == SiliconGrid.EDGE)
+        out[inCone[edge]] = \
+            findContainingPolygon(x[edge], y[edge], grid.polygons) >= 0
         return out
 
-    def getChannelColRowList(self, ra, dec, wantZeroOffset=False,
+    def getChannelColRowList(self, ra, dec=None, wantZeroOffset=False,
                          allowIllegalReturnValues=True):
-        """similar to getChannelColRow() but takes lists as input"""
-        try:
-            ch = self.pickAChannelList(ra, dec)
-        except ValueError:
-            logger.warning("WARN: %.7f %.7f not on any channel" % (ra, dec))
-            return (0, 0, 0)
+        """similar to getChannelColRow() but takes lists, or a
+        SkyCatalog, as input
+
+        All targets are projected once, and the basis vectors of each
+        target's channel are gathered from self.channelTable, so the
+        whole batch is converted with a handful of array operations.
+        """
+        cat = asCatalog(ra, dec)
+        ra, dec = cat.ra, cat.dec
+        x, y = self.defaultMap.skyToPix(cat)
+        ch = self.pickAChannelFromProjectedList(x, y)
+        col, row = self.getColRowFromProjectedList(x, y, ch)
+
+        if not allowIllegalReturnValues:
+            bad = ~self.colRowIsOnSciencePixelList(col, row)
+            if np.any(bad):
+                i = np.where(bad)[0][0]
+                msg = "Request position %7f %.7f " % (ra[i], dec[i])
+                msg += "does not lie on science pixels for channel %i " % (ch[i])
+                msg += "[ %.1f %.1f]" % (col[i], row[i])
+                raise ValueError(msg)
+
+        if not wantZeroOffset:
+            col += 1
+            row += 1
 
-        col = np.zeros(len(ch))
-        row = np.zeros(len(ch))
-        for channel in set(ch):
-            mask = (ch == channel)
-            col[mask], row[mask] = self.getColRowWithinChannelList(ra[mask], dec[mask], channel, 
-                                                        wantZeroOffset, allowIllegalReturnValues)
         return (ch, col, row)
 
-    def pickAChannelList(self, ra_deg, dec_deg):
-        """Similar to pickAChannel() but takes lists as input.
+    def pickAChannelList(self, ra_deg, dec_deg=None):
+        """Similar to pickAChannel() but takes lists, or a SkyCatalog,
+        as input.
 
-        This will require AstroPy to be installed.
+        Distances to the channel corners are measured on the tangent
+        plane of self.defaultMap rather than on the sky, which makes
+        no practical difference close to the boresight.
         """
-        try:
-            from astropy.coordinates import SkyCoord
-            from astropy import units as u
-        except ImportError:
-            raise ImportError("AstroPy needs to be installed to use this feature.")
-        cRa = self.currentRaDec[:, 3]  # Ra of each channel corner
-        cDec = self.currentRaDec[:, 4]  # dec of each channel corner
-        catalog = SkyCoord(cRa*u.deg, cDec*u.deg)
-        position = SkyCoord(ra_deg*u.deg, dec_deg*u.deg)
-        idx, _, _ = position.match_to_catalog_sky(catalog)
-        return self.currentRaDec[idx, 2]
+        cat = asCatalog(ra_deg, dec_deg)
+        x, y = self.defaultMap.skyToPix(cat, catchInvalid=False)
+        projectable = self.defaultMap.isProjectable(cat)
+        return self.pickAChannelFromProjectedList(x, y, projectable)
+
+    def pickAChannelFromProjectedList(self, x, y, projectable=None):
+        """Returns the channel containing each position (x, y) on the
+        tangent plane of self.defaultMap.
+
+        Positions not inside any channel are given the channel with
+        the closest corner. Positions flagged as not projectable
+        (see Gnomic.isProjectable) are never considered to be inside
+        a channel.
+        """
+        ch = self.getContainingChannelFromProjectedList(x, y)
+        if projectable is not None:
+            ch[~projectable] = 0
 
-    def getColRowWithinChannelList(self, ra, dec, ch, wantZeroOffset=False,
-                               allowIllegalReturnValues=True):
-        """similar to getColRowWithinChannel() but takes lists as input"""
-        x, y = self.defaultMap.skyToPix(ra, dec)
-        kepModule = self.getChannelAsPolygon(ch)
-        r = np.array(list(zip(x, y))) - kepModule.polygon[0, :]
+        missed = (ch == 0)
+        if np.any(missed):
+            grid = self.getChannelGrid()
+            idx = grid.getNearestCorner(x[missed], y[missed])
+            ch[missed] = grid.channels[idx]
+        return ch
+
+    def getContainingChannelList(self, ra_deg, dec_deg=None, padding_pix=0):
+        """Returns the channel whose pixels contain each (ra, dec) coordinate.
 
-        v1 = kepModule.polygon[1, :] - kepModule.polygon[0, :]
-        v3 = kepModule.polygon[3, :] - kepModule.polygon[0, :]
+        Unlike pickAChannelList(), this is an exact point-in-polygon
+        test against every channel, so results near the edges of
+        channels do not depend on which corner happens to be closest.
 
-        colFrac = np.dot(r, v1) / np.linalg.norm(v1)**2
-        rowFrac = np.dot(r, v3) / np.linalg.norm(v3)**2
+        Inputs:
+        ra_deg, dec_deg (arrays) Coordinates to classify. ra_deg may
+                        also be a SkyCatalog, with dec_deg left as None.
+        padding_pix     (float) Grow each channel by this many pixels
+                        on every side.
+
+        Returns:
+        An integer array of channel numbers. Zero indicates the
+        coordinate is not on any channel.
+        """
+        cat = asCatalog(ra_deg, dec_deg)
+        x, y = self.defaultMap.skyToPix(cat, catchInvalid=False)
+        ch = self.getContainingChannelFromProjectedList(x, y, padding_pix)
+        ch[~self.defaultMap.isProjectable(cat)] = 0
+        return ch
+
+    def getContainingChannelFromProjectedList(self, x, y, padding_pix=0):
+        """similar to getContainingChannelList(), but takes positions
+        on the tangent plane of self.defaultMap as input"""
+        channels, polygons = self.getChannelPolygons(padding_pix)
+        idx = findContainingPolygon(x, y, polygons)
+        return np.where(idx >= 0, channels[idx], 0)
+
+    def getChannelPolygons(self, padding_pix=0):
+        """Returns the outline of every channel on the tangent plane.
+
+        The outlines trace the edges of the pixel ranges accepted
+        by colRowIsOnSciencePixel() (or colRowIsOnFgsPixel() for
+        channels 85-88), computed with the channel's basis vectors,
+        so a point is inside a polygon exactly when its (col, row)
+        is within those ranges.
+
+        Inputs:
+        padding_pix (float) Grow each outline by this many pixels
+                    on every side.
+
+        Returns:
+        channels    (1d int array) Channel numbers
+        polygons    (3d array) Shape (numChannels, 4, 2). The vertices
+                    of each outline on the tangent plane.
+        """
+        table = self.channelTable
+        channels = np.where(np.isfinite(table['colNorm2']))[0]
+        geom = table[channels]
+        isFgs = channels > 84
+        pad = padding_pix
+
+        # Edges of the pixel ranges in one-offset pixel coordinates,
+        # converted to fractions of the channel basis vectors.
+        # See getColRowWithinChannel() and getColRowWithinFgsCh()
+        colLwr = np.full(len(channels), 12.) - pad - 1
+        colUpr = np.where(isFgs, 547., 1111.) + pad - 1
+        rowLwr = np.where(isFgs, 0., 20.) - pad - 1
+        rowUpr = np.where(isFgs, 527., 1043.) + pad - 1
+
+        colFrac = np.where(isFgs, [colLwr / 547., colUpr / 547.],
+                           [(colLwr-17.) / (1106.-17.), (colUpr-17.) / (1106.-17.)])
+        rowFrac = np.where(isFgs, [rowLwr / 527., rowUpr / 527.],
+                           [(rowLwr-25.) / (1038.-25.), (rowUpr-25.) / (1038.-25.)])
+
+        # Vertices go in the same order as the corners of the channel.
+        # (col, row) are found by projecting onto vCol and vRow, which
+        # are not quite perpendicular, so each vertex solves
+        # r.vCol = colFrac*|vCol|^2 and r.vRow = rowFrac*|vRow|^2
+        cIdx = [0, 1, 1, 0]
+        rIdx = [0, 0, 1, 1]
+        b = np.empty( (len(channels), 4, 2) )
+        b[:, :, 0] = colFrac[cIdx].T * geom['colNorm2'][:, np.newaxis]
+        b[:, :, 1] = rowFrac[rIdx].T * geom['rowNorm2'][:, np.newaxis]
+        basis = np.stack([geom['vCol'], geom['vRow']], axis=1)
+        r = np.linalg.solve(basis[:, np.newaxis], b[..., np.newaxis])
+
+        polygons = geom['vZero'][:, np.newaxis, :] + r[..., 0]
+        return channels, polygons
+
+    def getColRowFromProjectedList(self, x, y, ch):
+        """Convert positions on the tangent plane of self.defaultMap
+        into zero-offset (col, row) within the given channel(s).
+
+        Inputs:
+        x, y    (arrays) Projected positions, e.g from defaultMap.skyToPix()
+        ch      (int or array) Channel of every position. A single channel
+                applies to all positions.
+
+        Returns:
+        A tuple of two arrays, (col, row)
+        """
+        geom = self.getChannelGeometry(ch)
+        vZero = geom['vZero']
+        vCol = geom['vCol']
+        vRow = geom['vRow']
+
+        rx = x - vZero[..., 0]
+        ry = y - vZero[..., 1]
+
+        # Divide by |v|^2 because you're normalising v and r
+        colFrac = (rx*vCol[..., 0] + ry*vCol[..., 1]) / geom['colNorm2']
+        rowFrac = (rx*vRow[..., 0] + ry*vRow[..., 1]) / geom['rowNorm2']
 
+        # See notes in getColRowWithinChannel for these magic numbers
         col = colFrac*(1106-17) + 17
         row = rowFrac*(1038-25) + 25
+        return (col, row)
+
+    def getColRowWithinChannelList(self, ra, dec, ch, wantZeroOffset=False,
+                               allowIllegalReturnValues=True):
+        """similar to getColRowWithinChannel() but takes lists as input"""
+        ra, dec = self.defaultMap.parseInputs(ra, dec)
+        x, y = self.defaultMap.skyToPix(ra, dec)
+        col, row = self.getColRowFromProjectedList(x, y, ch)
 
         if not allowIllegalReturnValues:
-            if not self.colRowIsOnSciencePixel(col, row):
-                msg = "Request position %7f %.7f " % (ra, dec)
+            bad = ~self.colRowIsOnSciencePixelList(col, row)
+            if np.any(bad):
+                i = np.where(bad)[0][0]
+                msg = "Request position %7f %.7f " % (ra[i], dec[i])
                 msg += "does not lie on science pixels for channel %i " % (ch)
-                msg += "[ %.1f %.1f]" % (col, row)
+                msg += "[ %.1f %.1f]" % (col[i], row[i])
                 raise ValueError(msg)
 
         if not wantZeroOffset:
@@ -290,13 +538,10 @@ class KeplerFov():
 
     def colRowIsOnSciencePixelList(self, col, row, padding=DEFAULT_PADDING):
         """similar to colRowIsOnSciencePixelList() but takes lists as input"""
-        out = np.ones(len(col), dtype=bool)
-        col_arr = np.array(col)
-        row_arr = np.array(row)
-        mask = np.bitwise_or(col_arr < 12. - padding, col_arr > 1111 + padding)
-        out[mask] = False
-        mask = np.bitwise_or(row_arr < 20. - padding, row_arr > 1043 + padding)
-        out[mask] = False
+        col = np.asarray(col)
+        row = np.asarray(row)
+        out = (col >= 12. - padding) & (col <= 1111 + padding)
+        out &= (row >= 20. - padding) & (row <= 1043 + padding)
         return out
 
     def isOnSilicon(self, ra_deg, dec_deg, padding_pix=DEFAULT_PADDING):
@@ -316,15 +561,11 @@ class KeplerFov():
             inaccuracy in `K2fov` that results from e.g. the lack of optical
             distortion modeling.
         """
-        ch, col, row = self.getChannelColRow(ra_deg, dec_deg)
-        # Modules 3 and 7 are no longer operational
-        if ch in self.brokenChannels:
-            return False
-        # K2fov encodes the Fine Guidance Sensors (FGS) as
-        # "channel" numbers 85-88; they are not science CCDs.
-        if ch > 84:
-            return False
-        return self.colRowIsOnSciencePixel(col, row, padding_pix)
+        # Broken channels (e.g. modules 3 and 7) are no longer operational,
+        # and the Fine Guidance Sensors (FGS), which K2fov encodes as
+        # "channel" numbers 85-88, are not science CCDs.
+        # isOnSiliconList() excludes both.
+        return bool(self.isOnSiliconList([ra_deg], [dec_deg], padding_pix)[0])
 
     def getChannelColRow(self, ra, dec, wantZeroOffset=False,
                          allowIllegalReturnValues=True):
@@ -343,19 +584,14 @@ class KeplerFov():
         return (ch, col, row)
 
     def pickAChannel(self, ra_deg, dec_deg):
-        """Returns the channel number closest to a given (ra, dec) coordinate.
-        """
-        # Could improve speed by doing this in the projection plane
-        # instead of sky coords
-        cRa = self.currentRaDec[:, 3]  # Ra of each channel corner
-        cDec = self.currentRaDec[:, 4]  # dec of each channel corner
-
-        dist = cRa * 0
-        for i in range(len(dist)):
-            dist[i] = gcircle.sphericalAngSep(cRa[i], cDec[i], ra_deg, dec_deg)
+        """Returns the channel number containing a given (ra, dec) coordinate.
 
-        i = np.argmin(dist)
-        return self.currentRaDec[i, 2]
+        If the coordinate is not inside any channel, the channel with
+        the closest corner is returned.
+        """
+        # Delegate to the list version, so that the two always agree on
+        # which corner is closest
+        return int(self.pickAChannelList([ra_deg], [dec_deg])[0])
 
 
     def getColRowWithinChannel(self, ra, dec, ch, wantZeroOffset=False,
@@ -364,15 +600,12 @@ class KeplerFov():
         """
         # How close is a given ra/dec to the origin of a KeplerModule?
         x, y = self.defaultMap.skyToPix(ra, dec)
-        kepModule = self.getChannelAsPolygon(ch)
-        r = np.array([x[0],y[0]]) - kepModule.polygon[0, :]
-
-        v1 = kepModule.polygon[1, :] - kepModule.polygon[0, :]
-        v3 = kepModule.polygon[3, :] - kepModule.polygon[0, :]
+        geom = self.getChannelGeometry(ch)
+        r = np.array([x[0],y[0]]) - geom['vZero']
 
         # Divide by |v|^2 because you're normalising v and r
-        colFrac = np.dot(r, v1) / np.linalg.norm(v1)**2
-        rowFrac = np.dot(r, v3) / np.linalg.norm(v3)**2
+        colFrac = np.dot(r, geom['vCol']) / geom['colNorm2']
+        rowFrac = np.dot(r, geom['vRow']) / geom['rowNorm2']
 
         # This is where it gets a little hairy. The channel "corners"
         # supplied to me actually represent points 5x5 pixels inside
@@ -422,14 +655,11 @@ class KeplerFov():
         Returns col and row of the position.
         """
         x, y = self.defaultMap.skyToPix(ra, dec)
-        kepModule = self.getChannelAsPolygon(ch)
-        r = np.array([x[0],y[0]]) - kepModule.polygon[0,:]
-
-        v1 = kepModule.polygon[1,:] - kepModule.polygon[0,:]
-        v3 = kepModule.polygon[3,:] - kepModule.polygon[0,:]
+        geom = self.getChannelGeometry(ch)
+        r = np.array([x[0],y[0]]) - geom['vZero']
 
-        colFrac = np.dot(r, v1) / np.linalg.norm(v1)**2
-        rowFrac = np.dot(r, v3) / np.linalg.norm(v3)**2
+        colFrac = np.dot(r, geom['vCol']) / geom['colNorm2']
+        rowFrac = np.dot(r, geom['vRow']) / geom['rowNorm2']
 
         col = colFrac*(547)
         row = rowFrac*(527)
@@ -471,37 +701,52 @@ class KeplerFov():
     ###
     # Pixel --> sky
     ###
-    def getRaDecForChannelColRow(self, ch, col, row, oneOffsetPixels=True):
+    def getRaDecForChannelColRowList(self, ch, col, row, oneOffsetPixels=True):
+        """similar to getRaDecForChannelColRow() but takes lists as input
 
-        # To FGS channels correctly
-        if ch > 84:
-            return self.getRaDecForFgsChannelColRow(ch, col, row,\
-                oneOffsetPixels)
+        Science and FGS channels can be mixed in the same call.
+
+        Returns:
+        A tuple of two numpy arrays, (ra_deg, dec_deg)
+        """
+        ch = np.atleast_1d(ch).astype(int)
+        col = np.atleast_1d(col).astype(float)
+        row = np.atleast_1d(row).astype(float)
+        if not (len(ch) == len(col) == len(row)):
+            raise ValueError("Input ch, col and row arrays must be same length")
 
         if oneOffsetPixels:
-            col -= 1
-            row -= 1
+            col = col - 1
+            row = row - 1
 
         # Convert col row to colFrac, rowFrac
-        # See notes in getColRowWithinChannel
-        colFrac = (col-17.) / (1106.-17.)
-        rowFrac = (row-25.) / (1038.-25.)
+        # See notes in getColRowWithinChannel and
+        # getRaDecForFgsChannelColRow
+        isFgs = ch > 84
+        colFrac = np.where(isFgs, col / 547., (col-17.) / (1106.-17.))
+        rowFrac = np.where(isFgs, row / 527., (row-25.) / (1038.-25.))
+
+        # Gather the basis vectors of each point's channel, then work out
+        # where on the projected plane every col,row lies
+        geom = self.getChannelGeometry(ch)
+        vZero = geom['vZero']
+        vCol = geom['vCol']
+        vRow = geom['vRow']
+        x = vZero[:, 0] + colFrac*vCol[:, 0] + rowFrac*vRow[:, 0]
+        y = vZero[:, 1] + colFrac*vCol[:, 1] + rowFrac*vRow[:, 1]
+
+        # A single call to pixToSky converts the whole batch
+        return self.defaultMap.pixToSky(x, y)
 
-        # Get basis vectors for channel. vZero is vector close
-        # to readout of chip (c,r) = (0,0)
-        # vCol is a vector in increasing column direction
-        kepModule = self.getChannelAsPolygon(ch)
-        vZero = kepModule.polygon[0,:]
-        vCol = kepModule.polygon[1,:] - vZero
-        vRow = kepModule.polygon[3,:] - vZero
-
-        # Where on the projected plane does col,row lie?
-        projectionXy = vZero + (colFrac*vCol) + (rowFrac*vRow)
+    def getRaDecForChannelColRow(self, ch, col, row, oneOffsetPixels=True):
 
-        # Call pixToSky
-        x, y = projectionXy
-        a, d = self.defaultMap.pixToSky(x, y)
+        # To FGS channels correctly
+        if ch > 84:
+            return self.getRaDecForFgsChannelColRow(ch, col, row,\
+                oneOffsetPixels)
 
+        a, d = self.getRaDecForChannelColRowList([ch], [col], [row],
+                                                 oneOffsetPixels)
         return [a[0], d[0]]
 
     def getRaDecForFgsChannelColRow(self, ch, col, row, oneOffsetPixels=True):
@@ -517,10 +762,10 @@ class KeplerFov():
         # Get basis vectors for channel. vZero is vector close
         # to readout of chip (c,r) = (0,0)
         # vCol is a vector in increasing column direction
-        kepModule = self.getChannelAsPolygon(ch)
-        vZero = kepModule.polygon[0,:]
-        vCol = kepModule.polygon[1,:] - vZero
-        vRow = kepModule.polygon[3,:] - vZero
+        geom = self.getChannelGeometry(ch)
+        vZero = geom['vZero']
+        vCol = geom['vCol']
+        vRow = geom['vRow']
 
         # Where on the projected plane does col,row lie?
         projectionXy = vZero + (colFrac*vCol) + (rowFrac*vRow)
@@ -548,8 +793,10 @@ class KeplerFov():
         return polyList
 
     def getChannelAsPolygon(self, chNumber, maptype=None):
-        if maptype is None:
-            maptype = self.defaultMap
+        if maptype is None or maptype is self.defaultMap:
+            # The projected corners are already in the channel table
+            corners = self.getChannelGeometry(chNumber)['corners']
+            return KeplerModOut(chNumber, x=corners[:, 0], y=corners[:, 1])
 
         radec = self.currentRaDec
         idx = np.where(radec[:, 2].astype(np.int) == chNumber)[0]
@@ -611,6 +858,8 @@ class KeplerFov():
         #There are two ways to specify line colour
         ec = kwargs.pop('ec', "none")
         ec = kwargs.pop('edgecolor', ec)
+        import matplotlib.pyplot as mp
+        import matplotlib.patches
         p = matplotlib.patches.Polygon(verts, fill=True, ec=ec, fc=colour, **kwargs)
         mp.gca().add_patch(p)
 
@@ -631,6 +880,7 @@ class KeplerFov():
         a,d = gcircle.sphericalAngDestination(self.ra0_deg, self.dec0_deg, -yAngle_deg, 12.0)
         x0, y0 = maptype.skyToPix(self.ra0_deg, self.dec0_deg)
         x1, y1 = maptype.skyToPix(a, d)
+        import matplotlib.pyplot as mp
         mp.plot([x0, x1], [y0, y1], 'k-')
 
 
@@ -688,10 +938,305 @@ class KeplerFov():
 
 
 
+###############################################
+# Spatial index of the channel corners
+################################################
+
+class ChannelGrid():
+    def __init__(self, corners, channels, numCells=64, margin=0.25):
+        """
+        A uniform grid on the tangent plane which lists, for every
+        cell, the channel corners that could be the closest corner
+        to a point in that cell.
+
+        This turns a nearest-corner search into array indexing,
+        followed by a comparison against a handful of candidates.
+        Points that fall outside the grid are compared against every
+        corner.
+
+        Input:
+        ------------
+        corners     (2d array) (x,y) positions of the channel corners
+        channels    (1d array) Channel number of each corner
+        numCells    (int) Number of cells along each axis
+        margin      (float) Extend the grid beyond the bounding box of
+                    the corners by this fraction of its size
+        """
+        self.corners = np.asarray(corners, dtype=float)
+        self.channels = np.asarray(channels)
+        self.numCells = numCells
+
+        lwr = np.min(self.corners, axis=0)
+        upr = np.max(self.corners, axis=0)
+        pad = margin * (upr - lwr)
+        self.lwr = lwr - pad
+        self.cellSize = (upr + pad - self.lwr) / float(numCells)
+
+        # Centre of each cell, in the same order as cellIndex() counts them
+        i, j = np.meshgrid(np.arange(numCells), np.arange(numCells),
+                           indexing='ij')
+        cx = self.lwr[0] + (i.ravel() + .5) * self.cellSize[0]
+        cy = self.lwr[1] + (j.ravel() + .5) * self.cellSize[1]
+
+        # A corner can only be the closest to some point in the cell if it
+        # is no further than (closest distance + 2 * half-diagonal) from
+        # the cell centre, by the triangle inequality.
+        dist = np.hypot(cx[:, np.newaxis] - self.corners[:, 0],
+                        cy[:, np.newaxis] - self.corners[:, 1])
+        halfDiagonal = .5 * np.hypot(*self.cellSize)
+        isCandidate = dist <= np.min(dist, axis=1)[:, np.newaxis] \
+            + 2*halfDiagonal + 1e-12
+
+        # Store the candidates as a padded 2d array, -1 is used as filler
+        numCandidates = np.sum(isCandidate, axis=1)
+        self.candidates = np.full((len(cx), numCandidates.max()), -1, dtype=int)
+        cell, corner = np.where(isCandidate)
+        slot = np.arange(len(cell)) - np.repeat(np.cumsum(numCandidates) -
+                                                numCandidates, numCandidates)
+        self.candidates[cell, slot] = corner
+
+    def cellIndex(self, x, y):
+        """Returns the index of the cell containing each point,
+        or -1 for points outside the grid"""
+        i = np.floor((np.asarray(x) - self.lwr[0]) / self.cellSize[0])
+        j = np.floor((np.asarray(y) - self.lwr[1]) / self.cellSize[1])
+        inside = (i >= 0) & (i < self.numCells) & (j >= 0) & (j < self.numCells)
+        idx = np.full(i.shape, -1, dtype=int)
+        idx[inside] = (i[inside] * self.numCells + j[inside]).astype(int)
+        return idx
+
+    def getNearestCorner(self, x, y, chunkSize=100000):
+        """Returns the index of the closest corner to each point (x, y)"""
+        x = np.atleast_1d(x)
+        y = np.atleast_1d(y)
+        out = np.empty(len(x), dtype=int)
+        for start in range(0, len(x), chunkSize):
+            sl = slice(start, start + chunkSize)
+            out[sl] = self._nearestCorner(x[sl], y[sl])
+        return out
+
+    def _nearestCorner(self, x, y):
+        cell = self.cellIndex(x, y)
+        out = np.empty(len(x), dtype=int)
+
+        inside = cell >= 0
+        cand = self.candidates[cell[inside]]
+        valid = cand >= 0
+        cornerXy = self.corners[np.where(valid, cand, 0)]
+        dist = (cornerXy[..., 0] - x[inside, np.newaxis])**2 + \
+            (cornerXy[..., 1] - y[inside, np.newaxis])**2
+        dist[~valid] = np.inf
+        out[inside] = cand[np.arange(len(cand)), np.argmin(dist, axis=1)]
+
+        # Points off the grid are compared against every corner
+        outside = ~inside
+        if np.any(outside):
+            dist = (self.corners[:, 0] - x[outside, np.newaxis])**2 + \
+                (self.corners[:, 1] - y[outside, np.newaxis])**2
+            out[outside] = np.argmin(dist, axis=1)
+        return out
+
+
+class SiliconGrid():
+    INSIDE = 1
+    OUTSIDE = 0
+    EDGE = -1
+
+    def __init__(self, polygons, numCells=128, tolerance=1e-9):
+        """
+        A uniform grid on the tangent plane which records, for every
+        cell, whether the cell lies entirely inside one of a set of
+        convex polygons, entirely outside all of them, or neither.
+
+        Only points in cells of the last kind, the thin band along the
+        edges of the polygons, need an exact point-in-polygon test.
+
+        Input:
+        ------------
+        polygons    (3d array) Shape (M, numVert, 2). Vertices of each
+                    convex polygon, in order, e.g. from
+                    KeplerFov.getChannelPolygons()
+        numCells    (int) Number of cells along each axis
+        tolerance   (float) Cells closer than this to the edge of a
+                    polygon are never classified as inside or outside,
+                    so that rounding errors can not change the answer.
+        """
+        self.polygons = np.asarray(polygons, dtype=float)
+        self.numCells = numCells
+        # Distance of the furthest vertex from the tangent point
+        self.maxRadius = 0.
+        self.state = np.full(numCells**2, self.OUTSIDE, dtype=np.int8)
+        if len(self.polygons) == 0:
+            self.lwr = np.zeros(2)
+            self.cellSize = np.ones(2)
+            return
+
+        vertices = self.polygons.reshape(-1, 2)
+        self.maxRadius = np.max(np.hypot(vertices[:, 0], vertices[:, 1]))
+        lwr = np.min(vertices, axis=0) - tolerance
+        upr = np.max(vertices, axis=0) + tolerance
+        self.lwr = lwr
+        self.cellSize = (upr - lwr) / float(numCells)
+
+        # Evaluate every edge equation (see getPolygonEdgeMatrix()) at
+        # every node of the grid, then convert to the signed distance
+        # from the edge. The equations are linear, so a cell is on the
+        # inside of an edge if all four of its nodes are.
+        numPoly = len(self.polygons)
+        edges = getPolygonEdgeMatrix(self.polygons)
+        norm = np.hypot(edges[0], edges[1])
+        norm[norm == 0] = np.inf
+        nx = lwr[0] + np.arange(numCells + 1) * self.cellSize[0]
+        ny = lwr[1] + np.arange(numCells + 1) * self.cellSize[1]
+        i, j = np.meshgrid(nx, ny, indexing='ij')
+        nodes = np.stack([i.ravel(), j.ravel(), np.ones(i.size)], axis=1)
+        dist = np.dot(nodes, edges) / norm
+        dist = dist.reshape(numCells + 1, numCells + 1, -1)
+
+        corners = np.stack([dist[:-1, :-1], dist[1:, :-1],
+                            dist[:-1, 1:], dist[1:, 1:]])
+        inside = np.all(corners > tolerance, axis=0)
+        outside = np.all(corners < -tolerance, axis=0)
+
+        # Combine the edges of each polygon, see _insideFromEdges()
+        inside = inside.reshape(numCells**2, -1)
+        outside = outside.reshape(numCells**2, -1)
+        inPoly = _insideFromEdges(inside.astype(float), numPoly)
+        outPoly = ~_insideFromEdges((~outside).astype(float), numPoly)
+        self.state[:] = self.EDGE
+        self.state[np.all(outPoly, axis=1)] = self.OUTSIDE
+        self.state[np.any(inPoly, axis=1)] = self.INSIDE
+
+    def cellIndex(self, x, y):
+        """Returns the index of the cell containing each point,
+        or -1 for points outside the grid"""
+        i = np.floor((np.asarray(x) - self.lwr[0]) / self.cellSize[0])
+        j = np.floor((np.asarray(y) - self.lwr[1]) / self.cellSize[1])
+        inside = (i >= 0) & (i < self.numCells) & (j >= 0) & (j < self.numCells)
+        idx = np.full(i.shape, -1, dtype=int)
+        idx[inside] = (i[inside] * self.numCells + j[inside]).astype(int)
+        return idx
+
+    def classify(self, x, y):
+        """Returns INSIDE, OUTSIDE or EDGE for each point (x, y).
+
+        Points off the grid are outside every polygon.
+        """
+        cell = self.cellIndex(np.atleast_1d(x), np.atleast_1d(y))
+        return np.where(cell >= 0, self.state[cell], self.OUTSIDE)
+
+
 ###############################################
 # Polygon and KepModule code
 ################################################
 
+def pointsInsidePolygons(x, y, polygons):
+    """Which points are inside which convex polygons?
+
+    A vectorised version of Polygon.isPointInside() for N points and
+    M polygons with the same number of vertices.
+
+    Input:
+    ------------
+    x, y
+        (1d arrays) Coordinates of the N points
+    polygons
+        (3d array) Shape (M, numVert, 2). Vertices of each polygon,
+        in order.
+
+    Returns:
+    -----------
+    A boolean array of shape (N, M)
+    """
+    x = np.atleast_1d(x)
+    y = np.atleast_1d(y)
+    edges = getPolygonEdgeMatrix(polygons)
+    numPoly = len(polygons)
+
+    points = np.empty( (len(x), 3) )
+    points[:, 0] = x
+    points[:, 1] = y
+    points[:, 2] = 1
+    return _insideFromEdges(np.dot(points, edges), numPoly)
+
+
+def getPolygonEdgeMatrix(polygons):
+    """Express the edges of convex polygons as a matrix of line equations.
+
+    The point is inside a polygon if the cross product of every edge
+    with the vector from that edge's vertex to the point has the same
+    sign (see Polygon.isPointInside()). The cross product is linear in
+    the point, a*x + b*y + c, so the cross products of a point with
+    every edge are given by [x, y, 1] . edges. The signs of each
+    polygon's coefficients are chosen so that inside means positive,
+    whichever way round the vertices go.
+
+    Input:
+    ------------
+    polygons
+        (3d array) Shape (M, numVert, 2). Vertices of each polygon,
+        in order.
+
+    Returns:
+    -----------
+    A 2d array of shape (3, numVert*M). Column v*M + m holds
+    (a, b, c) for edge v of polygon m.
+    """
+    polygons = np.asarray(polygons, dtype=float)
+    numPoly, numVert = polygons.shape[:2]
+    nextVert = np.roll(polygons, -1, 1)
+    polyVec = nextVert - polygons
+
+    #Twice the signed area. Degenerate polygons get coefficients of
+    #zero, and nothing is inside them.
+    area = np.sum(polygons[:, :, 0]*nextVert[:, :, 1] -
+                  nextVert[:, :, 0]*polygons[:, :, 1], axis=1)
+    sign = np.sign(area)[:, np.newaxis]
+
+    edges = np.empty( (3, numVert, numPoly) )
+    edges[0] = (-polyVec[:, :, 1] * sign).T
+    edges[1] = (polyVec[:, :, 0] * sign).T
+    edges[2] = ((polyVec[:, :, 1]*polygons[:, :, 0] -
+                 polyVec[:, :, 0]*polygons[:, :, 1]) * sign).T
+    return edges.reshape(3, numVert*numPoly)
+
+
+def _insideFromEdges(crossProduct, numPoly):
+    """Combine the (N, numVert*numPoly) cross products computed with
+    getPolygonEdgeMatrix() into an (N, numPoly) inside flag"""
+    positive = crossProduct > 0
+    inside = positive[:, :numPoly]
+    for i in range(numPoly, positive.shape[1], numPoly):
+        inside &= positive[:, i:i+numPoly]
+    return inside
+
+
+def findContainingPolygon(x, y, polygons, chunkSize=2000):
+    """Returns the index of the first polygon containing each point,
+    or -1 for points not inside any polygon.
+
+    See pointsInsidePolygons(). Points are processed in chunks
+    to bound memory use.
+    """
+    x = np.atleast_1d(x)
+    y = np.atleast_1d(y)
+    out = np.full(len(x), -1, dtype=int)
+    if len(polygons) == 0:
+        return out
+
+    edges = getPolygonEdgeMatrix(polygons)
+    points = np.ones( (min(chunkSize, len(x)), 3) )
+    for start in range(0, len(x), chunkSize):
+        sl = slice(start, start + chunkSize)
+        n = len(x[sl])
+        points[:n, 0] = x[sl]
+        points[:n, 1] = y[sl]
+        inside = _insideFromEdges(np.dot(points[:n], edges), len(polygons))
+        idx = np.argmax(inside, axis=1)
+        out[sl] = np.where(inside[np.arange(n), idx], idx, -1)
+    return out
+
+
 class Polygon():
     def __init__(self, x=None, y=None, pointList=None):
         """
@@ -738,20 +1283,8 @@ class Polygon():
         **True** / **False**
         """
 
-        point = np.array([xp, yp]).transpose()
-        polygon = self.polygon
-        numVert, numDim = polygon.shape
-
-        #Subtract each point from the previous one.
-        polyVec = np.roll(polygon, -1, 0) - polygon
-        #Get the vector from each vertex to the given point
-        pointVec = point - polygon
-
-        crossProduct = np.cross(polyVec, pointVec)
-
-        if np.all(crossProduct < 0) or np.all(crossProduct > 0):
-            return True
-        return False
+        inside = pointsInsidePolygons(xp, yp, self.polygon[np.newaxis])
+        return bool(inside[0, 0])
 
     def draw(self, **kwargs):
         """Draw the polygon
@@ -765,6 +1298,8 @@ class Polygon():
         Does not accept maptype as an argument.
         """
 
+        import matplotlib.pyplot as mp
+        import matplotlib.patches
         ax = mp.gca()
         shape = matplotlib.patches.Polygon(self.polygon, **kwargs)
         ax.add_artist(shape)
@@ -798,6 +1333,7 @@ class KeplerModOut(Polygon):
         Channel numbers are written to the current axis.
 
         """
+        import matplotlib.pyplot as mp
         x,y = np.mean(self.polygon, 0)
 
         if modout:
@@ -3,11 +3,22 @@ A set of functions to calculate properties of great circle lines on a
 unit sphere, including, angular separation, bearing, etc.
 
 Ported into Python from explanations at http://www.movable-type.co.uk/scripts/gis-faq-5.1.html
+
+All functions accept scalars or arrays, and follow the numpy
+broadcasting rules, so one point can be compared against an array of
+points, or two arrays of points compared element by element.
+
+Inputs and outputs are in degrees, unless radians=True, in which case
+both the inputs and outputs are in radians. The optional out argument
+gives an array of the broadcast shape in which to place the result,
+avoiding an allocation when the function is called in a loop.
 """
 import numpy as np
 
+from . import rotate2
+
 
-def sphericalAngSep(ra0, dec0, ra1, dec1, radians=False):
+def sphericalAngSep(ra0, dec0, ra1, dec1, radians=False, out=None):
     """
         Compute the spherical angular separation between two
         points on the sky.
@@ -32,23 +43,27 @@ def sphericalAngSep(ra0, dec0, ra1, dec1, radians=False):
 
     val = haversine(deltaDec)
     val += np.cos(dec0) * np.cos(dec1) * haversine(deltaRa)
-    val = min(1, np.sqrt(val)) ; #Guard against round off error?
-    val = 2*np.arcsin(val)
+    val = np.minimum(np.sqrt(val), 1)  #Guard against round off error
+    val = np.arcsin(val, out=out)
+    val = np.multiply(val, 2, out=out)
 
     #Convert back to degrees if necessary
     if radians==False:
-        val = np.degrees(val)
+        val = np.degrees(val, out=out)
 
     return val
 
 
-def sphericalAngSepFast(ra0, dec0, ra1, dec1, radians=False):
+def sphericalAngSepFast(ra0, dec0, ra1, dec1, radians=False, wantSquare=False,
+                        out=None):
     """A faster (but less accurate) implementation of sphericalAngleSep
 
     Taken from http://www.movable-type.co.uk/scripts/latlong.html
 
     For additional speed, set wantSquare=True, and the return value
-    is the square of the separation
+    is the square of the separation (in degrees squared, or radians
+    squared if radians=True). This avoids a square root when
+    comparing separations against a cut-off.
     """
 
     if radians==False:
@@ -62,10 +77,17 @@ def sphericalAngSepFast(ra0, dec0, ra1, dec1, radians=False):
     avgDec = .5*(dec0+dec1)
 
     x = deltaRa*np.cos(avgDec)
-    val = np.hypot(x, deltaDec)
+    if wantSquare:
+        val = np.multiply(x, x, out=out)
+        val = np.add(val, deltaDec*deltaDec, out=out)
+        if radians == False:
+            val = np.multiply(val, (180/np.pi)**2, out=out)
+        return val
+
+    val = np.hypot(x, deltaDec, out=out)
 
     if radians == False:
-        val = np.degrees(val)
+        val = np.degrees(val, out=out)
 
     return val
 
@@ -80,7 +102,15 @@ def haversine(x):
     return y*y
 
 
-def sphericalAngBearing(ra0, dec0, ra1, dec1, radians=False):
+def sphericalAngBearing(ra0, dec0, ra1, dec1, radians=False, out=None):
+    """Compute the initial bearing of the great circle from
+    (ra0, dec0) to (ra1, dec1).
+
+    The bearing is measured from North through East, i.e a point
+    due North has a bearing of zero, and a point due East (increasing
+    ra) has a bearing of 90 degrees. The result is in the range
+    [-180, 180].
+    """
     sin = np.sin
     cos = np.cos
     atan  = np.arctan2
@@ -93,34 +123,202 @@ def sphericalAngBearing(ra0, dec0, ra1, dec1, radians=False):
 
     dLong = ra1 - ra0
     a = sin(dLong)*cos(dec1)
-    b = cos(dec1)*sin(dec1) - sin(dec0)*cos(dec1)*cos(dLong)
-    bearing = atan(a, b)
+    b = cos(dec0)*sin(dec1) - sin(dec0)*cos(dec1)*cos(dLong)
+    bearing = atan(a, b, out=out)
 
     if radians==False:
-        bearing = np.degrees(bearing)
+        bearing = np.degrees(bearing, out=out)
 
     return bearing
 
 
-def sphericalAngDestination(ra0_deg, dec0_deg, bearing_deg, dist_deg):
+def sphericalAngDestination(ra0_deg, dec0_deg, bearing_deg, dist_deg,
+                            radians=False, out=None):
+    """Compute the point reached by travelling dist_deg along
+    a great circle from (ra0_deg, dec0_deg) with an initial bearing of
+    bearing_deg (see sphericalAngBearing()).
+
+    If radians is True, all inputs and outputs are in radians,
+    despite the names of the arguments.
+
+    Returns:
+    A tuple (ra, dec). If out is given, it must be a tuple of two
+    arrays in which to place ra and dec.
+    """
     sin = np.sin
     cos = np.cos
     asin  = np.arcsin
     atan2 = np.arctan2
 
-    phi1 = np.radians(dec0_deg)    #Latitude
-    lambda1 = np.radians(ra0_deg)    #Longitude
-    d = np.radians(dist_deg)      #Distance in radians
-    theta = np.radians(bearing_deg)
+    if out is None:
+        out = (None, None)
+
+    if radians == False:
+        phi1 = np.radians(dec0_deg)    #Latitude
+        lambda1 = np.radians(ra0_deg)    #Longitude
+        d = np.radians(dist_deg)      #Distance in radians
+        theta = np.radians(bearing_deg)
+    else:
+        phi1, lambda1, d, theta = dec0_deg, ra0_deg, dist_deg, bearing_deg
 
     phi2 = sin(phi1)*cos(d)
     phi2 += cos(phi1)*sin(d)*cos(theta)
-    phi2 = asin(phi2)
+    phi2 = asin(phi2, out=out[1])
 
     a = sin(theta)*sin(d)*cos(phi1)
     b = cos(d) - sin(phi1)*sin(phi2)
-    lambda2 = lambda1 + atan2(a,b)
+    lambda2 = atan2(a, b, out=out[0])
+    lambda2 = np.add(lambda2, lambda1, out=out[0])
+
+    if radians == False:
+        lambda2 = np.degrees(lambda2, out=out[0])
+        phi2 = np.degrees(phi2, out=out[1])
+    return lambda2, phi2
+
+
+###
+# All-pairs matching between two sets of positions
+###
+
+# Maximum number of pair separations held in memory at once
+DEFAULT_BLOCK_SIZE = 2**22
+
+
+def nearestNeighbour(ra0, dec0, ra1, dec1, radians=False,
+                     blockSize=DEFAULT_BLOCK_SIZE):
+    """For each position in the first set, find the closest position
+    in the second set.
+
+    See nearestNeighbourVecs()
+
+    Inputs:
+    ra0, dec0   (1d arrays) The N positions to match
+    ra1, dec1   (1d arrays) The M positions to match against
+
+    Returns:
+    A tuple of two arrays of length N, (index, sep). index[i] is the
+    element of the second set closest to element i of the first set,
+    and sep[i] the separation between them.
+    """
+    vec0 = _vecsFromRaDec(ra0, dec0, radians)
+    vec1 = _vecsFromRaDec(ra1, dec1, radians)
+    idx, sep = nearestNeighbourVecs(vec0, vec1, blockSize)
+    if radians == False:
+        sep = np.degrees(sep)
+    return idx, sep
+
+
+def pairsWithinRadius(ra0, dec0, ra1, dec1, radius, radians=False,
+                      blockSize=DEFAULT_BLOCK_SIZE):
+    """Find every pair of positions, one from each set, that are
+    closer together than radius.
+
+    See pairsWithinRadiusVecs()
+
+    Returns:
+    A tuple of three arrays, (index0, index1, sep), one element per
+    pair, ordered by index0 then index1.
+    """
+    vec0 = _vecsFromRaDec(ra0, dec0, radians)
+    vec1 = _vecsFromRaDec(ra1, dec1, radians)
+    if radians == False:
+        radius = np.radians(radius)
+
+    idx0, idx1, sep = pairsWithinRadiusVecs(vec0, vec1, radius, blockSize)
+    if radians == False:
+        sep = np.degrees(sep)
+    return idx0, idx1, sep
+
+
+def nearestNeighbourVecs(vec0, vec1, blockSize=DEFAULT_BLOCK_SIZE):
+    """Similar to nearestNeighbour(), but takes unit vectors as input.
 
-    ra2_deg = np.degrees(lambda2)
-    dec2_deg = np.degrees(phi2)
-    return ra2_deg, dec2_deg
+    The closest pair is the one with the largest dot product, so no
+    trigonometry is done per pair. The pairs are processed in tiles of
+    at most blockSize dot products to bound memory use.
+
+    Inputs:
+    vec0    (2d array) Shape (N,3). Unit vectors to match
+    vec1    (2d array) Shape (M,3). Unit vectors to match against
+
+    Returns:
+    A tuple (index, sep), where sep is in radians. If vec1 is empty,
+    index is -1 and sep is nan.
+    """
+    vec0 = np.atleast_2d(vec0)
+    vec1 = np.atleast_2d(vec1)
+    bestDot = np.full(len(vec0), -np.inf)
+    bestIdx = np.full(len(vec0), -1, dtype=int)
+
+    for rows, cols in _blocks(len(vec0), len(vec1), blockSize):
+        dot = np.dot(vec0[rows], vec1[cols].transpose())
+        j = np.argmax(dot, axis=1)
+        val = dot[np.arange(len(j)), j]
+
+        better = val > bestDot[rows]
+        bestDot[rows] = np.where(better, val, bestDot[rows])
+        bestIdx[rows] = np.where(better, j + cols.start, bestIdx[rows])
+
+    sep = np.full(len(vec0), np.nan)
+    found = bestIdx >= 0
+    sep[found] = _chordSep(vec0[found], vec1[bestIdx[found]])
+    return bestIdx, sep
+
+
+def pairsWithinRadiusVecs(vec0, vec1, radius_rad, blockSize=DEFAULT_BLOCK_SIZE):
+    """Similar to pairsWithinRadius(), but takes unit vectors as input.
+
+    Two positions are closer than radius_rad if the dot product of
+    their vectors is larger than cos(radius_rad). The pairs are processed
+    in tiles of at most blockSize dot products to bound memory use.
+
+    Returns:
+    A tuple (index0, index1, sep), where sep is in radians.
+    """
+    vec0 = np.atleast_2d(vec0)
+    vec1 = np.atleast_2d(vec1)
+
+    #Be generous when comparing dot products, the exact separation
+    #of each candidate pair is checked afterwards
+    minDot = np.cos(min(radius_rad, np.pi)) - 1e-12
+
+    idx0 = []
+    idx1 = []
+    for rows, cols in _blocks(len(vec0), len(vec1), blockSize):
+        dot = np.dot(vec0[rows], vec1[cols].transpose())
+        i, j = np.nonzero(dot >= minDot)
+        idx0.append(i + rows.start)
+        idx1.append(j + cols.start)
+
+    idx0 = np.concatenate(idx0 + [np.empty(0, dtype=int)])
+    idx1 = np.concatenate(idx1 + [np.empty(0, dtype=int)])
+    sep = _chordSep(vec0[idx0], vec1[idx1])
+
+    keep = sep <= radius_rad
+    order = np.lexsort( (idx1[keep], idx0[keep]) )
+    return idx0[keep][order], idx1[keep][order], sep[keep][order]
+
+
+def _blocks(numRows, numCols, blockSize):
+    """Yield pairs of slices tiling a numRows x numCols matrix into
+    tiles of at most blockSize elements (or one row, if larger)"""
+    colStep = max(1, min(numCols, blockSize))
+    rowStep = max(1, blockSize // colStep)
+    for r in range(0, numRows, rowStep):
+        for c in range(0, numCols, colStep):
+            yield slice(r, min(r + rowStep, numRows)), \
+                slice(c, min(c + colStep, numCols))
+
+
+def _chordSep(vec0, vec1):
+    """Angle in radians between pairs of unit vectors, computed from the
+    length of the chord between them, which is accurate for small
+    angles, unlike arccos of the dot product"""
+    chord = np.sqrt(np.sum((vec0 - vec1)**2, axis=-1))
+    return 2*np.arcsin(np.minimum(.5*chord, 1))
+
+
+def _vecsFromRaDec(ra, dec, radians):
+    if radians:
+        return rotate2.vecsFromRaDecRad(ra, dec)
+    return rotate2.vecsFromRaDec(ra, dec)
@@ -0,0 +1,179 @@
+"""Writers for binary (.npy and .npz) tables of results.
+
+The results of K2onSilicon and K2findCampaigns-csv are produced one chunk
+of targets at a time.  The writers in this module append each chunk to a
+structured numpy array on disk, so that large outputs are never held in
+memory, and can be read back with `np.load`.  A `.npy` file can also be
+memory-mapped, using `np.load(filename, mmap_mode='r')`.
+"""
+import io
+import os
+import zipfile
+import tempfile
+
+import numpy as np
+
+__all__ = ['NpyWriter', 'NpzWriter', 'open_writer', 'BINARY_FORMATS']
+
+# File name extensions of the binary formats
+BINARY_FORMATS = ('.npy', '.npz')
+
+# Magic string and version of the .npy format
+_NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+
+class NpyWriter(object):
+    """Writes a one-dimensional structured array to a `.npy` file in chunks.
+
+    The number of rows is not known until the writer is closed, so space
+    is reserved for the header, which is rewritten with the final shape
+    on `close`.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the output file.
+
+    dtype : `np.dtype`
+        Data type of the rows.
+
+    Examples
+    --------
+    >>> with NpyWriter("out.npy", [('ra', 'f8')]) as out:  # doctest: +SKIP
+    ...     out.write(chunk)
+    """
+    def __init__(self, filename, dtype):
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.nrows = 0
+        self._fh = open(filename, 'wb')
+        # The largest possible row count gives the longest header
+        self._header_len = len(self._header(2**63))
+        self._fh.write(self._header(0, self._header_len))
+
+    def _header(self, nrows, total_len=None):
+        """Returns the .npy header for `nrows` rows, padded with spaces to
+        `total_len` bytes, or so that the data start on a 64 byte boundary."""
+        header = "{{'descr': {0!r}, 'fortran_order': False, 'shape': ({1},), }}".format(
+                    np.lib.format.dtype_to_descr(self.dtype), nrows)
+        length = len(_NPY_MAGIC) + 2 + len(header) + 1
+        if total_len is None:
+            padding = -length % 64
+        else:
+            padding = total_len - length
+        header = header + ' ' * padding + '\n'
+        return (_NPY_MAGIC + np.array(len(header), '<u2').tobytes() +
+                header.encode('latin1'))
+
+    def write(self, rows):
+        """Appends a structured array of rows to the file."""
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        self._fh.write(rows.tobytes())
+        self.nrows += len(rows)
+
+    def close(self):
+        """Writes the final header and closes the file."""
+        if self._fh.closed:
+            return
+        self._fh.seek(0)
+        self._fh.write(self._header(self.nrows, self._header_len))
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class NpzWriter(object):
+    """Writes a one-dimensional structured array to a `.npz` file in chunks.
+
+    The rows are streamed to a temporary `.npy` file, which is added to
+    the archive on `close`, together with any other (small) arrays.
+
+    Parameters
+    ----------
+    filename : str
+        Path of the output file.
+
+    dtype : `np.dtype`
+        Data type of the rows.
+
+    name : str
+        Name of the table in the archive.
+
+    arrays : dict
+        Other arrays to store in the archive, e.g. metadata.
+    """
+    def __init__(self, filename, dtype, name='targets', arrays=None):
+        self.filename = filename
+        self.name = name
+        self.arrays = {} if arrays is None else arrays
+        # Stage the table next to the output, which may be too large
+        # for the system's temporary directory
+        fd, self._tmpname = tempfile.mkstemp(
+            suffix='.npy', dir=os.path.dirname(os.path.abspath(filename)))
+        os.close(fd)
+        self._npy = NpyWriter(self._tmpname, dtype)
+
+    @property
+    def nrows(self):
+        return self._npy.nrows
+
+    def write(self, rows):
+        """Appends a structured array of rows to the table."""
+        self._npy.write(rows)
+
+    def close(self):
+        """Assembles the archive and removes the temporary file."""
+        if self._tmpname is None:
+            return
+        self._npy.close()
+        try:
+            with zipfile.ZipFile(self.filename, 'w', allowZip64=True) as zf:
+                zf.write(self._tmpname, arcname=self.name + '.npy')
+                for key, value in self.arrays.items():
+                    buf = io.BytesIO()
+                    np.lib.format.write_array(buf, np.asanyarray(value))
+                    zf.writestr(key + '.npy', buf.getvalue())
+        except BaseException:
+            # Do not leave a partial archive behind
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+            raise
+        finally:
+            os.remove(self._tmpname)
+            self._tmpname = None
+
+    def discard(self):
+        """Removes the temporary file without writing the archive."""
+        if self._tmpname is None:
+            return
+        self._npy.close()
+        os.remove(self._tmpname)
+        self._tmpname = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # An incomplete table must not look like the output of a full run
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def open_writer(filename, dtype, arrays=None):
+    """Returns a `NpyWriter` or `NpzWriter`, depending on the extension
+    of `filename`, or `None` if it is not a binary format.
+
+    `arrays` is only stored in `.npz` files.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.npy':
+        return NpyWriter(filename, dtype)
+    if ext == '.npz':
+        return NpzWriter(filename, dtype, arrays=arrays)
+    return None
@@ -0,0 +1,68 @@
+"""Processes chunks of a target list in a pool of worker processes.
+
+The command-line tools read their input in chunks (see
+`K2onSilicon.TargetListReader`).  `imap_chunks` hands those chunks to
+worker processes and yields the results in the order of the input.
+
+The campaign geometry is not sent to the workers.  The functions run by
+the workers look it up with `fields.getKeplerFov` or
+`footprint.getCampaignFootprints`, which cache it in each process.
+Where processes are forked, the workers inherit the cache of the parent,
+so the geometry is built once and shared.
+"""
+import collections
+import multiprocessing
+
+__all__ = ['imap_chunks', 'get_jobs']
+
+
+def get_jobs(jobs):
+    """Returns the number of processes to use.
+
+    `jobs` values of `None` or less than one mean one process per CPU.
+    """
+    if jobs is None or jobs < 1:
+        return multiprocessing.cpu_count()
+    return int(jobs)
+
+
+def imap_chunks(func, chunks, jobs=1):
+    """Yields `func(chunk)` for every chunk, in the order of `chunks`.
+
+    Parameters
+    ----------
+    func : callable
+        Function to apply.  It must be picklable, e.g. a module-level
+        function or a `functools.partial` of one.
+
+    chunks : iterable
+        The chunks, which are read lazily.
+
+    jobs : int
+        Number of worker processes, see `get_jobs`.  With a single job,
+        `func` is called in the current process.
+
+    Notes
+    -----
+    At most two chunks per worker are in flight at any time, so memory
+    use does not grow with the length of `chunks`.
+    """
+    jobs = get_jobs(jobs)
+    if jobs == 1:
+        for chunk in chunks:
+            yield func(chunk)
+        return
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(func, (chunk,)))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -1,11 +1,11 @@
-"""This file defines the projection classes."""
-try:
-    import matplotlib.pyplot as mp
-except Exception:
-    pass
+"""This file defines the projection classes.
 
+The plotting methods import matplotlib when they are first called,
+so that the projections can be used without paying for its import.
+"""
 import numpy as np
 from . import rotate
+from .catalog import SkyCatalog
 
 
 class Projection():
@@ -32,46 +32,33 @@ class Projection():
         return x, y
 
     def eulerRotate(self, ra_deg, dec_deg):
-        ra_deg, dec_deg = self.parseInputs(ra_deg, dec_deg)
+        ra_deg, dec_deg, vec = self.parseVecs(ra_deg, dec_deg)
+
+        #Rotate the vectors so that the
+        #tangent point is at [1,0,0]. Then pull out the angle relative
+        #to the x-axis, and the angle around the y-z plane.
+        aVec = np.dot(vec, self.Rmatrix.transpose())
+
+        #aVec = (sint, cost*cosp, cost*sinp)
+        sint = aVec[:, 0]
+        cost = np.hypot(aVec[:, 1], aVec[:, 2])
+        theta_rad = np.arctan2(sint, cost)
+
+        cost = np.cos(theta_rad)
+        cosp = aVec[:, 1] / cost
+        sinp = aVec[:, 2] / cost
+        phi_rad = np.arctan2(sinp, cosp)
+        phi_rad[phi_rad < 0] += 2*np.pi
+        phi_rad[phi_rad > 2*np.pi] -= 2*np.pi
 
-        #Transform ra dec into angle away from tangent point
-        #using the rotation matrix
-        theta_rad= np.empty( (len(ra_deg),) )
-        phi_rad = theta_rad * 0
-        R = self.Rmatrix
-        for i in range(len(ra_deg)):
-            #Convert the ra/dec to a vector, then rotate so
-            #that the tangent point is at [1,0,0]. Then pull out
-            #the angle relative to the x-axis, and the angle
-            #around the y-z plane.
-            #@TODO: Can I make this faster with dot products?
-            vec =rotate.vecFromRaDec(ra_deg[i], dec_deg[i])
-            aVec = np.dot(R, vec)
-
-            #aVec = (sint, cost*cosp, cost*sinp)
-            sint = aVec[0]
-            cost = np.hypot(aVec[1], aVec[2])
-            theta = np.arctan2(sint, cost)
-
-            cost = np.cos(theta)
-            cosp = aVec[1] / cost
-            sinp = aVec[2] / cost
-            phi = np.arctan2(sinp, cosp)
-
-            if phi < 0:
-                phi += 2*np.pi
-            if phi > 2*np.pi:
-                phi -= 2*np.pi
-
-
-            #Just to be explicit
-            theta_rad[i] = theta
-            phi_rad[i] = phi
         return theta_rad, phi_rad
 
 
 
     def parseInputs(self, ra_deg, dec_deg):
+        if isinstance(ra_deg, SkyCatalog):
+            return ra_deg.ra, ra_deg.dec
+
         try:
             len(ra_deg)
         except TypeError:
@@ -101,6 +88,16 @@ class Projection():
 
         return ra_deg, dec_deg
 
+    def parseVecs(self, ra_deg, dec_deg):
+        """Similar to parseInputs(), but also returns the unit vector
+        of each position. If ra_deg is a SkyCatalog, its cached vectors
+        are used, and dec_deg is ignored.
+        """
+        if isinstance(ra_deg, SkyCatalog):
+            return ra_deg.ra, ra_deg.dec, ra_deg.vecs
+        ra_deg, dec_deg = self.parseInputs(ra_deg, dec_deg)
+        return ra_deg, dec_deg, rotate.vecsFromRaDec(ra_deg, dec_deg)
+
     def isPositiveMap(self):
         """Returns true if increasing ra increases pix in skyToPix()
         """
@@ -117,11 +114,13 @@ class Projection():
         self._plot(x, y, *args, **kwargs)
 
     def scatter(self,  ra_deg, dec_deg, *args, **kwargs):
+        import matplotlib.pyplot as mp
         x,y = self.skyToPix(ra_deg, dec_deg)
         mp.scatter(x,y, *args, **kwargs)
 
 
     def text(self, ra_deg, dec_deg, s, *args, **kwargs):
+        import matplotlib.pyplot as mp
         x,y = self.skyToPix(ra_deg, dec_deg)
         mp.text(x, y, s, *args, **kwargs)
 
@@ -132,6 +131,7 @@ class Projection():
         while keeping the initial axes bounds that were present upon its calling.
         Will not work for certain cases.
         """
+        import matplotlib.pyplot as mp
         x1, x2, y1, y2 = mp.axis()
         ra1, dec0 = self.pixToSky(x1, y1)
         ra0, dec1 = self.pixToSky(x2, y2)
@@ -180,7 +180,7 @@ class Projection():
         Note: If I ever do rotated projections, this simple approach
         will fail.
         """
-
+        import matplotlib.pyplot as mp
         x1, x2, y1, y2 = mp.axis()
         ra1, dec0 = self.pixToSky(x1, y1)
         raRange, decRange = self.getRaDecRanges(numLines)
@@ -203,6 +203,7 @@ class Projection():
 
         Used by plotGrid and labelAxes
         """
+        import matplotlib.pyplot as mp
         x1, x2, y1, y2 = mp.axis()
 
         ra0, dec0 = self.pixToSky(x1, y1)
@@ -263,6 +264,7 @@ class Projection():
 
 
     def _plot(self, x, y, *args,  **kwargs):
+        import matplotlib.pyplot as mp
         mp.plot(x,y, *args, **kwargs)
 
 
@@ -290,20 +292,19 @@ class HammerAitoff(Projection):
         Rra = rotate.rightAscensionRotationMatrix(-self.ra0_deg)
         self.Rmatrix = np.dot(Rra, Rdec)
 
-    def skyToPix(self, ra_deg, dec_deg, **kwargs):
+    def skyToPix(self, ra_deg, dec_deg=None, **kwargs):
         sin = np.sin
         cos = np.cos
 
-        #Parse inputs and allocate space for outputs
-        ra_deg, dec_deg = self.parseInputs(ra_deg, dec_deg)
-        long_deg = ra_deg * 0
-        lat_deg = long_deg * 0
+        #Parse inputs
+        ra_deg, dec_deg, vec = self.parseVecs(ra_deg, dec_deg)
 
-        #Get longitude and latitude relative to defined origin.
-        for i in range(len(ra_deg)):
-            vec = rotate.vecFromRaDec(ra_deg[i], dec_deg[i])
-            aVec = np.dot( self.Rmatrix, vec)
-            long_deg[i], lat_deg[i] = rotate.raDecFromVec(aVec)
+        #Get longitude and latitude relative to defined origin,
+        #rotating all the points at once
+        aVec = np.dot(vec, self.Rmatrix.transpose())
+        longLat = rotate.raDecsFromVecs(aVec)
+        long_deg = longLat[:, 0]
+        lat_deg = longLat[:, 1]
 
         long_deg = np.fmod(long_deg + 180, 360.)
         long_rad = np.radians(long_deg) - np.pi #[-pi,pi]
@@ -319,7 +320,29 @@ class HammerAitoff(Projection):
         return x, y
 
     def pixToSky(self, x, y):
-        raise NotImplementedError("pixToSky not defined!")
+        """Inverse of skyToPix().
+
+        Points outside the ellipse that bounds the projection,
+        (x/2sqrt(2))**2 + (y/sqrt(2))**2 > 1, are returned as nan.
+        """
+        x, y = self.parseInputs(x, y)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+
+        #Calabretta & Greisen (2002) eqn 108, allowing for the
+        #sign of x, which increases to the east.
+        zsq = 1 - (x/4.)**2 - (y/2.)**2
+        zsq[zsq < .5] = np.nan
+        z = np.sqrt(zsq)
+        long_rad = 2*np.arctan2(-z*x, 2*(2*zsq - 1))
+        lat_rad = np.arcsin(np.clip(z*y, -1, 1))
+
+        aVec = rotate.vecsFromRaDec(np.degrees(long_rad), np.degrees(lat_rad))
+
+        #Rmatrix is a rotation, so its inverse is its transpose.
+        vec = np.dot(aVec, self.Rmatrix)
+        raDec = rotate.raDecsFromVecs(vec)
+        return raDec[:, 0], raDec[:, 1]
 
     def labelAxes(self, nLabel=5):
         """Put labels on axes"""
@@ -345,50 +368,40 @@ class Gnomic(Projection):
         assert( np.fabs(origin[1]) < 1e-9)
         assert( np.fabs(origin[2]) < 1e-9)
 
-    def skyToPix(self, ra_deg, dec_deg, catchInvalid=True):
-        ra_deg, dec_deg = self.parseInputs(ra_deg, dec_deg)
-
-        #Transform ra dec into angle away from tangent point
-        #using the rotation matrix
-        theta_rad= np.empty( (len(ra_deg),) )
-        phi_rad = theta_rad * 0
-        R = self.Rmatrix
-        for i in range(len(ra_deg)):
-            #Convert the ra/dec to a vector, then rotate so
-            #that the tangent point is at [1,0,0]. Then pull out
-            #the angle relative to the x-axis, and the angle
-            #around the y-z plane.
-            #@TODO: Can I make this faster with dot products?
-            vec =rotate.vecFromRaDec(ra_deg[i], dec_deg[i])
-            aVec = np.dot(R, vec)
-
-            #aVec = (sint, cost*cosp, cost*sinp)
-            sint = aVec[0]
-            cost = np.hypot(aVec[1], aVec[2])
-            theta = np.arctan2(sint, cost)
-
-            #Points more than 90 deg from tangent point need to be
-            #caught, or they'll be projected 180-i degrees from tangent
-            #point.
-            if catchInvalid and theta < 0:
-                raise ValueError("Point (%.7f %.7f) not projectable" \
-                    %(ra_deg[i], dec_deg[i]))
-
-            cost = np.cos(theta)
-            cosp = aVec[1] / cost
-            sinp = aVec[2] / cost
-            phi = np.arctan2(sinp, cosp)
-
-            if phi < 0:
-                phi += 2*np.pi
-            if phi > 2*np.pi:
-                phi -= 2*np.pi
-
-
-            #Just to be explicit
-            theta_rad[i] = theta
-            phi_rad[i] = phi
-
+    def skyToPix(self, ra_deg, dec_deg=None, catchInvalid=True):
+        ra_deg, dec_deg, vec = self.parseVecs(ra_deg, dec_deg)
+
+        #Rotate the vector of every ra/dec
+        #at once so that the tangent point is at [1,0,0].
+        #Then pull out the angle relative to the x-axis, and the angle
+        #around the y-z plane.
+        aVec = np.dot(vec, self.Rmatrix.transpose())
+
+        #aVec = (sint, cost*cosp, cost*sinp)
+        sint = aVec[:, 0]
+        cost = np.hypot(aVec[:, 1], aVec[:, 2])
+        theta_rad = np.arctan2(sint, cost)
+
+        #Points more than 90 deg from tangent point need to be
+        #caught, or they'll be projected 180-i degrees from tangent
+        #point.
+        if catchInvalid:
+            bad = np.where(theta_rad < 0)[0]
+            if len(bad) > 0:
+                i = bad[0]
+                msg = "Point (%.7f %.7f) not projectable" \
+                    %(ra_deg[i], dec_deg[i])
+                if len(bad) > 1:
+                    msg += " (plus %i more, at indices %s)" \
+                        %(len(bad) - 1, bad[1:11].tolist())
+                raise ValueError(msg)
+
+        cost = np.cos(theta_rad)
+        cosp = aVec[:, 1] / cost
+        sinp = aVec[:, 2] / cost
+        phi_rad = np.arctan2(sinp, cosp)
+        phi_rad[phi_rad < 0] += 2*np.pi
+        phi_rad[phi_rad > 2*np.pi] -= 2*np.pi
 
         #Project onto tangent plane. Negative x because we are inside
         #sphere looking out (matches astronomical convention
@@ -398,31 +411,113 @@ class Gnomic(Projection):
 
         return x, y
 
+    def isProjectable(self, ra_deg, dec_deg=None):
+        """Returns True for points less than 90 degrees from the tangent
+        point, i.e those that skyToPix() can project without
+        catchInvalid raising an exception.
+        """
+        ra_deg, dec_deg, vec = self.parseVecs(ra_deg, dec_deg)
+
+        #The first row of Rmatrix gives the component along the
+        #tangent point, i.e sin(theta) in skyToPix()
+        sint = np.dot(vec, self.Rmatrix[0])
+        return sint >= 0
+
     def pixToSky(self, x, y):
         x, y = self.parseInputs(x, y)
 
-        R = self.Rmatrix
-        invR = np.matrix(R.transpose())
-        ra_deg = np.empty( (len(x),))
-        dec_deg = np.empty( (len(x),))
+        #-x because we are inside sphere looking out. This
+        #matches the astronomical convention.
+        phi_rad = np.arctan2(y, -x)
+        r = np.hypot(x, y)
+        theta_rad = np.arctan(r)
 
-        for i in range(len(x)):
-            #-x because we are inside sphere looking out. This
-            #matches the astronomical convention.
-            phi_rad = np.arctan2(y,-x)
-            r = np.hypot(x,y)
-            theta_rad = np.arctan(r)
+        sint = np.sin(theta_rad)
+        aVec = np.empty( (len(x), 3) )
+        aVec[:, 0] = np.cos(theta_rad)
+        aVec[:, 1] = sint * np.cos(phi_rad)
+        aVec[:, 2] = sint * np.sin(phi_rad)
 
-            aVec = np.zeros((3,))
-            aVec[0] = np.cos(theta_rad)
-            aVec[1] = np.sin(theta_rad)*np.cos(phi_rad)
-            aVec[2] = np.sin(theta_rad)*np.sin(phi_rad)
+        #Rmatrix is a rotation, so its inverse is its transpose.
+        #Post-multiplying the row vectors by R applies R^T to each.
+        vec = np.dot(aVec, self.Rmatrix)
+        raDec = rotate.raDecsFromVecs(vec)
+        return raDec[:, 0], raDec[:, 1]
 
 
-            vec = np.dot(invR, aVec)
-            vec = np.array(vec)[0]    #Convert to 1d array
-            ra_deg[i], dec_deg[i] = rotate.raDecFromVec(vec)
-        return ra_deg, dec_deg
+# Number of targets projected at once by gnomicSkyToPixVecs()
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def gnomicRotationMatrices(ra0_deg, dec0_deg):
+    """Stack the rotation matrices of Gnomic projections about
+    several tangent points.
+
+    Inputs:
+    ra0_deg, dec0_deg   (1d arrays) The M tangent points
+
+    Returns:
+    An array of shape (M,3,3). Element i is equal to the Rmatrix of
+    Gnomic(ra0_deg[i], dec0_deg[i])
+    """
+    ra0_deg = np.atleast_1d(ra0_deg)
+    dec0_deg = np.atleast_1d(dec0_deg)
+    if len(ra0_deg) != len(dec0_deg):
+        raise ValueError("Input ra and dec arrays must be same length")
+
+    out = np.empty( (len(ra0_deg), 3, 3) )
+    for i in range(len(ra0_deg)):
+        Rdec = rotate.declinationRotationMatrix(-dec0_deg[i])
+        Rra = rotate.rightAscensionRotationMatrix(-ra0_deg[i])
+        out[i] = np.dot(Rdec, Rra)
+    return out
+
+
+def gnomicSkyToPixVecs(rotations, vecs, chunkSize=DEFAULT_CHUNK_SIZE):
+    """Project a catalogue onto the tangent planes of many pointings.
+
+    Equivalent to calling Gnomic.skyToPix() once per pointing, but
+    the catalogue is given as unit vectors (see rotate.vecsFromRaDec()),
+    so the trigonometry on the catalogue is only done once, and every
+    pointing is applied to a chunk of targets with a single matrix
+    product.
+
+    Inputs:
+    rotations   (3d array) Shape (M,3,3). The Rmatrix of each pointing,
+                e.g. from gnomicRotationMatrices()
+    vecs        (2d array) Shape (N,3). Unit vectors of the targets
+
+    Optional Inputs:
+    chunkSize   Number of targets projected at once. Memory use
+                is proportional to M * chunkSize.
+
+    Returns:
+    A generator of tuples (index, x, y). index is the slice of vecs
+    in the chunk, and x and y are arrays of shape (M, len(chunk)).
+    Targets 90 degrees or more from a tangent point can not be
+    projected, and are given x and y of nan.
+
+    Gnomic.skyToPix() adds 1e-10 to tan(theta) to avoid dividing by
+    zero, so its results differ by about 1e-10 * r**2 from these.
+    """
+    rotations = np.asarray(rotations).reshape(-1, 3, 3)
+    vecs = np.atleast_2d(vecs)
+    numPointings = len(rotations)
+
+    #Stack the matrices so every pointing is applied in one product
+    stacked = rotations.reshape(-1, 3).transpose()
+    for start in range(0, len(vecs), chunkSize):
+        index = slice(start, min(start + chunkSize, len(vecs)))
+        aVec = np.dot(vecs[index], stacked)
+        aVec = aVec.reshape(-1, numPointings, 3).transpose(2, 1, 0)
+
+        #aVec[0] is the component along the tangent point, and the
+        #projected position is (-a1/a0, a2/a0), as in Gnomic.skyToPix()
+        a0 = aVec[0]
+        a0[a0 <= 0] = np.nan
+        x = -aVec[1] / a0
+        y = aVec[2] / a0
+        yield index, x, y
 
 
 class Cylindrical(Projection):
@@ -0,0 +1,220 @@
+"""Resolves target names into celestial coordinates.
+
+The resolvers share a small interface: `resolve(name)` returns the
+(ra, dec) of a target in decimal degrees, or raises a `ValueError` if
+the name is unknown.
+
+* `SesameResolver` asks the CDS Sesame service, through AstroPy.
+* `FileResolver` looks names up in a local table, e.g. for offline use.
+* `ConcurrentResolver` wraps another resolver, answering repeated names
+  from a `NameCache` on disk and looking up the others in parallel.
+"""
+from __future__ import division, print_function
+
+import os
+import time
+import sqlite3
+
+from . import logger
+
+__all__ = ['SesameResolver', 'FileResolver', 'ConcurrentResolver',
+           'NameCache', 'DEFAULT_CACHE_FN']
+
+# Where the names resolved by the command-line tools are remembered
+DEFAULT_CACHE_FN = os.path.join(os.path.expanduser('~'), '.K2fov',
+                                'name-cache.sqlite')
+
+# Number of days after which a cached name is resolved again
+DEFAULT_EXPIRY = 30
+
+# Number of names looked up at the same time
+DEFAULT_MAX_WORKERS = 8
+
+# Seconds to wait for an answer from the Sesame service
+DEFAULT_TIMEOUT = 90
+
+# SQLite limits the number of parameters of a query
+_QUERY_BATCH = 500
+
+
+class SesameResolver(object):
+    """Resolves names using `SkyCoord.from_name` from AstroPy.
+
+    Raises an ImportError on use if AstroPy is not installed.
+    """
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+
+    def resolve(self, name):
+        from astropy.coordinates import SkyCoord
+        from astropy.coordinates.name_resolve import NameResolveError
+        from astropy.utils.data import conf
+        conf.remote_timeout = self.timeout
+        try:
+            crd = SkyCoord.from_name(name)
+        except NameResolveError:
+            raise ValueError('Could not find coordinates '
+                             'for target "{0}".'.format(name))
+        return crd.ra.deg, crd.dec.deg
+
+
+class FileResolver(object):
+    """Resolves names using a local comma-separated table of name,ra,dec.
+
+    Names are matched exactly, after stripping white space.
+    Lines starting with "#" are ignored.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.positions = {}
+        with open(filename) as fh:
+            for line in fh:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                name, ra, dec = line.rsplit(',', 2)
+                self.positions[name.strip()] = (float(ra), float(dec))
+
+    def resolve(self, name):
+        try:
+            return self.positions[name.strip()]
+        except KeyError:
+            raise ValueError('Could not find coordinates '
+                             'for target "{0}".'.format(name))
+
+
+class NameCache(object):
+    """Remembers resolved names in an SQLite database.
+
+    Names that could not be resolved are remembered too, so that they
+    are not looked up again until they expire.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the database, which is created if needed.
+        Use ":memory:" for a cache that is not saved.
+
+    expiry : float
+        Number of days after which an entry is ignored.
+    """
+    def __init__(self, filename=DEFAULT_CACHE_FN, expiry=DEFAULT_EXPIRY):
+        self.filename = filename
+        self.expiry = expiry
+        dirname = os.path.dirname(filename)
+        if filename != ':memory:' and dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self._db = sqlite3.connect(filename)
+        self._db.execute("CREATE TABLE IF NOT EXISTS names "
+                         "(name TEXT PRIMARY KEY, ra REAL, dec REAL, "
+                         "created REAL)")
+        self._db.commit()
+
+    def get(self, names):
+        """Returns a dictionary of the cached, unexpired, entries of `names`.
+
+        The values are (ra, dec) tuples, or `None` for names which
+        could not be resolved.
+        """
+        names = list(set(names))
+        oldest = time.time() - self.expiry * 86400.
+        result = {}
+        for i in range(0, len(names), _QUERY_BATCH):
+            batch = names[i:i + _QUERY_BATCH]
+            query = ("SELECT name, ra, dec FROM names WHERE created > ? "
+                     "AND name IN ({0})".format(','.join('?' * len(batch))))
+            for name, ra, dec in self._db.execute(query, [oldest] + batch):
+                result[name] = None if ra is None else (ra, dec)
+        return result
+
+    def put(self, positions):
+        """Stores a dictionary of name -> (ra, dec), or `None` if unknown."""
+        now = time.time()
+        rows = [(name, None, None, now) if pos is None
+                else (name, pos[0], pos[1], now)
+                for name, pos in positions.items()]
+        self._db.executemany("INSERT OR REPLACE INTO names VALUES (?, ?, ?, ?)",
+                             rows)
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ConcurrentResolver(object):
+    """Resolves many names at once, with a cache and parallel look-ups.
+
+    Parameters
+    ----------
+    resolver : object
+        The resolver used for names which are not in the cache,
+        e.g. `SesameResolver`.
+
+    cache : `NameCache`
+        Cache of resolved names, or `None` to look up every name.
+
+    max_workers : int
+        Maximum number of names looked up at the same time.
+    """
+    def __init__(self, resolver=None, cache=None,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        if resolver is None:
+            resolver = SesameResolver()
+        self.resolver = resolver
+        self.cache = cache
+        self.max_workers = max(1, max_workers)
+
+    def resolve(self, name):
+        pos = self.resolve_many([name])[0]
+        if pos is None:
+            raise ValueError('Could not find coordinates '
+                             'for target "{0}".'.format(name))
+        return pos
+
+    def resolve_many(self, names):
+        """Returns a list with the (ra, dec) of each name, or `None` if
+        the name could not be resolved.
+
+        Names which fail for reasons other than being unknown, e.g. a
+        network error, are not cached, so they are tried again next time.
+        """
+        names = list(names)
+        known = {} if self.cache is None else self.cache.get(names)
+        todo = sorted(set(names) - set(known))
+        if todo:
+            found = {}
+            for name, pos in zip(todo, self._lookup(todo)):
+                if pos is not False:
+                    found[name] = pos
+            if self.cache is not None:
+                self.cache.put(found)
+            known.update(found)
+        return [known.get(name) for name in names]
+
+    def _lookup(self, names):
+        """Returns (ra, dec), `None` if unknown, or `False` if failed."""
+        if self.max_workers == 1 or len(names) == 1:
+            return [self._lookup_one(name) for name in names]
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(self.max_workers, len(names)))
+        try:
+            return pool.map(self._lookup_one, names, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _lookup_one(self, name):
+        try:
+            return self.resolver.resolve(name)
+        except ValueError:
+            return None
+        except ImportError:
+            raise
+        except Exception as e:
+            logger.warning('Failed to resolve "{0}": {1}'.format(name, e))
+            return False
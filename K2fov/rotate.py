@@ -1,6 +1,9 @@
 """Coordinate transformations in radec space"""
 import numpy as np
 
+# The batch conversions are shared with rotate2
+from .rotate2 import vecsFromRaDec, raDecsFromVecs
+
 
 def vecFromRaDec(ra_deg, dec_deg):
     v =np.zeros( (3,))
@@ -29,8 +32,8 @@ def raDecFromVec(v):
     with 90degrees at zenith
     """
 
-    #Ensure v is a normal vector
-    v /= np.linalg.norm(v)
+    #Ensure v is a normal vector, without modifying the caller's array
+    v = v / np.linalg.norm(v)
 
     ra_deg=0    #otherwise not in namespace0
     dec_rad = np.arcsin(v[2])
@@ -299,8 +299,9 @@ def raDecFromVec(v):
 
     @TODO: Rigourously test this against spice.recrad()
     """
-    # Ensure v is a normal vector
-    v /= np.linalg.norm(v)
+    # Ensure v is a normal vector. Don't normalise in place, that
+    # would modify the caller's array
+    v = v / np.linalg.norm(v)
 
     ra_deg = 0    # otherwise not in namespace0
     dec_rad = np.arcsin(v[2])
@@ -323,3 +324,74 @@ def raDecFromVec(v):
 
     raDec = ra_deg, np.degrees(dec_rad)
     return np.array(raDec)
+
+
+def vecsFromRaDec(ra_deg, dec_deg, out=None):
+    """Similar to vecFromRaDec(), but takes arrays as input
+
+    Input:
+    ra_deg, dec_deg (floats or 1d arrays) Coordinates in degrees
+    out             (2d array) Optional array of shape (N,3) to store
+                    the result in
+
+    Returns:
+    A 2d numpy array of shape (N,3). Each row is a unit vector
+    """
+    return vecsFromRaDecRad(np.radians(np.atleast_1d(ra_deg)),
+                            np.radians(np.atleast_1d(dec_deg)), out)
+
+
+def vecsFromRaDecRad(ra_rad, dec_rad, out=None):
+    """Same as vecsFromRaDec(), but takes coordinates in radians
+
+    Input:
+    ra_rad, dec_rad (floats or 1d arrays) Coordinates in radians
+    out             (2d array) Optional array of shape (N,3) to store
+                    the result in
+
+    Returns:
+    A 2d numpy array of shape (N,3). Each row is a unit vector
+    """
+    ra_rad = np.atleast_1d(ra_rad)
+    dec_rad = np.atleast_1d(dec_rad)
+    if out is None:
+        out = np.empty(np.broadcast(ra_rad, dec_rad).shape + (3,))
+
+    cd = np.cos(dec_rad)
+    np.multiply(np.cos(ra_rad), cd, out=out[..., 0])
+    np.multiply(np.sin(ra_rad), cd, out=out[..., 1])
+    np.sin(dec_rad, out=out[..., 2])
+    return out
+
+
+def raDecsFromVecs(v, out=None):
+    """Similar to raDecFromVec(), but takes an array of vectors as input
+
+    The vectors need not be normalised, and are not modified.
+
+    Input:
+    v       (2d array) Array of shape (N,3). Each row is a vector
+    out     (2d array) Optional array of shape (N,2) to store
+            the result in
+
+    Returns:
+    A 2d numpy array of shape (N,2). The columns are ra and dec
+    in degrees, with 0 <= ra < 360
+    """
+    v = np.atleast_2d(v)
+    if out is None:
+        out = np.empty(v.shape[:-1] + (2,))
+
+    ra_deg = out[..., 0]
+    dec_deg = out[..., 1]
+
+    np.arctan2(v[..., 1], v[..., 0], out=ra_deg)
+    np.degrees(ra_deg, out=ra_deg)
+    ra_deg[ra_deg < 0] += 360
+
+    np.sqrt(np.sum(v**2, axis=-1), out=dec_deg)
+    np.divide(v[..., 2], dec_deg, out=dec_deg)
+    np.clip(dec_deg, -1, 1, out=dec_deg)
+    np.arcsin(dec_deg, out=dec_deg)
+    np.degrees(dec_deg, out=dec_deg)
+    return out
@@ -0,0 +1,441 @@
+"""A sky-tile index of the campaigns covering every part of the sky.
+
+The sky is divided into a hierarchy of equal-area cells: at level L,
+the cylindrical equal-area projection (see `projection.Cylindrical`) is
+cut into 2**L rows of equal width in sin(dec) and 2**(L+1) columns of
+equal width in ra.  Cells are numbered in nested order, so the four
+children of cell i at level L are cells 4i to 4i+3 at level L+1, and
+a cell covers a contiguous range of cell numbers at any finer level.
+
+A `SkyIndex` stores, for the cells that any campaign touches, one
+bitmask of the campaigns whose footprint covers the whole cell, and one
+of the campaigns whose footprint covers only part of it.  Cells only
+partly covered by a campaign are split into their children, down to
+`DEFAULT_MAX_LEVEL`, so that the index stays small.  Looking up a
+target is then a single search in a sorted array, and only targets in
+partly covered cells need the exact test of
+`footprint.CampaignFootprints`.
+
+The index only depends on the campaign parameter file.  It is stored
+as a ``.npy`` table, which is memory-mapped when read, next to a
+``.json`` file recording the campaign parameters it was built from.
+`getSkyIndex` reads it from `DEFAULT_INDEX_DIR`, after building and
+saving it there if the directory does not hold an up-to-date copy.
+"""
+from __future__ import division
+
+import os
+import json
+import tempfile
+
+import numpy as np
+
+from . import DEFAULT_PADDING, logger
+from . import fields
+from . import bundle
+from .catalog import asCatalog
+from .footprint import getCampaignFootprints, packCampaigns
+
+__all__ = ['SkyIndex', 'getSkyIndex', 'buildIndex', 'cellIndex',
+           'readIndex', 'writeIndex', 'DEFAULT_INDEX_DIR']
+
+# Where indices built on the fly are saved
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser('~'), '.K2fov')
+
+# Cells at this level are about 0.06 x 0.09 degrees near the equator
+DEFAULT_MAX_LEVEL = 11
+
+# Level of the coarsest cells, about 7 x 11 degrees near the equator
+START_LEVEL = 4
+
+# Cells within this angle (radians) of the edge of a channel are
+# always flagged as partly covered, so rounding can not change a result
+TOLERANCE = 1e-9
+
+# Columns of the index. Each row covers the cell numbers, at the
+# maximum level, from its `start` up to the `start` of the next row.
+INDEX_DTYPE = np.dtype([('start', 'u8'),
+                        ('full', 'u8'),
+                        ('partial', 'u8')])
+
+# Saved indices with a different version are rebuilt
+INDEX_VERSION = 1
+
+# Number of cells compared against the channels of a campaign at once
+_CHUNK_SIZE = 5000
+
+
+class SkyIndex(object):
+    """Finds the campaigns covering targets with a sky-tile index.
+
+    Parameters
+    ----------
+    table : structured array of `INDEX_DTYPE`
+        Ranges of cells, sorted by `start`, e.g. from `buildIndex`.
+
+    maxLevel : int
+        Level of the finest cells of the index.
+
+    footprints : `footprint.CampaignFootprints`
+        Used for targets in cells which are only partly covered by a
+        campaign.  Must hold the campaigns and padding of the index.
+    """
+    def __init__(self, table, maxLevel, footprints):
+        self.table = table
+        self.maxLevel = maxLevel
+        self.footprints = footprints
+
+    def lookup(self, ra_deg, dec_deg=None):
+        """Returns the campaigns covering the cell of every target.
+
+        Parameters
+        ----------
+        ra_deg, dec_deg : array-like
+            Positions in decimal degrees (J2000).  `ra_deg` may also be
+            a `catalog.SkyCatalog`, with `dec_deg` left as `None`.
+
+        Returns
+        -------
+        full, partial : 1d uint64 arrays
+            Bitmasks of the campaigns which cover all, or only part, of
+            the cell containing each target.  Both are empty for targets
+            without a finite position.
+        """
+        vecs = asCatalog(ra_deg, dec_deg).vecs
+        cells = cellIndex(vecs, self.maxLevel)
+        # The first row starts at zero, so every cell has a row
+        row = np.searchsorted(self.table['start'], cells, side='right') - 1
+        # Copies, as the table may be a read-only memory map
+        full = np.array(self.table['full'][row])
+        partial = np.array(self.table['partial'][row])
+        bad = ~np.all(np.isfinite(vecs), axis=1)
+        full[bad] = 0
+        partial[bad] = 0
+        return full, partial
+
+    def getBitmask(self, ra_deg, dec_deg=None):
+        """Returns the bitmask of the campaigns covering each target,
+        as `footprint.CampaignFootprints.getBitmask` does.
+
+        Only targets in partly covered cells are compared against the
+        footprints of the campaigns.
+        """
+        cat = asCatalog(ra_deg, dec_deg)
+        full, partial = self.lookup(cat)
+        todo = np.nonzero(partial)[0]
+        if len(todo) > 0:
+            exact = self.footprints.getBitmask(cat[todo])
+            full[todo] |= exact & partial[todo]
+        return full
+
+
+def cellIndex(vecs, level):
+    """Returns the nested number of the cell containing each unit vector.
+
+    Parameters
+    ----------
+    vecs : 2d array, shape (N, 3)
+        Unit vectors, e.g. from `rotate2.vecsFromRaDec`.
+
+    level : int
+        Level of the cells, at most 30.
+
+    Returns
+    -------
+    cells : 1d uint64 array
+        Vectors which are not finite, e.g. of targets without a position,
+        are put in cell 0.
+    """
+    vecs = np.atleast_2d(vecs)
+    numRows = 2**level
+    phi = np.arctan2(vecs[:, 1], vecs[:, 0])
+    phi[phi < 0] += 2*np.pi
+    row = np.floor((vecs[:, 2] + 1) * (.5 * numRows))
+    col = np.floor(phi * (numRows / np.pi))
+    # Casting NaN to an integer is undefined
+    bad = ~np.all(np.isfinite(vecs), axis=1)
+    if np.any(bad):
+        row[bad] = 0
+        col[bad] = 0
+    row = np.clip(row, 0, numRows - 1).astype(np.uint64)
+    col = np.clip(col, 0, 2*numRows - 1).astype(np.uint64)
+    return _cellFromRowCol(row, col, level)
+
+
+def _cellFromRowCol(row, col, level):
+    """Interleaves the bits of row and column into a nested cell number.
+
+    The bits of the column go in the even places, and its top bit,
+    which tells the two halves of the sky apart, above them all.
+    """
+    level = np.uint64(level)
+    low = np.uint64(2**int(level) - 1)
+    return (_spreadBits(col & low) | (_spreadBits(row) << np.uint64(1)) |
+            ((col >> level) << (np.uint64(2) * level)))
+
+
+def _rowColFromCell(cells, level):
+    """The inverse of `_cellFromRowCol`."""
+    cells = np.asarray(cells, dtype=np.uint64)
+    level = np.uint64(level)
+    row = _compactBits(cells >> np.uint64(1))
+    col = _compactBits(cells) | ((cells >> (np.uint64(2) * level)) << level)
+    return row, col
+
+
+def _spreadBits(v):
+    """Moves bit i of each (up to 32 bit) integer to bit 2i."""
+    v = np.asarray(v, dtype=np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in [(16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF),
+                        (4, 0x0F0F0F0F0F0F0F0F), (2, 0x3333333333333333),
+                        (1, 0x5555555555555555)]:
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def _compactBits(v):
+    """Moves bit 2i of each integer to bit i, see `_spreadBits`."""
+    v = np.asarray(v, dtype=np.uint64) & np.uint64(0x5555555555555555)
+    for shift, mask in [(1, 0x3333333333333333), (2, 0x0F0F0F0F0F0F0F0F),
+                        (4, 0x00FF00FF00FF00FF), (8, 0x0000FFFF0000FFFF),
+                        (16, 0x00000000FFFFFFFF)]:
+        v = (v | (v >> np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def _cellCaps(cells, level):
+    """Returns the smallest cone, centred on the middle of each cell in
+    ra and sin(dec), that contains the cell.
+
+    The distance from the centre increases along the meridians and
+    parallels away from it, so the furthest point of a cell is one of
+    its corners.
+
+    Returns
+    -------
+    centres : 2d array, shape (N, 3)
+        Unit vectors of the centres.
+
+    radius : 1d array
+        Angular radius of each cone, in radians.
+    """
+    row, col = _rowColFromCell(cells, level)
+    numRows = 2**level
+    z = np.stack([row, row + 1, row + .5]).astype(float) * (2. / numRows) - 1
+    phi = np.stack([col, col + 1, col + .5]).astype(float) * (np.pi / numRows)
+    z = np.clip(z, -1, 1)
+    rho = np.sqrt(1 - z**2)
+
+    def vec(i, j):
+        return np.stack([rho[i] * np.cos(phi[j]), rho[i] * np.sin(phi[j]),
+                         z[i]], axis=-1)
+
+    centres = vec(2, 2)
+    radius = np.zeros(len(centres))
+    for i in range(2):
+        for j in range(2):
+            corner = vec(i, j)
+            sep = np.arctan2(np.linalg.norm(np.cross(centres, corner), axis=-1),
+                             np.sum(centres * corner, axis=-1))
+            radius = np.maximum(radius, sep)
+    return centres, radius
+
+
+def classifyCells(footprints, cells, level):
+    """Which campaigns cover all, or part, of each cell?
+
+    A cell is compared against each channel through the cone that
+    contains it, see `_cellCaps`.  A cell is fully covered by a
+    campaign if the cone is inside one channel, and not covered at all
+    if the cone is outside every channel.  Cells in neither case, e.g.
+    those straddling the edge of a channel, or the gap between two
+    channels, are partly covered.
+
+    Returns
+    -------
+    full, partial : 2d bool arrays, shape (N, C)
+        One column for each of `footprints.campaigns`.
+    """
+    centres, radius = _cellCaps(cells, level)
+    numCampaigns = len(footprints.campaigns)
+    full = np.zeros((len(cells), numCampaigns), dtype=bool)
+    partial = np.zeros((len(cells), numCampaigns), dtype=bool)
+
+    # A point at angle a from the centre of a cone of radius r lies at
+    # an angle between a - r and a + r from the great circle of an edge
+    sinRadius = np.sin(radius + TOLERANCE)
+    cosSep = np.dot(centres, footprints.boresights.T)
+    sinSep = np.linalg.norm(np.cross(centres[:, np.newaxis],
+                                     footprints.boresights), axis=-1)
+    sep = np.arctan2(sinSep, cosSep)
+    maxSep = np.arccos(np.clip(footprints.cosRadius, -1, 1))
+
+    for j in range(numCampaigns):
+        normals = footprints.normals[j]
+        norm = np.linalg.norm(normals, axis=-1)
+        # Padding channels have zero normals, and nothing is inside them
+        exists = np.all(norm > 0, axis=0)
+        normals = normals[:, exists] / norm[:, exists, np.newaxis]
+        numChannels = normals.shape[1]
+        edges = normals.transpose(2, 0, 1).reshape(3, -1)
+
+        near = np.nonzero(sep[:, j] <= maxSep[j] + radius + TOLERANCE)[0]
+        for start in range(0, len(near), _CHUNK_SIZE):
+            idx = near[start:start + _CHUNK_SIZE]
+            dots = np.dot(centres[idx], edges).reshape(len(idx), 4,
+                                                       numChannels)
+            margin = sinRadius[idx, np.newaxis, np.newaxis]
+            inside = np.all(dots > margin, axis=1)
+            outside = np.any(dots < -margin, axis=1)
+            full[idx, j] = np.any(inside, axis=1)
+            partial[idx, j] = ~full[idx, j] & ~np.all(outside, axis=1)
+    return full, partial
+
+
+def buildIndex(footprints, maxLevel=DEFAULT_MAX_LEVEL,
+               startLevel=START_LEVEL):
+    """Builds the index table of a `SkyIndex`.
+
+    Cells partly covered by any campaign are split into their four
+    children until `maxLevel` is reached.  Consecutive cells covered
+    by the same campaigns share a row of the table.
+
+    Returns
+    -------
+    table : structured array of `INDEX_DTYPE`
+    """
+    # Start with a single row, covering the whole sky with no campaign
+    parts = [np.zeros(1, dtype=INDEX_DTYPE)]
+    cells = np.arange(2 * 4**startLevel, dtype=np.uint64)
+    for level in range(startLevel, maxLevel + 1):
+        full, partial = classifyCells(footprints, cells, level)
+        split = np.any(partial, axis=1) & (level < maxLevel)
+        keep = ~split & (np.any(full, axis=1) | np.any(partial, axis=1))
+
+        # Each cell kept is followed by an empty row, which is merged
+        # away below if the next cell is covered too
+        shift = np.uint64(2 * (maxLevel - level))
+        rows = np.zeros((np.sum(keep), 2), dtype=INDEX_DTYPE)
+        rows['start'][:, 0] = cells[keep] << shift
+        rows['start'][:, 1] = (cells[keep] + np.uint64(1)) << shift
+        rows['full'][:, 0] = packCampaigns(full[keep], footprints.campaigns)
+        rows['partial'][:, 0] = packCampaigns(partial[keep],
+                                              footprints.campaigns)
+        parts.append(rows.ravel())
+
+        children = (cells[split] << np.uint64(2))[:, np.newaxis] + \
+            np.arange(4, dtype=np.uint64)
+        cells = children.ravel()
+
+    # Sort the rows, letting a cell override the empty row which
+    # follows the cell before it.
+    table = np.concatenate(parts)
+    empty = (table['full'] == 0) & (table['partial'] == 0)
+    table = table[np.lexsort([empty, table['start']])]
+    first = np.ones(len(table), dtype=bool)
+    first[1:] = table['start'][1:] != table['start'][:-1]
+    table = table[first]
+
+    same = np.zeros(len(table), dtype=bool)
+    same[1:] = (table['full'][1:] == table['full'][:-1]) & \
+        (table['partial'][1:] == table['partial'][:-1])
+    return table[~same]
+
+
+def _indexFilenames(directory, padding_pix):
+    base = os.path.join(directory, "k2-skyindex-pad{0}".format(padding_pix))
+    return base + ".npy", base + ".json"
+
+
+def _atomicWrite(filename, write):
+    """Calls write(fh) on a temporary file, then moves it to `filename`,
+    so that other processes never see a partly written file."""
+    fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(filename),
+                                   prefix=os.path.basename(filename) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write(fh)
+        # os.rename does not replace existing files on Windows, and
+        # os.replace only exists in Python 3
+        getattr(os, 'replace', os.rename)(tmpname, filename)
+    except Exception:
+        os.remove(tmpname)
+        raise
+
+
+def writeIndex(table, footprints, maxLevel, directory=DEFAULT_INDEX_DIR):
+    """Saves the index table of `footprints` to `directory`.
+
+    The table is written before the manifest, and each file is replaced
+    in one step, so a process reading the index at the same time sees
+    either the old or the new version of each file.
+    """
+    padding_pix = footprints.padding_pix
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    table_fn, manifest_fn = _indexFilenames(directory, padding_pix)
+    _atomicWrite(table_fn, lambda fh: np.save(fh, table))
+    manifest = {"campaign_parameters_sha256":
+                    bundle.sha256(fields.CAMPAIGN_PARAMETERS_FILE),
+                "campaigns": footprints.campaigns.tolist(),
+                "padding_pix": padding_pix,
+                "max_level": maxLevel,
+                "rows": len(table),
+                "version": INDEX_VERSION}
+    text = json.dumps(manifest, indent=2, sort_keys=True) + "\n"
+    _atomicWrite(manifest_fn, lambda fh: fh.write(text.encode('ascii')))
+
+
+def readIndex(directory=DEFAULT_INDEX_DIR, padding_pix=DEFAULT_PADDING):
+    """Returns the index table saved in `directory`, memory-mapped,
+    and its maximum level, or `None` if it is missing or out of date."""
+    table_fn, manifest_fn = _indexFilenames(directory, padding_pix)
+    try:
+        with open(manifest_fn) as fh:
+            manifest = json.load(fh)
+        if manifest["campaign_parameters_sha256"] != \
+                bundle.sha256(fields.CAMPAIGN_PARAMETERS_FILE) or \
+                manifest["campaigns"] != fields.getFieldNumbers() or \
+                manifest["padding_pix"] != padding_pix or \
+                manifest["version"] != INDEX_VERSION:
+            return None
+        table = np.load(table_fn, mmap_mode='r')
+    except (IOError, ValueError, KeyError):
+        return None
+    if table.dtype != INDEX_DTYPE or len(table) != manifest["rows"]:
+        return None
+    return table, manifest["max_level"]
+
+
+_index_cache = {}
+
+
+def getSkyIndex(padding_pix=DEFAULT_PADDING):
+    """Returns the `SkyIndex` of every campaign.
+
+    The index is read from `DEFAULT_INDEX_DIR`.  If that does not hold
+    a copy built from the current campaign parameter file, the index is
+    built, which takes a couple of seconds, and saved there for next time.
+    The result is kept until the campaign parameter file changes.
+    """
+    footprints = getCampaignFootprints(padding_pix)
+    key = (padding_pix, fields._campaign_file_stamp)
+    try:
+        return _index_cache[key]
+    except KeyError:
+        pass
+
+    found = readIndex(DEFAULT_INDEX_DIR, padding_pix)
+    if found is None:
+        logger.info("Building the sky index of the K2 campaigns.")
+        found = buildIndex(footprints), DEFAULT_MAX_LEVEL
+        try:
+            writeIndex(found[0], footprints, found[1], DEFAULT_INDEX_DIR)
+        except (IOError, OSError) as e:
+            logger.warning("Could not save the sky index: {0}".format(e))
+
+    index = SkyIndex(found[0], found[1], footprints)
+    for stale in [k for k in _index_cache if k[1] != key[1]]:
+        del _index_cache[stale]
+    _index_cache[key] = index
+    return index
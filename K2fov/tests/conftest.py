@@ -0,0 +1,14 @@
+"""Shared test fixtures."""
+import pytest
+
+from .. import skyindex
+
+
+@pytest.fixture(autouse=True, scope='session')
+def sky_index_dir(tmp_path_factory):
+    """Saves the sky index built by the tests in a temporary directory,
+    rather than in the home directory."""
+    old = skyindex.DEFAULT_INDEX_DIR
+    skyindex.DEFAULT_INDEX_DIR = str(tmp_path_factory.mktemp("skyindex"))
+    yield skyindex.DEFAULT_INDEX_DIR
+    skyindex.DEFAULT_INDEX_DIR = old
@@ -0,0 +1,44 @@
+"""Tests the prebuilt geometry bundle in K2fov/data."""
+import numpy as np
+
+from .. import bundle, definefov, fields
+from ..footprint import computeCampaignCorners
+
+
+def test_bundle_is_up_to_date():
+    """Was the bundle built from the current campaign parameter file?
+
+    If this fails, rebuild the bundle using `bundle.writeBundle()`."""
+    campaigns = fields.getFieldNumbers()
+    geometry = bundle.getCampaignCorners(campaigns)
+    assert(geometry is not None)
+    rotations, corners, numChannels = geometry
+    assert(len(rotations) == len(campaigns))
+
+    expected = computeCampaignCorners([0, 10, 11])
+    geometry = bundle.getCampaignCorners([0, 10, 11])
+    for got, want in zip(geometry, expected):
+        assert(np.allclose(got, want))
+
+    origin = definefov.loadOriginVectors()
+    assert(np.all(origin == definefov._originVectorsLiteral()))
+    # Each call gives a new, writeable array
+    origin[0, 3] = 0
+    assert(definefov.loadOriginVectors()[0, 3] != 0)
+
+
+def test_stale_bundle(monkeypatch):
+    """Is the bundle ignored if the campaign file has changed?"""
+    monkeypatch.setattr(bundle, "sha256", lambda fn: "0" * 64)
+    monkeypatch.setattr(bundle, "_campaign_bundle", {})
+    assert(bundle.getCampaignCorners([5]) is None)
+    monkeypatch.undo()
+    # A different padding is not in the bundle either
+    assert(bundle.getCampaignCorners([5], padding_pix=0) is None)
+
+
+def test_write_bundle(tmp_path):
+    tmpdir = str(tmp_path)
+    bundle.writeBundle(tmpdir)
+    corners = np.load(bundle._arrayFilename("corners", tmpdir))
+    assert(np.allclose(corners, bundle._loadArray("corners")))
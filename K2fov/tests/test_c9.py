@@ -34,3 +34,10 @@ def test_in_microlens_region():
     # The coordinates below are also definitely not inside the region
     for ra, dec in [(0, 0), (0, +90), (90, -45), (270, +45)]:
         assert(not c9.inMicrolensRegion(ra, dec))
+
+
+def test_module_attributes():
+    """Do the old module-level dictionaries still work?"""
+    assert(dict(c9.SUPERSTAMP) == c9.getSuperstamp())
+    assert(c9.SUPERSTAMP["channels"] is c9.getSuperstamp()["channels"])
+    assert(len(c9.LATE_TARGETS["masks"]) == len(c9.getLateTargets()["masks"]))
@@ -6,6 +6,7 @@ To run these tests, simply run "py.test" in the K2fov source tree.
 """
 from .. import getFieldNumbers, getFieldInfo
 from ..K2onSilicon import getRaDecRollFromFieldnum
+from .. import fields
 from ..fields import _getCampaignDict
 
 
@@ -104,5 +105,30 @@ def test_field_numbers():
         assert(campaign in field_numbers)
 
 
+def test_fov_cache():
+    """Are KeplerFov objects reused, and protected from changes made
+    by the caller?"""
+    fields.clearCache()
+    fov1 = fields.getKeplerFov(5)
+    fov1.brokenChannels.append(1)
+    fov1.setPointing(0., 0., 0.)
+    fov2 = fields.getKeplerFov(5)
+    assert(fov2 is not fov1)
+    assert(1 not in fov2.brokenChannels)
+    assert(fov2.ra0_deg == getFieldInfo(5)["ra"])
+    assert(fov2.channelGrid is fields.getKeplerFov(5).channelGrid)
+    assert(not fov2.currentRaDec.flags.writeable)
+
+
+def test_fov_cache_invalidation(monkeypatch):
+    """Is the cache emptied when the campaign file changes?"""
+    fov1 = fields.getKeplerFov(5)
+    monkeypatch.setattr(fields, "_getCampaignFileStamp", lambda: (0, 0))
+    fov2 = fields.getKeplerFov(5)
+    assert(fov2.channelGrid is not fov1.channelGrid)
+    monkeypatch.undo()
+    fields.clearCache()
+
+
 if __name__ == "__main__":
     test_coordinates()
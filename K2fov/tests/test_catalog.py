@@ -0,0 +1,82 @@
+"""Tests the SkyCatalog data structure."""
+import numpy as np
+
+from .. import fields
+from ..catalog import SkyCatalog, asCatalog
+from ..rotate2 import vecsFromRaDec
+from ..K2onSilicon import onSiliconCheckList, nearSiliconCheckList
+from ..K2findCampaigns import findCampaignsBitmask
+
+
+def _random_catalog(n=2000, seed=23):
+    rng = np.random.RandomState(seed)
+    ra = rng.uniform(0, 360, n)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    return SkyCatalog(ra, dec, mag=rng.uniform(8, 18, n))
+
+
+def test_vecs_cached_and_shared():
+    cat = _random_catalog(100)
+    assert(cat._vecs is None)
+    vecs = cat.vecs
+    assert(np.allclose(vecs, vecsFromRaDec(cat.ra, cat.dec)))
+    assert(cat.vecs is vecs)
+
+    # Slices are views, including the unit vectors
+    sub = cat[10:20]
+    assert(len(sub) == 10)
+    assert(np.may_share_memory(sub.vecs, vecs))
+    assert(np.all(sub.mag == cat.mag[10:20]))
+    assert(len(cat[5]) == 1 and cat[5].ra[0] == cat.ra[5])
+    assert(len(cat[-1]) == 1 and cat[-1].ra[0] == cat.ra[-1])
+    assert(sum(len(c) for c in cat.chunks(30)) == len(cat))
+
+
+def test_separation():
+    cat = SkyCatalog([10., 10., 190.], [0., 30., 0.])
+    assert(np.allclose(cat.separation(10., 0.), [0., 30., 180.]))
+
+
+def test_length_mismatch():
+    try:
+        SkyCatalog([1., 2., 3.], [1., 2.])
+    except ValueError:
+        pass
+    else:
+        assert(False)
+    assert(len(SkyCatalog(5., [1., 2.])) == 2)
+
+    cat = asCatalog([1., 2.], [3., 4.])
+    assert(asCatalog(cat) is cat)
+
+
+def test_same_as_arrays():
+    """Do the catalogue and array interfaces agree?"""
+    cat = _random_catalog()
+    for campaign in [1, 5, 9]:
+        k = fields.getKeplerFov(campaign)
+        assert(np.all(onSiliconCheckList(cat, None, k) ==
+                      onSiliconCheckList(cat.ra, cat.dec, k)))
+        assert(np.all(nearSiliconCheckList(cat, None, k) ==
+                      nearSiliconCheckList(cat.ra, cat.dec, k)))
+        near = nearSiliconCheckList(cat, None, k)
+        assert(np.all(k.getContainingChannelList(cat[near]) ==
+                      k.getContainingChannelList(cat.ra[near], cat.dec[near])))
+    assert(np.all(findCampaignsBitmask(cat) ==
+                  findCampaignsBitmask(cat.ra, cat.dec)))
+
+
+def test_from_target_chunk():
+    """Are the extra columns of a chunk kept as identifiers?"""
+    from ..K2onSilicon import TargetChunk
+    chunk = TargetChunk(np.array([10., 20.]), np.array([0., 5.]),
+                        np.array([12., 13.]),
+                        np.array([['201121245', 'GO1059'],
+                                  ['201121246', 'GO1060']]))
+    cat = SkyCatalog.fromTargetChunk(chunk)
+    assert(list(cat.ids) == ['201121245', '201121246'])
+    assert(list(cat[1:].ids) == ['201121246'])
+    assert(np.all(cat.mag == chunk.mag))
+
+    chunk = chunk._replace(extra=np.empty((2, 0), dtype=str))
+    assert(SkyCatalog.fromTargetChunk(chunk).ids is None)
@@ -23,3 +23,46 @@ def test_K2findCampaigns_csv():
             temp.write(csv)
         temp.flush()
         K2findCampaigns.K2findCampaigns_csv_main(args=[temp.name])
+
+
+def test_find_campaigns_list():
+    ra = [269.5, 0, 269.5]
+    dec = [-28.5, 0, -28.5]
+    campaigns = K2findCampaigns.findCampaignsList(ra, dec)
+    assert(len(campaigns) == 3)
+    assert(campaigns[0] == K2findCampaigns.findCampaigns(269.5, -28.5))
+    assert(campaigns[1] == [])
+
+
+def test_K2findCampaigns_csv_binary(tmp_path):
+    """Does the .npz output hold the campaigns as a bitmask?"""
+    import os
+    import numpy as np
+    from ..footprint import unpackCampaigns
+    tmpdir = str(tmp_path)
+    infile = os.path.join(tmpdir, "targets.csv")
+    with open(infile, "w") as out:
+        out.write('269.5, -28.5, 0\n0, 0, 0\n')
+    output_fn = os.path.join(tmpdir, "campaigns.npz")
+    K2findCampaigns.K2findCampaigns_csv_main(args=[infile, "-o", output_fn])
+    with np.load(output_fn) as npz:
+        table = npz["targets"]
+    assert(list(table['row']) == [0, 1])
+    assert(unpackCampaigns(table['campaigns'][0]) ==
+           K2findCampaigns.findCampaigns(269.5, -28.5))
+    assert(table['campaigns'][1] == 0)
+
+
+def test_K2findCampaigns_csv_jobs(tmp_path):
+    """Does a pool of processes give the same output?"""
+    import os
+    fn = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      "data", "K2Campaign6targets.csv")
+    tmpdir = str(tmp_path)
+    outputs = []
+    for jobs in ["1", "2"]:
+        output_fn = os.path.join(tmpdir, "campaigns{0}.csv".format(jobs))
+        K2findCampaigns.K2findCampaigns_csv_main(
+            args=[fn, "-o", output_fn, "--jobs", jobs])
+        outputs.append(open(output_fn).read())
+    assert(outputs[0] == outputs[1])
@@ -0,0 +1,39 @@
+"""Tests the footprint module."""
+import numpy as np
+
+from .. import fields
+from ..footprint import (CampaignFootprints, getCampaignFootprints,
+                         unpackCampaigns)
+from ..K2onSilicon import onSiliconCheckList
+
+
+def test_footprints_match_kepler_fov():
+    """Does the stacked footprint agree with KeplerFov.isOnSiliconList?"""
+    campaigns = [1, 9, 12]
+    footprints = CampaignFootprints(campaigns)
+    np.random.seed(9)
+    ra, dec = [], []
+    for c in campaigns:
+        info = fields.getFieldInfo(c)
+        ra.append(info["ra"] + np.random.uniform(-8, 8, 5000))
+        dec.append(info["dec"] + np.random.uniform(-8, 8, 5000))
+    ra = np.concatenate(ra) % 360
+    dec = np.concatenate(dec)
+
+    onSilicon = footprints.contains(ra, dec)
+    assert(onSilicon.shape == (len(ra), len(campaigns)))
+    for j, c in enumerate(campaigns):
+        expected = onSiliconCheckList(ra, dec, fields.getKeplerFov(c))
+        assert(np.all(onSilicon[:, j] == expected))
+        assert(np.sum(expected) > 1000)
+
+
+def test_bitmask():
+    footprints = getCampaignFootprints()
+    assert(footprints is getCampaignFootprints())
+    mask = footprints.getBitmask([269.5, 0], [-28.5, 0])
+    assert(mask.dtype == np.uint64)
+    assert(unpackCampaigns(mask[0]) == footprints.getCampaignLists(269.5, -28.5)[0])
+    assert(9 in unpackCampaigns(mask[0]))
+    assert(mask[1] == 0)
+    assert(footprints.getCampaignLists([0], [0]) == [[]])
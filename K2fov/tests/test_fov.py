@@ -93,6 +93,10 @@ class TestFov(unittest.TestCase):
             calcCh = int(kf.pickAChannel(ra, dec))
             self.assertEqual(expectedCh, calcCh, msg)
 
+        # The batch version should agree
+        calcCh = kf.pickAChannelList(data[:, 1], data[:, 2])
+        self.assertTrue(np.all(calcCh == data[:, 5]))
+
 
     def testGitHubBug1(self):
         #Approx coords of field 1
@@ -120,6 +124,178 @@ class TestFov(unittest.TestCase):
         ch, col, row = kf.getChannelColRow(-1, 0)
         self.assertEqual(ch, 42)
 
+    def testRaDecForChannelColRowList(self):
+        """Check the batch pixel -> sky conversion matches the scalar one,
+        including a mix of science and FGS channels"""
+        kf = fov.KeplerFov(270., -21., 90.)
+        ch = np.array([43, 43, 5, 31, 85, 88, 31])
+        col = np.array([1000, 12, 500., 613, 100, 300, 1100])
+        row = np.array([1000, 20, 500., 491, 200, 50, 1040])
+
+        ra, dec = kf.getRaDecForChannelColRowList(ch, col, row)
+        self.assertEqual(len(ra), len(ch))
+        for i in range(len(ch)):
+            a, d = kf.getRaDecForChannelColRow(ch[i], col[i], row[i])
+            self.assertAlmostEqual(a, ra[i], 10)
+            self.assertAlmostEqual(d, dec[i], 10)
+
+        # The inputs must not be modified
+        self.assertEqual(col[0], 1000)
+
+        self.assertRaises(ValueError, kf.getRaDecForChannelColRowList,
+                          [43, 43], [1, 2], [1])
+
+    def testComputePointing(self):
+        """The whole-block rotation agrees with rotating row by row"""
+        from .. import rotate2 as r
+        kf = fov.KeplerFov(0., 0., 0.)
+        R = np.dot(np.dot(r.rightAscensionRotationMatrix(174.),
+                          r.declinationRotationMatrix(1.422)),
+                   r.rotateInXMat(260.6))
+
+        slew = kf.computePointing(174., 1.422, 260.6, cartesian=True)
+        origin = kf.getOrigin(cartesian=True)
+        radec = kf.getRaDecs(slew)
+        self.assertEqual(radec.shape, (352, 5))
+        for i in [0, 1, 100, 351]:
+            vec = np.dot(R, origin[i, 3:6])
+            self.assertTrue(np.allclose(slew[i, 3:6], vec))
+            ra, dec = r.raDecFromVec(vec)
+            self.assertAlmostEqual(radec[i, 3], ra, 9)
+            self.assertAlmostEqual(radec[i, 4], dec, 9)
+
+        # getRaDecs() must not modify its input
+        self.assertTrue(np.all(slew == kf.computePointing(174., 1.422, 260.6,
+                                                        cartesian=True)))
+
+    def testChannelTable(self):
+        """The channel table is rebuilt by setPointing and agrees with
+        re-projecting the channel corners"""
+        kf = fov.KeplerFov(0., 0., 0.)
+        kf.setPointing(174., 1.422, 260.6)
+        radec = kf.getCoordsOfChannelCorners()
+        for ch in [1, 43, 84, 85]:
+            idx = np.where(radec[:, 2] == ch)[0]
+            x, y = kf.defaultMap.skyToPix(radec[idx, 3], radec[idx, 4])
+            geom = kf.getChannelGeometry(ch)
+            self.assertTrue(np.allclose(geom['corners'][:, 0], x))
+            self.assertTrue(np.allclose(geom['corners'][:, 1], y))
+            self.assertAlmostEqual(geom['colNorm2'],
+                                   np.sum(geom['vCol']**2), 12)
+
+        self.assertRaises(ValueError, kf.getChannelGeometry, 0)
+        self.assertRaises(ValueError, kf.getChannelGeometry, [1, 89])
+
+    def testChannelColRowList(self):
+        """The batch sky -> pixel conversion agrees with the scalar one"""
+        kf = fov.KeplerFov(174., 1.422, 260.6)
+        ra = np.linspace(168, 180, 40)
+        dec = np.linspace(-4, 7, 40)
+        ch, col, row = kf.getChannelColRowList(ra, dec)
+        for i in range(len(ra)):
+            ch1, col1, row1 = kf.getChannelColRow(ra[i], dec[i])
+            self.assertEqual(ch1, ch[i])
+            self.assertAlmostEqual(col1, col[i], 6)
+            self.assertAlmostEqual(row1, row[i], 6)
+
+    def testPickAChannel(self):
+        """The scalar and batch channel pickers agree, including for
+        targets off silicon and on the far side of the sky"""
+        kf = fov.KeplerFov(174., 1.422, 260.6)
+        rng = np.random.RandomState(6)
+        ra = np.concatenate([rng.uniform(164, 184, 3000), [354.]])
+        dec = np.concatenate([rng.uniform(-8.5, 11.5, 3000), [-1.422]])
+        ch = kf.pickAChannelList(ra, dec)
+        for i in range(len(ra)):
+            self.assertEqual(kf.pickAChannel(ra[i], dec[i]), ch[i])
+
+    def testChannelGrid(self):
+        """The grid index finds the same corner as a brute force search"""
+        kf = fov.KeplerFov(0., 0., 0.)
+        grid = kf.getChannelGrid()
+        rng = np.random.RandomState(6)
+        x = rng.uniform(-.25, .25, 5000)
+        y = rng.uniform(-.25, .25, 5000)
+        idx = grid.getNearestCorner(x, y)
+
+        dist = (grid.corners[:, 0] - x[:, np.newaxis])**2 + \
+            (grid.corners[:, 1] - y[:, np.newaxis])**2
+        self.assertTrue(np.all(idx == np.argmin(dist, axis=1)))
+
+        # A new pointing needs a new grid
+        kf.setPointing(90., 30., 0.)
+        self.assertFalse(kf.getChannelGrid() is grid)
+
+    def testPointsInsidePolygons(self):
+        square = [[0, 0], [1, 0], [1, 1], [0, 1]]
+        kite = [[0, 0], [2, 0], [1.5, 1.5], [0, 2]]
+        x = np.array([.5, 1.5, .5, 3])
+        y = np.array([.5, .1, 1.2, 3])
+        inside = fov.pointsInsidePolygons(x, y, [square, kite])
+        self.assertEqual(inside.shape, (4, 2))
+        self.assertTrue(np.all(inside[:, 0] == [True, False, False, False]))
+        self.assertTrue(np.all(inside[:, 1] == [True, True, True, False]))
+
+        idx = fov.findContainingPolygon(x, y, np.array([square, kite]))
+        self.assertTrue(np.all(idx == [0, 1, 1, -1]))
+
+        poly = fov.Polygon(pointList=square)
+        self.assertTrue(poly.isPointInside(.5, .5))
+        self.assertFalse(poly.isPointInside(1.5, .5))
+
+    def testContainingChannel(self):
+        """A target is inside a channel's polygon exactly when its
+        col, row lie on the science pixels of that channel"""
+        kf = fov.KeplerFov(174., 1.422, 260.6)
+        rng = np.random.RandomState(7)
+        ra = rng.uniform(166, 182, 20000)
+        dec = rng.uniform(-6.5, 9.5, 20000)
+
+        ch = kf.getContainingChannelList(ra, dec)
+        ch2, col, row = kf.getChannelColRowList(ra, dec)
+        onCh = (ch > 0) & (ch <= 84)
+        self.assertTrue(np.all(ch[onCh] == ch2[onCh]))
+        self.assertTrue(np.all(kf.colRowIsOnSciencePixelList(col[onCh],
+                                                             row[onCh], 0)))
+
+        # Targets off silicon, but within the padding, of a channel
+        # assigned to them are found once the channels are grown
+        offCh = (ch == 0) & kf.colRowIsOnSciencePixelList(col, row, 12)
+        offCh &= (ch2 <= 84)
+        chPadded = kf.getContainingChannelList(ra[offCh], dec[offCh], 12)
+        self.assertTrue(np.all(chPadded > 0))
+
+        # Points on the far side of the sky are never inside a channel
+        self.assertEqual(kf.getContainingChannelList([354.], [-1.422])[0], 0)
+
+    def testSiliconGrid(self):
+        """The fast paths of isOnSiliconList agree with an exact
+        point-in-polygon test of every target"""
+        kf = fov.KeplerFov(174., 1.422, 260.6)
+        rng = np.random.RandomState(24)
+        ra = rng.uniform(164, 184, 50000)
+        dec = rng.uniform(-8.5, 11.5, 50000)
+        # Include targets on the far side of the sky too
+        ra = np.concatenate([ra, ra + 180])
+        dec = np.concatenate([dec, -dec])
+
+        for pad in [0, 3]:
+            grid = kf.getSiliconGrid(pad)
+            state = grid.classify(*kf.defaultMap.skyToPix(ra[:50000],
+                                                          dec[:50000]))
+            # Most targets avoid the exact test
+            self.assertTrue(np.mean(state == grid.EDGE) < .2)
+
+            channels, polygons = kf.getChannelPolygons(pad)
+            working = (channels <= 84) & \
+                ~np.in1d(channels, kf.brokenChannels)
+            x, y = kf.defaultMap.skyToPix(ra[:50000], dec[:50000])
+            expected = fov.findContainingPolygon(x, y,
+                                                 polygons[working]) >= 0
+            onSilicon = kf.isOnSiliconList(ra, dec, pad)
+            self.assertTrue(np.all(onSilicon[:50000] == expected))
+            self.assertFalse(np.any(onSilicon[50000:]))
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -0,0 +1,100 @@
+
+import unittest
+import numpy as np
+from .. import greatcircle as gc
+
+
+class TestGreatCircle(unittest.TestCase):
+
+    def testAngSepBroadcasts(self):
+        ra = np.array([[0, 90], [180, 10]])
+        dec = np.array([[0, 0], [0, 90]])
+        sep = gc.sphericalAngSep(0, 0, ra, dec)
+        self.assertEqual(sep.shape, (2, 2))
+        self.assertTrue(np.allclose(sep, [[0, 90], [180, 90]]))
+
+        #Identical points must not give nan from round off error
+        self.assertEqual(gc.sphericalAngSep(12.3, 45.6, 12.3, 45.6), 0)
+
+        out = np.empty( (2, 2) )
+        res = gc.sphericalAngSep(0, 0, ra, dec, out=out)
+        self.assertTrue(res is out)
+        self.assertTrue(np.all(out == sep))
+
+        rad = gc.sphericalAngSep(0, 0, np.radians(ra), np.radians(dec),
+                                 radians=True)
+        self.assertTrue(np.allclose(np.degrees(rad), sep))
+
+    def testAngSepFast(self):
+        ra = np.linspace(10, 11, 5)
+        dec = np.linspace(20, 21, 5)
+        sep = gc.sphericalAngSep(10, 20, ra, dec)
+        fast = gc.sphericalAngSepFast(10, 20, ra, dec)
+        self.assertTrue(np.allclose(fast, sep, atol=1e-3))
+
+        sq = gc.sphericalAngSepFast(10, 20, ra, dec, wantSquare=True)
+        self.assertTrue(np.allclose(sq, fast**2))
+        sq = gc.sphericalAngSepFast(10, 20, ra, dec, radians=False,
+                                    wantSquare=True, out=np.empty(5))
+        self.assertTrue(np.allclose(sq, fast**2))
+
+    def testBearing(self):
+        self.assertAlmostEqual(gc.sphericalAngBearing(10, 30, 10, 40), 0, 10)
+        self.assertAlmostEqual(gc.sphericalAngBearing(10, 0, 20, 0), 90, 10)
+        self.assertAlmostEqual(gc.sphericalAngBearing(10, 30, 0, 30),
+                               -gc.sphericalAngBearing(10, 30, 20, 30), 10)
+
+    def testDestination(self):
+        """Travelling along a bearing for a distance must take you to a
+        point that is that far away, on that bearing"""
+        bearing = np.array([-120, 0, 45, 170.])
+        ra, dec = gc.sphericalAngDestination(30, -20, bearing, 5.)
+        self.assertEqual(ra.shape, (4,))
+        self.assertTrue(np.allclose(gc.sphericalAngSep(30, -20, ra, dec), 5))
+        self.assertTrue(np.allclose(gc.sphericalAngBearing(30, -20, ra, dec),
+                                    bearing))
+
+        out = (np.empty(4), np.empty(4))
+        res = gc.sphericalAngDestination(30, -20, bearing, 5., out=out)
+        self.assertTrue(res[0] is out[0])
+        self.assertTrue(np.allclose(out[1], dec))
+
+
+class TestMatching(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(13)
+        self.ra0 = rng.uniform(10, 12, 300)
+        self.dec0 = rng.uniform(-1, 1, 300)
+        self.ra1 = rng.uniform(10, 12, 500)
+        self.dec1 = rng.uniform(-1, 1, 500)
+        self.sep = gc.sphericalAngSep(self.ra0[:, np.newaxis],
+                                      self.dec0[:, np.newaxis],
+                                      self.ra1, self.dec1)
+
+    def testNearestNeighbour(self):
+        #A small block size forces the matrix to be split into many tiles
+        idx, sep = gc.nearestNeighbour(self.ra0, self.dec0,
+                                       self.ra1, self.dec1, blockSize=1000)
+        self.assertTrue(np.all(idx == np.argmin(self.sep, axis=1)))
+        self.assertTrue(np.allclose(sep, np.min(self.sep, axis=1),
+                                    rtol=0, atol=1e-12))
+
+        idx, sep = gc.nearestNeighbour([10], [0], [], [])
+        self.assertEqual(idx[0], -1)
+        self.assertTrue(np.isnan(sep[0]))
+
+    def testPairsWithinRadius(self):
+        idx0, idx1, sep = gc.pairsWithinRadius(self.ra0, self.dec0,
+                                               self.ra1, self.dec1, 0.05,
+                                               blockSize=1000)
+        exp0, exp1 = np.nonzero(self.sep <= 0.05)
+        self.assertTrue(len(exp0) > 0)
+        self.assertTrue(np.all(idx0 == exp0))
+        self.assertTrue(np.all(idx1 == exp1))
+        self.assertTrue(np.allclose(sep, self.sep[exp0, exp1],
+                                    rtol=0, atol=1e-12))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -37,3 +37,136 @@ def test_K2onSilicon():
     assert(ra[1] == 0)
     assert(dec[1] == 0)
     assert(mag[1] == 20)
+
+
+def test_batch_checks():
+    """Do the list versions of the checks agree with the scalar ones?"""
+    from .. import fields
+    from ..K2onSilicon import (onSiliconCheck, onSiliconCheckList,
+                               nearSiliconCheck, nearSiliconCheckList)
+    fovobj = fields.getKeplerFov(9)
+    np.random.seed(14)
+    ra = np.append(np.random.uniform(260, 280, 300), [0, 90, 269.5])
+    dec = np.append(np.random.uniform(-32, -12, 300), [0, 0, -28.5])
+    onSilicon = onSiliconCheckList(ra, dec, fovobj)
+    nearSilicon = nearSiliconCheckList(ra, dec, fovobj)
+    for i in range(len(ra)):
+        assert(onSilicon[i] == onSiliconCheck(ra[i], dec[i], fovobj))
+        assert(nearSilicon[i] == nearSiliconCheck(ra[i], dec[i], fovobj))
+    assert(onSilicon.sum() > 0)
+
+
+def test_K2onSilicon_near_silicon(tmp_path):
+    """Are targets near silicon flagged with a 1?"""
+    import os
+    from ..K2onSilicon import K2onSilicon
+    # The third target is close to the C9 boresight,
+    # but falls in a gap between channels
+    csv = '269.5, -28.5, 12\n0, 0, 20\n270.354, -21.78, 15\n'
+    output_fn = os.path.join(str(tmp_path), "targets_siliconFlag.csv")
+    with tempfile.NamedTemporaryFile() as temp:
+        temp.write(csv.encode('utf-8'))
+        temp.flush()
+        K2onSilicon(temp.name, 9, do_nearSiliconCheck=True, do_plot=False,
+                    output_fn=output_fn)
+    status = np.genfromtxt(output_fn, delimiter=',')[:, 3]
+    assert(list(status) == [2, 0, 1])
+
+
+def test_target_list_reader(tmp_path):
+    """Can we read headers, blank fields, pass-through columns and gzip?"""
+    import os
+    import gzip
+    from ..K2onSilicon import TargetListReader, parse_file
+    csv = ('EPIC ID, RA (J2000) [deg], Dec (J2000) [deg], magnitude, IDs\n'
+           '200001049, , , , GO1064_LC\n'
+           '\n'
+           '# A comment\n'
+           '201121245, 176.828097, -6.003705, 11.112, GO1059_LC\n'
+           '201121246, 176.8, -6.0, , GO1059_LC|GO1060_LC\n')
+    tmpdir = str(tmp_path)
+    for fn, opener in [("targets.csv", open), ("targets.csv.gz", gzip.open)]:
+        path = os.path.join(tmpdir, fn)
+        with opener(path, "wb") as out:
+            out.write(csv.encode('utf-8'))
+
+        with TargetListReader(path, chunksize=2) as reader:
+            assert(reader.extra_names == ['EPIC ID', 'IDs'])
+            chunks = list(reader)
+        assert([len(c.ra) for c in chunks] == [2, 1])
+        assert(np.isnan(chunks[0].ra[0]) and np.isnan(chunks[0].dec[0]))
+        assert(chunks[0].ra[1] == 176.828097)
+        assert(chunks[0].mag[1] == 11.112)
+        assert(np.isnan(chunks[1].mag[0]))
+        assert(list(chunks[1].extra[0]) == ['201121246', 'GO1059_LC|GO1060_LC'])
+
+        ra, dec, mag = parse_file(path)
+        assert(len(ra) == 3)
+
+    # A file without RA and Dec columns
+    path = os.path.join(tmpdir, "names.csv")
+    with open(path, "w") as out:
+        out.write("M67\nWASP-47\n")
+    try:
+        TargetListReader(path)
+    except ValueError:
+        pass
+    else:
+        assert(False)
+
+
+def test_K2onSilicon_target_list(tmp_path):
+    """Does K2onSilicon accept a target list with a header and blanks?"""
+    import os
+    from ..K2onSilicon import K2onSilicon
+    fn = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      "data", "K2Campaign6targets.csv")
+    output_fn = os.path.join(str(tmp_path), "targets_siliconFlag.csv")
+    K2onSilicon(fn, 6, do_plot=False, chunksize=1000, output_fn=output_fn)
+    status = np.genfromtxt(output_fn, delimiter=',', usecols=[0, 3])
+    ra = status[:, 0]
+    # Every target with a position was observed, so must be on silicon
+    assert(np.all(status[np.isfinite(ra), 1] == 2))
+    assert(np.all(status[~np.isfinite(ra), 1] == 0))
+    assert(len(status) == sum(1 for line in open(fn)) - 1)
+
+
+def test_K2onSilicon_binary_output(tmp_path):
+    """Does the .npy output agree with the csv output?"""
+    import os
+    from ..K2onSilicon import K2onSilicon
+    csv = '269.5, -28.5, 12\n0, 0, 20\n270.354, -21.78, 15\n'
+    tmpdir = str(tmp_path)
+    infile = os.path.join(tmpdir, "targets.csv")
+    with open(infile, "w") as out:
+        out.write(csv)
+    for fn in ["flags.npy", "flags.npz"]:
+        output_fn = os.path.join(tmpdir, fn)
+        K2onSilicon(infile, 9, do_nearSiliconCheck=True, do_plot=False,
+                    chunksize=2, output_fn=output_fn)
+        if fn.endswith(".npz"):
+            with np.load(output_fn) as npz:
+                assert(int(npz["campaign"]) == 9)
+                table = npz["targets"]
+        else:
+            table = np.load(output_fn, mmap_mode='r')
+        assert(list(table['row']) == [0, 1, 2])
+        assert(list(table['flag']) == [2, 0, 1])
+        assert(table['ra'][2] == 270.354)
+        assert(table['mag'][1] == 20)
+
+
+def test_K2onSilicon_jobs(tmp_path):
+    """Does a pool of processes give the same output, in the same order?"""
+    import os
+    from ..K2onSilicon import K2onSilicon
+    fn = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      "data", "K2Campaign6targets.csv")
+    tmpdir = str(tmp_path)
+    outputs = []
+    for jobs in [1, 3]:
+        output_fn = os.path.join(tmpdir, "flags{0}.csv".format(jobs))
+        K2onSilicon(fn, 6, do_plot=False, chunksize=100, jobs=jobs,
+                    output_fn=output_fn)
+        outputs.append(open(output_fn).read())
+    assert(outputs[0] == outputs[1])
@@ -0,0 +1,32 @@
+"""Tests the binary table writers."""
+import os
+import numpy as np
+
+from ..output import NpzWriter
+
+DTYPE = [('row', 'i8'), ('ra', 'f8')]
+
+
+def test_npz_staged_next_to_output(tmp_path):
+    """Is the table staged in the output directory, then removed?"""
+    output_fn = os.path.join(str(tmp_path), "out.npz")
+    with NpzWriter(output_fn, DTYPE, arrays={'campaign': 5}) as out:
+        assert(os.path.dirname(out._tmpname) == str(tmp_path))
+        out.write(np.zeros(3, dtype=DTYPE))
+    assert(os.listdir(str(tmp_path)) == ["out.npz"])
+    with np.load(output_fn) as npz:
+        assert(len(npz["targets"]) == 3 and int(npz["campaign"]) == 5)
+
+
+def test_npz_discarded_on_error(tmp_path):
+    """Is no archive written if the table is not complete?"""
+    output_fn = os.path.join(str(tmp_path), "out.npz")
+    try:
+        with NpzWriter(output_fn, DTYPE) as out:
+            out.write(np.zeros(3, dtype=DTYPE))
+            raise KeyboardInterrupt()
+    except KeyboardInterrupt:
+        pass
+    else:
+        assert(False)
+    assert(os.listdir(str(tmp_path)) == [])
@@ -1,6 +1,8 @@
 
 import unittest
+import numpy as np
 from .. import projection as proj
+from .. import greatcircle as gcircle
 
 #$Id: test_projection.py 40 2014-02-18 20:59:31Z fergalm $
 #$URL: svn+ssh://fergalm@svn.code.sf.net/p/keplertwowheel/code/py/test/test_projection.py $#
@@ -135,6 +137,19 @@ class TestGnomic(unittest.TestCase):
         self.assertTrue(d[0]<d0, msg)
 
 
+    def testPixToSkyBatch(self):
+        """Test that pixToSky inverts skyToPix for a batch of points"""
+        p = proj.Gnomic(270., -21.)
+        ra = np.linspace(262, 278, 1000)
+        dec = np.linspace(-28, -14, 1000)
+
+        x, y = p.skyToPix(ra, dec)
+        a, d = p.pixToSky(x, y)
+        self.assertEqual(len(a), len(ra))
+        self.assertTrue(np.allclose(a, ra, atol=1e-8))
+        self.assertTrue(np.allclose(d, dec, atol=1e-8))
+
+
     def testUnprojectable(self):
         """Test that unprojectable points are caught"""
         pg = proj.Gnomic(0,0)
@@ -161,6 +176,93 @@ class TestGnomic(unittest.TestCase):
                 self.assertTrue(False, "skyToPix didn't throw an exception when it should")
 
 
+    def testSkyToPixBatch(self):
+        """Test that projecting a batch gives the same answer as
+        projecting each point on its own"""
+        p = proj.Gnomic(270., -21.)
+        ra = np.linspace(262, 278, 50)
+        dec = np.linspace(-28, -14, 50)
+
+        x, y = p.skyToPix(ra, dec)
+        for i in range(len(ra)):
+            xi, yi = p.skyToPix(ra[i], dec[i])
+            self.assertAlmostEqual(x[i], xi[0], 12)
+            self.assertAlmostEqual(y[i], yi[0], 12)
+
+
+    def testUnprojectableBatch(self):
+        """Test that the failing inputs of a batch are reported"""
+        pg = proj.Gnomic(0,0)
+        try:
+            pg.skyToPix([10, 120, 20, 130], [0, 0, 0, 0])
+        except ValueError as e:
+            msg = str(e)
+            self.assertTrue("120.0000000" in msg, msg)
+            self.assertTrue("[3]" in msg, msg)
+        else:
+            self.assertTrue(False, "skyToPix didn't throw an exception when it should")
+
+        x, y = pg.skyToPix([10, 120], [0, 0], catchInvalid=False)
+        self.assertEqual(len(x), 2)
+
+
+    def testHammerAitoff(self):
+        """Test the vectorized Hammer-Aitoff projection against the
+        formulae applied one point at a time, and its inverse"""
+        from .. import rotate
+        ha = proj.HammerAitoff(120., 20.)
+        ra = np.linspace(0, 359, 41)
+        dec = np.linspace(-85, 85, 41)
+
+        x, y = ha.skyToPix(ra, dec)
+        for i in range(len(ra)):
+            vec = np.dot(ha.Rmatrix, rotate.vecFromRaDec(ra[i], dec[i]))
+            lon, lat = rotate.raDecFromVec(vec)
+            lon = np.radians(np.fmod(lon + 180, 360.)) - np.pi
+            lat = np.radians(lat)
+            gamma = np.sqrt(2 / (1 + np.cos(lat)*np.cos(lon/2.)))
+            self.assertAlmostEqual(x[i], -2*gamma*np.cos(lat)*np.sin(lon/2), 10)
+            self.assertAlmostEqual(y[i], gamma*np.sin(lat), 10)
+
+        ra2, dec2 = ha.pixToSky(x, y)
+        sep = gcircle.sphericalAngSep(ra, dec, ra2, dec2)
+        self.assertTrue(np.all(sep < 1e-8))
+
+        # Points outside the projection have no sky position
+        ra2, dec2 = ha.pixToSky([3, 0, 0], [0, 2, 0])
+        self.assertTrue(np.all(np.isnan(ra2[:2])))
+        self.assertTrue(np.isfinite(ra2[2]))
+
+
+    def testMultiPointing(self):
+        """Test projecting one catalogue onto many tangent planes
+        agrees with one Gnomic projection per tangent point"""
+        from .. import rotate
+        ra0 = np.array([0., 90., 270., 174.])
+        dec0 = np.array([0., 30., -21., 1.4])
+        R = proj.gnomicRotationMatrices(ra0, dec0)
+        self.assertEqual(R.shape, (4, 3, 3))
+
+        ra = np.linspace(0, 359, 500)
+        dec = np.linspace(-80, 80, 500)
+        vecs = rotate.vecsFromRaDec(ra, dec)
+        chunks = list(proj.gnomicSkyToPixVecs(R, vecs, chunkSize=150))
+        self.assertEqual(len(chunks), 4)
+        x = np.hstack([c[1] for c in chunks])
+        y = np.hstack([c[2] for c in chunks])
+        self.assertEqual(x.shape, (4, 500))
+
+        for i in range(len(ra0)):
+            p = proj.Gnomic(ra0[i], dec0[i])
+            self.assertTrue(np.allclose(p.Rmatrix, R[i]))
+            ok = p.isProjectable(ra, dec)
+            self.assertTrue(np.all(np.isnan(x[i, ~ok])))
+            near = gcircle.sphericalAngSep(ra0[i], dec0[i], ra, dec) < 60
+            xi, yi = p.skyToPix(ra[near], dec[near])
+            self.assertTrue(np.allclose(x[i, near], xi, atol=1e-9))
+            self.assertTrue(np.allclose(y[i, near], yi, atol=1e-9))
+
+
 
 if __name__ == "__main__":
     unittest.main()
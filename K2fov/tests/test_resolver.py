@@ -0,0 +1,89 @@
+"""Tests the name resolvers, without connecting to the internet."""
+import os
+
+from .. import K2findCampaigns
+from ..resolver import FileResolver, NameCache, ConcurrentResolver
+
+NAMES_TABLE = ("# name, ra, dec\n"
+               "Target A, 269.5, -28.5\n"
+               "Target B, 0.0, 0.0\n")
+
+
+class CountingResolver(FileResolver):
+    """Remembers which names it was asked to resolve."""
+    def __init__(self, filename):
+        FileResolver.__init__(self, filename)
+        self.calls = []
+
+    def resolve(self, name):
+        self.calls.append(name)
+        return FileResolver.resolve(self, name)
+
+
+def _write_table(tmpdir):
+    path = os.path.join(tmpdir, "names.csv")
+    with open(path, "w") as out:
+        out.write(NAMES_TABLE)
+    return path
+
+
+def test_file_resolver(tmp_path):
+    resolver = FileResolver(_write_table(str(tmp_path)))
+    assert(resolver.resolve("Target A") == (269.5, -28.5))
+    try:
+        resolver.resolve("Target C")
+    except ValueError:
+        pass
+    else:
+        assert(False)
+
+
+def test_cached_resolver(tmp_path):
+    """Are names, including unknown ones, only resolved once?"""
+    tmpdir = str(tmp_path)
+    cache_fn = os.path.join(tmpdir, "cache", "names.sqlite")
+    names = ["Target A", "Target C", "Target B", "Target A"]
+
+    resolver = CountingResolver(_write_table(tmpdir))
+    with NameCache(cache_fn) as cache:
+        positions = ConcurrentResolver(resolver, cache,
+                                       max_workers=3).resolve_many(names)
+    assert(positions == [(269.5, -28.5), None, (0., 0.), (269.5, -28.5)])
+    assert(sorted(resolver.calls) == ["Target A", "Target B", "Target C"])
+
+    # A second run only looks up the new name
+    resolver.calls = []
+    with NameCache(cache_fn) as cache:
+        positions = ConcurrentResolver(resolver, cache).resolve_many(
+                                                names + ["Target D"])
+    assert(resolver.calls == ["Target D"])
+    assert(positions[:4] == [(269.5, -28.5), None, (0., 0.), (269.5, -28.5)])
+
+    # Expired entries are resolved again
+    resolver.calls = []
+    with NameCache(cache_fn, expiry=0) as cache:
+        ConcurrentResolver(resolver, cache).resolve_many(["Target A"])
+    assert(resolver.calls == ["Target A"])
+
+
+def test_K2findCampaigns_csv_names(tmp_path):
+    """Does K2findCampaigns-csv work for a list of names?"""
+    tmpdir = str(tmp_path)
+    table_fn = _write_table(tmpdir)
+    input_fn = os.path.join(tmpdir, "targets.csv")
+    with open(input_fn, "w") as out:
+        out.write("Target A\nTarget C\n\nTarget B\n")
+    output_fn = os.path.join(tmpdir, "campaigns.csv")
+    K2findCampaigns.K2findCampaigns_csv_main(
+        args=[input_fn, "-o", output_fn, "--names-table", table_fn,
+              "--cache", os.path.join(tmpdir, "names.sqlite")])
+    lines = open(output_fn).read().splitlines()
+    assert(lines == ["Target A, {0}".format(
+                        K2findCampaigns.findCampaigns(269.5, -28.5)),
+                     "Target C, []",
+                     "Target B, []"])
+
+    campaigns, ra, dec = K2findCampaigns.findCampaignsByName(
+                            "Target A", FileResolver(table_fn))
+    assert(9 in campaigns)
+    assert((ra, dec) == (269.5, -28.5))
@@ -170,6 +170,44 @@ class TestRotationOrder(unittest.TestCase):
             self.assertAlmostEqual(exp[i], calc[i], 6, msg)
 
 
+class TestBatchConversion(unittest.TestCase):
+
+    def testVecsFromRaDec(self):
+        ra = np.arange(0, 360, 7.5)
+        dec = np.linspace(-90, 90, len(ra))
+        vecs = r.vecsFromRaDec(ra, dec)
+        self.assertEqual(vecs.shape, (len(ra), 3))
+        for i in range(len(ra)):
+            exp = r.vecFromRaDec(ra[i], dec[i])
+            self.assertTrue(np.allclose(exp, vecs[i], atol=1e-12))
+
+        out = np.empty( (len(ra), 3) )
+        res = r.vecsFromRaDec(ra, dec, out=out)
+        self.assertTrue(res is out)
+        self.assertTrue(np.all(out == vecs))
+
+        rad = r.vecsFromRaDecRad(np.radians(ra), np.radians(dec))
+        self.assertTrue(np.allclose(rad, vecs, atol=1e-15))
+
+    def testRaDecsFromVecs(self):
+        ra = np.arange(0, 360, 7.5)
+        dec = np.linspace(-89, 89, len(ra))
+        vecs = 3 * r.vecsFromRaDec(ra, dec)
+        orig = vecs.copy()
+
+        raDec = r.raDecsFromVecs(vecs)
+        self.assertTrue(np.all(vecs == orig), "Input was modified")
+        self.assertTrue(np.allclose(raDec[:, 0], ra, atol=1e-9))
+        self.assertTrue(np.allclose(raDec[:, 1], dec, atol=1e-9))
+        for i in range(len(ra)):
+            exp = r.raDecFromVec(vecs[i])
+            self.assertTrue(np.allclose(exp, raDec[i], atol=1e-9))
+        self.assertTrue(np.all(vecs == orig), "Input was modified")
+
+        out = np.empty( (len(ra), 2) )
+        res = r.raDecsFromVecs(vecs, out=out)
+        self.assertTrue(res is out)
+        self.assertTrue(np.all(out == raDec))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+"""Tests the sky-tile index of the campaigns."""
+import os
+import numpy as np
+
+from .. import skyindex, fields
+from ..catalog import SkyCatalog
+from ..footprint import getCampaignFootprints
+from ..K2findCampaigns import findCampaignsBitmask, findCampaignsList
+
+
+def _targets(n=100000, seed=25):
+    """All-sky targets, plus targets crowded around two campaigns."""
+    rng = np.random.RandomState(seed)
+    ra = [rng.uniform(0, 360, n)]
+    dec = [np.degrees(np.arcsin(rng.uniform(-1, 1, n)))]
+    for campaign in [5, 9]:
+        k = fields.getKeplerFov(campaign)
+        ra.append(k.ra0_deg + rng.uniform(-8, 8, n))
+        dec.append(k.dec0_deg + rng.uniform(-8, 8, n))
+    return SkyCatalog(np.concatenate(ra) % 360, np.concatenate(dec))
+
+
+def test_cell_numbering():
+    """Are the cells nested?"""
+    cat = _targets(1000)
+    for level in [0, 3, 11]:
+        cells = skyindex.cellIndex(cat.vecs, level)
+        assert(np.all(cells < 2 * 4**level))
+        assert(np.all(skyindex.cellIndex(cat.vecs, level + 1) >> 2 == cells))
+        row, col = skyindex._rowColFromCell(cells, level)
+        assert(np.all(skyindex._cellFromRowCol(row, col, level) == cells))
+    assert(skyindex.cellIndex([[np.nan] * 3], 11)[0] == 0)
+
+    # Every target lies within the cone of its cell
+    centres, radius = skyindex._cellCaps(cells, 11)
+    sep = np.arccos(np.clip(np.sum(centres * cat.vecs, axis=1), -1, 1))
+    assert(np.all(sep <= radius + 1e-12))
+
+
+def test_index_is_exact():
+    """Does the index give the same answer as the footprints?"""
+    footprints = getCampaignFootprints()
+    index = skyindex.SkyIndex(skyindex.buildIndex(footprints, maxLevel=8),
+                              8, footprints)
+    cat = _targets()
+    # Include a target without a position
+    cat = SkyCatalog(np.append(cat.ra, np.nan), np.append(cat.dec, np.nan))
+    expected = footprints.getBitmask(cat)
+    assert(expected[-1] == 0)
+    full, partial = index.lookup(cat)
+    assert(full[-1] == 0 and partial[-1] == 0)
+    assert(np.all(full & ~expected == 0))
+    assert(np.all(expected & ~(full | partial) == 0))
+    assert(np.all(index.getBitmask(cat) == expected))
+
+    # The default index, as used by K2findCampaigns
+    assert(np.all(findCampaignsBitmask(cat) == expected))
+    # Most targets on silicon do not need the footprints
+    full, partial = skyindex.getSkyIndex().lookup(cat)
+    assert(np.mean(partial[expected > 0] > 0) < .4)
+    lists = findCampaignsList(cat[:1000])
+    assert(lists == footprints.getCampaignLists(cat[:1000]))
+
+
+def test_saved_index(monkeypatch, tmp_path):
+    """Is the saved index read back, unless it is out of date?"""
+    footprints = getCampaignFootprints()
+    table = skyindex.buildIndex(footprints, maxLevel=6)
+    tmpdir = str(tmp_path)
+    skyindex.writeIndex(table, footprints, 6, tmpdir)
+    # Only the table and its manifest are left behind
+    assert(sorted(os.listdir(tmpdir)) == ["k2-skyindex-pad12.json",
+                                          "k2-skyindex-pad12.npy"])
+
+    found = skyindex.readIndex(tmpdir, footprints.padding_pix)
+    assert(found is not None)
+    assert(isinstance(found[0], np.memmap))
+    assert(np.all(found[0] == table) and found[1] == 6)
+    assert(skyindex.readIndex(tmpdir, padding_pix=0) is None)
+
+    monkeypatch.setattr(skyindex.bundle, "sha256", lambda fn: "0" * 64)
+    assert(skyindex.readIndex(tmpdir, footprints.padding_pix) is None)
+
+
+def test_get_sky_index(monkeypatch, tmp_path):
+    """Is the index built and saved on first use, then read back?"""
+    monkeypatch.setattr(skyindex, "DEFAULT_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(skyindex, "DEFAULT_MAX_LEVEL", 6)
+    monkeypatch.setattr(skyindex, "_index_cache", {})
+    index = skyindex.getSkyIndex()
+    assert(index.maxLevel == 6)
+    assert(skyindex.getSkyIndex() is index)
+    assert(skyindex.readIndex(str(tmp_path)) is not None)
+
+    monkeypatch.setattr(skyindex, "_index_cache", {})
+    assert(isinstance(skyindex.getSkyIndex().table, np.memmap))
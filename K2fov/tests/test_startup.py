@@ -0,0 +1,59 @@
+"""Guards the start-up time of the command-line tools.
+
+Each tool is imported in a fresh interpreter, as happens when it is run
+from the shell.  Importing a tool must not pull in matplotlib or parse
+the C9 data files.  Set the environment variable `K2FOV_TIMING_TESTS`
+to also check that it stays within `IMPORT_BUDGET` seconds on top of the
+time taken to import numpy; wall-clock times depend on the machine, so
+this is not checked by default.
+"""
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+# Modules imported by the scripts in the `scripts` directory
+TOOL_MODULES = ['K2fov.K2onSilicon',
+                'K2fov.K2findCampaigns',
+                'K2fov.c9']
+
+# Seconds allowed for importing a tool, excluding numpy
+IMPORT_BUDGET = 0.3
+
+_PROBE = """
+import sys, json, time
+t0 = time.time()
+import numpy
+t1 = time.time()
+import {module}
+t2 = time.time()
+c9 = sys.modules.get('K2fov.c9')
+print(json.dumps({{'numpy': t1 - t0, 'tool': t2 - t1,
+                  'matplotlib': 'matplotlib' in sys.modules,
+                  'json_loaded': bool(c9 and c9._json_cache)}}))
+"""
+
+
+def _probe(module):
+    out = subprocess.check_output([sys.executable, '-c',
+                                   _PROBE.format(module=module)])
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+
+def test_import_is_lazy():
+    for module in TOOL_MODULES:
+        result = _probe(module)
+        assert(not result['matplotlib'])
+        assert(not result['json_loaded'])
+
+
+@pytest.mark.skipif(not os.environ.get('K2FOV_TIMING_TESTS'),
+                    reason="set K2FOV_TIMING_TESTS to check import times")
+def test_import_time():
+    for module in TOOL_MODULES:
+        # Take the best of a few runs to be robust against a busy machine
+        best = min(_probe(module)['tool'] for i in range(3))
+        assert best < IMPORT_BUDGET, \
+            "Importing {0} took {1:.2f}s".format(module, best)
@@ -34,12 +34,9 @@ def test_targetlists():
             assert(not onSiliconCheck(ra[idx] + 20, dec[idx], fov))
 
         # Also check whether the list-checking function works correctly
-        try:
-            idx = np.where(mask)[0][::500]
-            assert(np.all(onSiliconCheckList(ra[idx], dec[idx], fov)))
-            assert(np.all(~onSiliconCheckList(ra[idx] + 20, dec[idx], fov)))
-        except ImportError:
-            pass  # This feature requires AstroPy, which is an opional requirement
+        idx = np.where(mask)[0][::500]
+        assert(np.all(onSiliconCheckList(ra[idx], dec[idx], fov)))
+        assert(np.all(~onSiliconCheckList(ra[idx] + 20, dec[idx], fov)))
 
     # We test all the target lists available at the time of writing this test
     for campaign in range(15):
@@ -35,8 +35,8 @@ setup(name='K2fov',
       author_email='keplergo@mail.arc.nasa.gov',
       url='https://github.com/KeplerGO/K2fov',
       packages=['K2fov'],
-      package_data={'K2fov': ['data/*.json']},
-      install_requires=["numpy>=1.8"],
+      package_data={'K2fov': ['data/*.json', 'data/*.npy']},
+      install_requires=["numpy>=1.10"],
       scripts=scripts,
       classifiers=[
           "Development Status :: 5 - Production/Stable",